@@ -15,9 +15,16 @@ class Settings(BaseSettings):
     # AI Provider Selection
     AI_PROVIDER: str = Field(default="openai", description="AI provider: 'openai' or 'gemini'")
 
+    # LLM provider calls (deadlines, circuit breaking, hedging)
+    LLM_TIMEOUT: float = Field(default=30.0, description="Seconds per provider call; for streams, per token")
+    LLM_HEDGE_AFTER: float = Field(default=0.0, description="Also start the next provider after this many seconds (0 = off)")
+    LLM_BREAKER_FAILURES: int = Field(default=3, description="Consecutive failures that open a provider's circuit")
+    LLM_BREAKER_RESET: float = Field(default=30.0, description="Seconds a provider is skipped before a trial call")
+    LLM_MAX_CONNECTIONS: int = Field(default=20, description="Pooled keep-alive connections per provider")
+
 
     # Vector DB
-    VECTOR_DB: str = Field(default="chroma", description="pinecone | chroma")
+    VECTOR_DB: str = Field(default="chroma", description="pinecone | chroma | numpy")
 
     # Pinecone
     PINECONE_API_KEY: str = Field(default="")
@@ -26,13 +33,112 @@ class Settings(BaseSettings):
 
     # Chroma (local dev)
     CHROMA_DIR: str = Field(default=".chroma_store")
+    CHROMA_LAYOUT: str = Field(default="shared", description="shared (one collection) | per_doc (legacy)")
+    CHROMA_COLLECTION: str = Field(default="studybuddy_chunks")
+    CHROMA_MAX_CACHED_COLLECTIONS: int = Field(default=256, description="Per-document collection handles kept open")
+
+    # Vector store upserts (Chroma / Pinecone)
+    UPSERT_BATCH_SIZE: int = Field(default=500, description="Vectors per upsert request")
+    UPSERT_CONCURRENCY: int = Field(default=4, description="Upsert requests in flight at once (shared pool)")
+    UPSERT_RETRIES: int = Field(default=3, description="Retries per failed batch")
+    UPSERT_RETRY_BACKOFF: float = Field(default=0.2, description="First retry delay in seconds, doubled per attempt")
+
+    # Embedding cache
+    EMBED_CACHE_ENABLED: bool = Field(default=True)
+    EMBED_CACHE_PATH: str = Field(default=".embed_cache.sqlite3")
+    EMBED_CACHE_MAX_ENTRIES: int = Field(default=200_000)
+
+    # Embedding request batching
+    EMBED_MAX_BATCH_ITEMS: int = Field(default=256, description="Max texts per embedding request")
+    EMBED_MAX_BATCH_TOKENS: int = Field(default=100_000, description="Max estimated tokens per embedding request")
+    EMBED_CONCURRENCY: int = Field(default=4, description="Embedding requests in flight at once")
+    EMBED_MAX_RETRIES: int = Field(default=3)
+    EMBED_RETRY_BACKOFF: float = Field(default=0.5, description="Base delay in seconds, doubled per retry")
+
+    # Whole-document dedup on upload
+    DEDUP_UPLOADS: bool = Field(default=True)
+    DOC_INDEX_PATH: str = Field(default=".doc_index.sqlite3")
+
+    # NumPy (in-process, memory-mapped)
+    NUMPY_STORE_DIR: str = Field(default=".numpy_store")
+    NUMPY_STORE_MAX_OPEN_DOCS: int = Field(default=256, description="Memory-mapped documents kept open")
+    NUMPY_VECTOR_DTYPE: str = Field(default="float32", description="float32 | float16 | int8 (per-vector scaled)")
+    NUMPY_RESCORE: bool = Field(default=True, description="Keep float32 copies on disk to rescore quantized hits")
+    NUMPY_RESCORE_FACTOR: int = Field(default=4, description="Quantized candidates rescored per requested result")
+
+    # Approximate nearest-neighbour search (VECTOR_DB=numpy)
+    NUMPY_ANN: str = Field(default="none", description="none | auto | hnsw | ivf (auto: hnsw when hnswlib is installed)")
+    ANN_MIN_ROWS: int = Field(default=20000, description="Searches over fewer chunks than this stay exact")
+    ANN_OVERFETCH: int = Field(default=4, description="Candidates fetched per requested result before exact rescoring")
+    ANN_HNSW_M: int = Field(default=16)
+    ANN_HNSW_EF_CONSTRUCTION: int = Field(default=200)
+    ANN_HNSW_EF_SEARCH: int = Field(default=64)
+    ANN_IVF_LISTS: int = Field(default=0, description="k-means lists; 0 sizes them as 4*sqrt(chunks)")
+    ANN_IVF_PROBE: int = Field(default=16, description="Lists scanned per query")
+    ANN_IVF_TRAIN_SIZE: int = Field(default=20000, description="Chunks indexed flat before the lists are trained")
+    ANN_CHECKPOINT_SECONDS: float = Field(default=60.0, description="Minimum interval between index checkpoints")
+
+    # Hybrid retrieval (BM25 inverted index fused with vector search)
+    HYBRID_SEARCH: bool = Field(default=False)
+    LEXICAL_INDEX_PATH: str = Field(default=".lexical_index.sqlite3")
+    BM25_K1: float = Field(default=1.2)
+    BM25_B: float = Field(default=0.75)
+    RRF_K: int = Field(default=60, description="Reciprocal rank fusion constant")
+    HYBRID_CANDIDATES: int = Field(default=20, description="Candidates taken from each retriever before fusion")
+
+    # Context assembly
+    CONTEXT_TOKEN_BUDGET: int = Field(default=3000, description="Max estimated context tokens per prompt (0 = unlimited)")
+    CONTEXT_DEDUP_THRESHOLD: float = Field(default=0.9, description="Shingle overlap above which a span is a duplicate")
 
     # Chunking
-    CHUNK_SIZE: int = Field(default=1200)
+    CHUNKER: str = Field(default="character", description="character (fixed-width) | structured (token-sized, sentence-snapped)")
+    CHUNK_TOKENS: int = Field(default=300, description="Max estimated tokens per chunk (structured chunker)")
+    CHUNK_OVERLAP_TOKENS: int = Field(default=50, description="Whole sentences repeated between chunks, in tokens")
+    CHUNK_SIZE: int = Field(default=1200, description="Characters per chunk (character chunker)")
     CHUNK_OVERLAP: int = Field(default=200)
 
+    # Streaming ingestion
+    EMBED_BATCH_SIZE: int = Field(default=1024, description="Chunks per embed call as pages stream in")
+    PDF_WORKERS: int = Field(default=0, description="Processes for parallel PDF extraction (0 = CPU count)")
+    PDF_PARALLEL_MIN_PAGES: int = Field(default=200, description="Page count above which extraction is parallel")
+    PDF_PAGES_PER_TASK: int = Field(default=32)
+
+    # Semantic answer cache (QA)
+    ANSWER_CACHE_ENABLED: bool = Field(default=True)
+    ANSWER_CACHE_THRESHOLD: float = Field(default=0.95, description="Min cosine similarity to reuse an answer")
+    ANSWER_CACHE_TTL_SECONDS: int = Field(default=3600)
+    ANSWER_CACHE_MAX_ENTRIES: int = Field(default=10_000)
+
+    # Batched QA (/qa/batch)
+    QA_BATCH_MAX_QUESTIONS: int = Field(default=100, description="Questions accepted per /qa/batch request")
+    QA_BATCH_LLM_CONCURRENCY: int = Field(default=4, description="LLM calls in flight per /qa/batch request")
+
+    # Bulk uploads (/upload/bulk)
+    BULK_MAX_FILES: int = Field(default=200, description="Files accepted per request, counting ZIP members")
+    BULK_MAX_TOTAL_MB: int = Field(default=500, description="Total size of a request, and of its unpacked ZIP members")
+    BULK_EMBED_WINDOW: int = Field(default=1024, description="Chunks pooled across files per embedding round")
+
+    # Worker pools (blocking stages run off the event loop)
+    INGEST_WORKERS: int = Field(default=4, description="Threads for upload parse/chunk/embed/upsert")
+    QA_WORKERS: int = Field(default=8, description="Threads for QA embedding, vector search and LLM calls")
+
+    # Background ingestion jobs (/upload/jobs)
+    INGEST_JOB_CONCURRENCY: int = Field(default=2, description="Jobs processed at the same time")
+    INGEST_JOB_QUEUE_SIZE: int = Field(default=16, description="Pending jobs before uploads are rejected")
+    INGEST_JOB_RETENTION: int = Field(default=1000, description="Finished jobs kept for polling")
+
+    # Instrumentation
+    METRICS_ENABLED: bool = Field(default=True, description="Record stage timings and serve /metrics")
+    DEBUG_TIMINGS: bool = Field(default=False, description="Add a Server-Timing header with each request's stage breakdown")
+
+    # Startup
+    WARMUP_ON_STARTUP: bool = Field(default=False, description="Load models and clients before serving")
+
     # Misc
     MAX_FILE_SIZE_MB: int = Field(default=40)
+    UPLOAD_READ_CHUNK_KB: int = Field(default=1024, description="Upload bytes read per step")
+    UPLOAD_SPOOL_THRESHOLD_MB: int = Field(default=4, description="Uploads above this size are spooled to a temp file")
+    UPLOAD_TMP_DIR: str = Field(default="", description="Directory for spooled uploads (empty = system temp dir)")
     ALLOWED_EXTS: tuple = ("pdf", "docx", "txt")
 
     class Config:
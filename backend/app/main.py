@@ -1,12 +1,38 @@
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import settings
 from app.routes import upload, qa
+from app.services.container import container
+from app.utils.concurrency import run_blocking, shutdown_pools
+from app.utils.limits import BodySizeLimitMiddleware
+from app.utils import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.services = container
+    if settings.WARMUP_ON_STARTUP:
+        await run_blocking("ingest", container.warm_up)
+    upload.job_queue.start()
+    yield
+    await upload.job_queue.stop()
+    store = container.peek("store")
+    if store is not None:
+        await run_blocking("ingest", store.flush)
+    llm = container.peek("llm")
+    if llm is not None:
+        await llm.aclose()
+    shutdown_pools(wait=False)
 
 
 app = FastAPI(
 title="StudyBuddy.ai API",
 description="Backend for document-grounded Q&A, summaries, and quizzes",
 version="0.1.0",
+lifespan=lifespan,
 )
 
 
@@ -20,6 +46,81 @@ allow_headers=["*"],
 )
 
 
+# Refuse oversized uploads while they are still arriving; the slack covers multipart
+# headers and form fields, and the upload route enforces the exact file size
+app.add_middleware(
+BodySizeLimitMiddleware,
+max_bytes=settings.MAX_FILE_SIZE_MB * 1024 * 1024 + 64 * 1024,
+prefixes=["/upload"],
+exclude=["/upload/bulk"],
+)
+app.add_middleware(
+BodySizeLimitMiddleware,
+max_bytes=settings.BULK_MAX_TOTAL_MB * 1024 * 1024 + 64 * 1024,
+prefixes=["/upload/bulk"],
+)
+
+
+# Outermost, so request timings include the other middleware
+metrics.configure(settings.METRICS_ENABLED)
+app.add_middleware(metrics.MetricsMiddleware, timing_headers=settings.DEBUG_TIMINGS)
+
+
 # Routers
 app.include_router(upload.router, prefix="/upload", tags=["Upload"])
-app.include_router(qa.router, prefix="/qa", tags=["QA"])
\ No newline at end of file
+app.include_router(qa.router, prefix="/qa", tags=["QA"])
+
+
+@app.get("/health", tags=["Health"])
+async def health():
+    """Liveness probe; does not touch models or stores."""
+    return {"status": "ok"}
+
+
+def _service_metrics() -> List[str]:
+    """Counters the services already keep, for those that have been built."""
+    lines: List[str] = []
+    embedder = container.peek("embedder")
+    if embedder is not None:
+        batches = embedder.stats.snapshot()
+        for key in ("batches", "items", "tokens", "retries", "failures"):
+            lines += metrics.sample_lines(
+                f"studybuddy_embed_{key}_total", "counter", f"Embedding request {key}.", [({}, batches[key])]
+            )
+        if embedder.cache is not None:
+            cache = embedder.cache.stats()
+            lines += metrics.sample_lines(
+                "studybuddy_embed_cache_lookups_total", "counter", "Embedding cache lookups by result.",
+                [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])],
+            )
+            lines += metrics.sample_lines(
+                "studybuddy_embed_cache_entries", "gauge", "Cached embeddings.", [({}, cache["entries"])]
+            )
+    answer_cache = container.peek("answer_cache")
+    if answer_cache is not None:
+        cache = answer_cache.stats()
+        lines += metrics.sample_lines(
+            "studybuddy_answer_cache_lookups_total", "counter", "Answer cache lookups by result.",
+            [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])],
+        )
+        lines += metrics.sample_lines(
+            "studybuddy_answer_cache_entries", "gauge", "Cached answers.", [({}, cache["entries"])]
+        )
+    llm = container.peek("llm")
+    if llm is not None:
+        states = {"closed": 0, "half_open": 1, "open": 2}
+        lines += metrics.sample_lines(
+            "studybuddy_llm_circuit_state", "gauge", "Provider circuit breaker: 0 closed, 1 half-open, 2 open.",
+            [({"provider": name}, states[s["state"]]) for name, s in llm.stats().items() if s["state"] in states],
+        )
+    lines += metrics.sample_lines(
+        "studybuddy_ingest_jobs_pending", "gauge", "Upload jobs waiting for a worker.", [({}, upload.job_queue.pending)]
+    )
+    return lines
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage timings, request latencies and service counters in Prometheus text format."""
+    body = metrics.render() + "\n".join(_service_metrics()) + "\n"
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -1,27 +1,124 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 
+# Chunks a question may retrieve; each one lands in the prompt and in the response
+MAX_TOP_K = 50
+
+
 class UploadResponse(BaseModel):
     doc_id: str
     chunk_count: int
     filename: str
+    deduplicated: bool = False
+    # Set by an `update` re-index: the doc_id this upload replaced in the catalog
+    replaced_doc_id: Optional[str] = None
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    filename: str
+    status: str  # queued | running | completed | failed
+    stage: str  # queued | parsing | embedding | upserting | done
+    chunks_processed: int = 0
+    elapsed_seconds: float = 0.0
+    chunks_per_second: float = 0.0
+    result: Optional[UploadResponse] = None
+    error: Optional[str] = None
+
+
+class BulkUploadItem(BaseModel):
+    filename: str
+    doc_id: Optional[str] = None
+    chunk_count: int = 0
+    deduplicated: bool = False
+    replaced_doc_id: Optional[str] = None
+    # Set instead of a doc_id when this file failed; the rest of the batch is unaffected
+    error: Optional[str] = None
+
+
+class BulkUploadStats(BaseModel):
+    files: int
+    succeeded: int
+    failed: int
+    deduplicated: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    files_per_second: float = 0.0
+    chunks_per_second: float = 0.0
+    # Parse time is summed over worker processes, so it can exceed the wall-clock seconds
+    parse_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+
+
+class BulkUploadResponse(BaseModel):
+    results: List[BulkUploadItem]
+    stats: BulkUploadStats
 
 
 class QARequest(BaseModel):
     question: str
-    doc_id: str
-    top_k: int = 5
+    # Scope: any combination of one document, several documents or a whole collection
+    doc_id: Optional[str] = None
+    doc_ids: Optional[List[str]] = None
+    collection_id: Optional[str] = None
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
 
 
 class Source(BaseModel):
     id: str
-    score: float
+    score: float  # cosine similarity to the question
     chunk: Optional[int]
     filename: Optional[str]
+    doc_id: Optional[str] = None
+    page: Optional[int] = None
+    # Reciprocal-rank fusion value that ordered the sources under hybrid search
+    fused_score: Optional[float] = None
 
 
 class QAResponse(BaseModel):
     answer: str
     sources: List[Source]
     used_chunks: int
+    cached: bool = False
+    # Estimated prompt context size, and what merging/dedup/budgeting saved over listing every chunk
+    context_tokens: int = 0
+    tokens_saved: int = 0
+
+
+class QABatchRequest(BaseModel):
+    questions: List[str]
+    # Same scope fields as QARequest; every question is asked against the same documents
+    doc_id: Optional[str] = None
+    doc_ids: Optional[List[str]] = None
+    collection_id: Optional[str] = None
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
+
+
+class QABatchItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    sources: List[Source] = []
+    used_chunks: int = 0
+    cached: bool = False
+    context_tokens: int = 0
+    tokens_saved: int = 0
+    # Set instead of an answer when this question failed; the rest of the batch is unaffected
+    error: Optional[str] = None
+
+
+class QABatchResponse(BaseModel):
+    results: List[QABatchItem]
+
+
+class AnswerCacheStats(BaseModel):
+    enabled: bool
+    entries: int = 0
+    documents: int = 0
+    hits: int = 0
+    misses: int = 0
+    hit_rate: float = 0.0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
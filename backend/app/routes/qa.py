@@ -1,95 +1,372 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import QARequest, QAResponse
+from typing import Dict, List, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.models.schemas import (
+    QARequest, QAResponse, QABatchRequest, QABatchItem, QABatchResponse, AnswerCacheStats,
+)
 from app.services.embedder import Embedder
 from app.services.retriever import VectorStore
+from app.services.answer_cache import AnswerCache
+from app.services.doc_index import DocumentIndex
+from app.services.lexical_index import LexicalIndex, fuse_hybrid
+from app.services.llm import LLMRouter
+from app.services.context import assemble_context, format_context
+from app.services.container import (
+    get_embedder, get_store, get_answer_cache, get_doc_index, get_lexical_index, get_llm,
+)
 from app.config import settings
+from app.utils.concurrency import run_blocking
+from app.utils.metrics import span, timed, observe
+import asyncio
+import json
+import time
+import numpy as np
 
 
-# OpenAI chat
-from openai import OpenAI
+router = APIRouter()
 
-# Gemini service
-from app.services.gemini_service import GeminiService
 
-# Local AI service
-from app.services.local_ai import LocalAI
+SYSTEM_PROMPT = (
+"You are StudyBuddy, a helpful assistant that answers strictly using the provided context. "
+"If the answer is not in the context, say you don't know and suggest where to look in the document."
+)
 
 
-router = APIRouter()
+def _build_prompt(question: str, matches) -> Tuple[str, List[Dict], Dict[str, int]]:
+    """Prompt over the assembled context, the sources it draws on, and its token counts."""
+    spans, usage = assemble_context(
+        matches,
+        token_budget=settings.CONTEXT_TOKEN_BUDGET,
+        dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD,
+        # In characters; structured chunks repeat whole sentences of up to CHUNK_OVERLAP_TOKENS
+        max_overlap=max(settings.CHUNK_OVERLAP, 5 * settings.CHUNK_OVERLAP_TOKENS),
+    )
+    sources = [
+        {
+            "id": mid,
+            "score": score,
+            "chunk": meta.get("chunk"),
+            "filename": meta.get("filename"),
+            "doc_id": meta.get("doc_id"),
+            "page": meta.get("page_start"),
+            "fused_score": meta.get("fused_score"),
+        }
+        for span in spans
+        for mid, score, meta in span["matches"]
+    ]
+    context = format_context(spans)
 
+    user_prompt = (
+        f"Answer the question using only the context below.\n\nContext:\n{context}\n\n"
+        f"Question: {question}\n\nAnswer:"
+    )
+    return user_prompt, sources, usage
 
-_embedder = Embedder()
-_store = VectorStore()
-_openai_client = OpenAI() if settings.OPENAI_API_KEY else None
-_gemini_service = GeminiService() if settings.GEMINI_API_KEY else None
-_local_ai = LocalAI()
 
+def _resolve_doc_ids(payload: Union[QARequest, QABatchRequest], doc_index: DocumentIndex) -> List[str]:
+    """Union of doc_id, doc_ids and the collection's documents, in request order."""
+    doc_ids = ([payload.doc_id] if payload.doc_id else []) + list(payload.doc_ids or [])
+    if payload.collection_id:
+        members = doc_index.collection_docs(payload.collection_id)
+        if not members:
+            raise HTTPException(status_code=404, detail="Unknown or empty collection id")
+        doc_ids.extend(members)
+    if not doc_ids:
+        raise HTTPException(status_code=400, detail="Provide doc_id, doc_ids or collection_id")
+    return list(dict.fromkeys(doc_ids))
 
-SYSTEM_PROMPT = (
-"You are StudyBuddy, a helpful assistant that answers strictly using the provided context. "
-"If the answer is not in the context, say you don't know and suggest where to look in the document."
-)
 
+async def _search(
+    doc_ids: List[str],
+    question: str,
+    q_vec: List[float],
+    top_k: int,
+    store: VectorStore,
+    lexical_index: Optional[LexicalIndex],
+):
+    """
+    Dense search, fused with BM25 by reciprocal rank when hybrid search is enabled;
+    scores stay dense similarities either way.
+    """
+    if lexical_index is None:
+        return await run_blocking("qa", timed("qa.vector_search", store.query_many), doc_ids, q_vec, top_k)
+    n = max(top_k, settings.HYBRID_CANDIDATES)
+    dense, lexical = await asyncio.gather(
+        run_blocking("qa", timed("qa.vector_search", store.query_many), doc_ids, q_vec, n),
+        run_blocking("qa", timed("qa.lexical_search", lexical_index.search), doc_ids, question, n),
+    )
+    fused = await run_blocking(
+        "qa", timed("qa.fuse", fuse_hybrid), [dense], [lexical], [q_vec], store.fetch, top_k, settings.RRF_K
+    )
+    return fused[0]
 
-@router.post("/", response_model=QAResponse)
-async def ask_qna(payload: QARequest):
+
+def _lexical_search_batch(lexical_index: LexicalIndex, doc_ids: List[str], questions: List[str], top_k: int):
+    return [lexical_index.search(doc_ids, question, top_k) for question in questions]
+
+
+async def _search_batch(
+    doc_ids: List[str],
+    questions: List[str],
+    q_vecs: np.ndarray,
+    top_k: int,
+    store: VectorStore,
+    lexical_index: Optional[LexicalIndex],
+):
+    """`_search` for several questions: one multi-query vector search, one match list per question."""
+    if lexical_index is None:
+        return await run_blocking("qa", timed("qa.vector_search", store.query_batch), doc_ids, q_vecs, top_k)
+    n = max(top_k, settings.HYBRID_CANDIDATES)
+    dense, lexical = await asyncio.gather(
+        run_blocking("qa", timed("qa.vector_search", store.query_batch), doc_ids, q_vecs, n),
+        run_blocking("qa", timed("qa.lexical_search", _lexical_search_batch), lexical_index, doc_ids, questions, n),
+    )
+    return await run_blocking(
+        "qa", timed("qa.fuse", fuse_hybrid), dense, lexical, q_vecs, store.fetch, top_k, settings.RRF_K
+    )
+
+
+async def _retrieve(
+    payload: QARequest,
+    embedder: Embedder,
+    store: VectorStore,
+    answer_cache: Optional[AnswerCache],
+    doc_index: DocumentIndex,
+    lexical_index: Optional[LexicalIndex],
+):
+    """
+    Embed the question, then return (doc_ids, q_vec, cached entry, matches);
+    one of the last two is set.
+    """
     if not payload.question.strip():
         raise HTTPException(status_code=400, detail="Question is empty")
+    with span("qa.resolve_docs"):
+        doc_ids = _resolve_doc_ids(payload, doc_index)
 
-    q_vec = _embedder.embed([payload.question])[0]
+    # Embedding, vector search and the LLM call all block; run them on the QA pool
+    q_vec = (await run_blocking("qa", timed("qa.embed_query", embedder.embed), [payload.question]))[0]
 
-    matches = _store.query(doc_id=payload.doc_id, vector=q_vec, top_k=payload.top_k)
+    # Near-identical questions on the same documents reuse the stored answer
+    if answer_cache is not None:
+        with span("qa.cache_lookup"):
+            hit = answer_cache.lookup(doc_ids, q_vec, payload.top_k)
+        if hit:
+            return doc_ids, q_vec, hit, None
+
+    # All requested documents are searched in one pass and merged by score
+    matches = await _search(doc_ids, payload.question, q_vec, payload.top_k, store, lexical_index)
     if not matches:
         raise HTTPException(status_code=404, detail="No context found for the given document id")
+    return doc_ids, q_vec, None, matches
 
-    # Build context
-    ctx_parts = []
-    sources = []
-    for mid, score, meta in matches:
-        txt = meta.get("text", "")
-        ctx_parts.append(f"- {txt}")
-        sources.append({
-            "id": mid,
-            "score": score,
-            "chunk": meta.get("chunk"),
-            "filename": meta.get("filename"),
-        })
-    context = "\n".join(ctx_parts)
 
-    user_prompt = (
-        f"Answer the question using only the context below.\n\nContext:\n{context}\n\n"
-        f"Question: {payload.question}\n\nAnswer:"
+@router.post("/", response_model=QAResponse)
+async def ask_qna(
+    payload: QARequest,
+    embedder: Embedder = Depends(get_embedder),
+    store: VectorStore = Depends(get_store),
+    answer_cache: Optional[AnswerCache] = Depends(get_answer_cache),
+    doc_index: DocumentIndex = Depends(get_doc_index),
+    lexical_index: Optional[LexicalIndex] = Depends(get_lexical_index),
+    llm: LLMRouter = Depends(get_llm),
+):
+    doc_ids, q_vec, hit, matches = await _retrieve(
+        payload, embedder, store, answer_cache, doc_index, lexical_index
     )
+    if hit:
+        return QAResponse(answer=hit["answer"], sources=hit["sources"], used_chunks=hit["used_chunks"], cached=True)
 
-    # Generate answer using the configured AI provider
-    if settings.AI_PROVIDER.lower() == "gemini" and _gemini_service:
-        answer = _gemini_service.generate_response(SYSTEM_PROMPT, user_prompt)
-    elif settings.AI_PROVIDER.lower() == "openai" and _openai_client:
-        chat = _openai_client.chat.completions.create(
-            model=settings.OPENAI_CHAT_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.1
+    with span("qa.prompt_build"):
+        user_prompt, sources, usage = _build_prompt(payload.question, matches)
+
+    # Generate answer using the configured AI provider (falling back in order on failure)
+    started = time.perf_counter()
+    answer = await llm.generate(SYSTEM_PROMPT, user_prompt)
+    observe("qa.llm", time.perf_counter() - started)
+
+    if answer_cache is not None:
+        with span("qa.cache_store"):
+            answer_cache.store(doc_ids, q_vec, payload.top_k, answer, sources, len(sources))
+
+    return QAResponse(
+        answer=answer,
+        sources=sources,
+        used_chunks=len(sources),
+        context_tokens=usage["context_tokens"],
+        tokens_saved=usage["tokens_saved"],
+    )
+
+
+async def _answer_from_matches(question: str, matches, llm: LLMRouter) -> Dict:
+    """Prompt assembly (on the QA pool) and LLM call for one question of a batch."""
+    user_prompt, sources, usage = await run_blocking("qa", timed("qa.prompt_build", _build_prompt), question, matches)
+    started = time.perf_counter()
+    answer = await llm.generate(SYSTEM_PROMPT, user_prompt)
+    observe("qa.llm", time.perf_counter() - started)
+    return {
+        "question": question,
+        "answer": answer,
+        "sources": sources,
+        "used_chunks": len(sources),
+        "context_tokens": usage["context_tokens"],
+        "tokens_saved": usage["tokens_saved"],
+    }
+
+
+@router.post("/batch", response_model=QABatchResponse)
+async def ask_qna_batch(
+    payload: QABatchRequest,
+    embedder: Embedder = Depends(get_embedder),
+    store: VectorStore = Depends(get_store),
+    answer_cache: Optional[AnswerCache] = Depends(get_answer_cache),
+    doc_index: DocumentIndex = Depends(get_doc_index),
+    lexical_index: Optional[LexicalIndex] = Depends(get_lexical_index),
+    llm: LLMRouter = Depends(get_llm),
+):
+    """
+    Answer many questions about the same documents: one batched embedding call, one
+    multi-query vector search, then LLM calls QA_BATCH_LLM_CONCURRENCY at a time.
+    Results come back in question order; a question that fails carries `error`.
+    """
+    questions = payload.questions
+    if not questions:
+        raise HTTPException(status_code=400, detail="Provide at least one question")
+    if len(questions) > settings.QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.QA_BATCH_MAX_QUESTIONS} questions per batch"
         )
-        answer = chat.choices[0].message.content
-    else:
-        # Fallback logic: use whichever service is available
-        if _gemini_service and _gemini_service.is_available():
-            answer = _gemini_service.generate_response(SYSTEM_PROMPT, user_prompt)
-        elif _openai_client and settings.OPENAI_API_KEY:
-            chat = _openai_client.chat.completions.create(
-                model=settings.OPENAI_CHAT_MODEL,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1
+    with span("qa.resolve_docs"):
+        doc_ids = _resolve_doc_ids(payload, doc_index)
+
+    results: List[Dict] = [{"question": q} if q.strip() else {"question": q, "error": "Question is empty"}
+                           for q in questions]
+    asked = [i for i, q in enumerate(questions) if q.strip()]
+    if not asked:
+        return QABatchResponse(results=[QABatchItem(**r) for r in results])
+
+    q_vecs = await run_blocking("qa", timed("qa.embed_query", embedder.embed_array), [questions[i] for i in asked])
+
+    # Cached answers are used as-is; only the remaining questions are searched
+    pending = []  # rows of q_vecs still to answer
+    for row, i in enumerate(asked):
+        hit = None
+        if answer_cache is not None:
+            with span("qa.cache_lookup"):
+                hit = answer_cache.lookup(doc_ids, q_vecs[row], payload.top_k)
+        if hit:
+            results[i].update(
+                answer=hit["answer"], sources=hit["sources"], used_chunks=hit["used_chunks"], cached=True
             )
-            answer = chat.choices[0].message.content
         else:
-            # Use local AI as final fallback
-            answer = _local_ai.generate_response(SYSTEM_PROMPT, user_prompt)
+            pending.append(row)
+
+    if pending:
+        batch_matches = await _search_batch(
+            doc_ids, [questions[asked[row]] for row in pending], q_vecs[pending], payload.top_k, store, lexical_index
+        )
+        gate = asyncio.Semaphore(max(1, settings.QA_BATCH_LLM_CONCURRENCY))
+
+        async def answer(row: int, matches) -> None:
+            i = asked[row]
+            if not matches:
+                results[i]["error"] = "No context found for the given document id"
+                return
+            async with gate:
+                try:
+                    result = await _answer_from_matches(questions[i], matches, llm)
+                except Exception as e:
+                    results[i]["error"] = str(e) or e.__class__.__name__
+                    return
+            results[i] = result
+            if answer_cache is not None:
+                with span("qa.cache_store"):
+                    answer_cache.store(
+                        doc_ids, q_vecs[row], payload.top_k, result["answer"], result["sources"], result["used_chunks"]
+                    )
+
+        await asyncio.gather(*(answer(row, matches) for row, matches in zip(pending, batch_matches)))
+
+    return QABatchResponse(results=[QABatchItem(**r) for r in results])
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def ask_qna_stream(
+    payload: QARequest,
+    embedder: Embedder = Depends(get_embedder),
+    store: VectorStore = Depends(get_store),
+    answer_cache: Optional[AnswerCache] = Depends(get_answer_cache),
+    doc_index: DocumentIndex = Depends(get_doc_index),
+    lexical_index: Optional[LexicalIndex] = Depends(get_lexical_index),
+    llm: LLMRouter = Depends(get_llm),
+):
+    """
+    Server-Sent Events variant of `/qa/`: a `sources` event first, then one `token`
+    event per chunk the provider produces, then `done` (or `error`).
+    """
+    started = time.perf_counter()
+    doc_ids, q_vec, hit, matches = await _retrieve(
+        payload, embedder, store, answer_cache, doc_index, lexical_index
+    )
+
+    async def events():
+        if hit:
+            yield _sse("sources", {"sources": hit["sources"], "used_chunks": hit["used_chunks"], "cached": True})
+            yield _sse("token", {"text": hit["answer"]})
+            yield _sse("done", {"ttft_ms": round((time.perf_counter() - started) * 1000, 1)})
+            return
+
+        with span("qa.prompt_build"):
+            user_prompt, sources, usage = _build_prompt(payload.question, matches)
+        yield _sse("sources", {
+            "sources": sources,
+            "used_chunks": len(sources),
+            "cached": False,
+            "context_tokens": usage["context_tokens"],
+            "tokens_saved": usage["tokens_saved"],
+        })
+
+        parts = []
+        ttft = None
+        waited = 0.0  # time spent waiting on the provider, not on the client reading events
+        tokens = llm.stream(SYSTEM_PROMPT, user_prompt)
+        try:
+            while True:
+                t = time.perf_counter()
+                try:
+                    token = await tokens.__anext__()
+                except StopAsyncIteration:
+                    break
+                waited += time.perf_counter() - t
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                    observe("qa.ttft", ttft)
+                parts.append(token)
+                yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e) or e.__class__.__name__})
+            return
+        finally:
+            observe("qa.llm", waited)
+            await tokens.aclose()  # also stops the provider stream if the client went away
+
+        if answer_cache is not None:
+            with span("qa.cache_store"):
+                answer_cache.store(doc_ids, q_vec, payload.top_k, "".join(parts), sources, len(sources))
+        yield _sse("done", {"ttft_ms": round((ttft or 0.0) * 1000, 1)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
-    return QAResponse(answer=answer, sources=sources, used_chunks=len(matches))
\ No newline at end of file
+@router.get("/cache/stats", response_model=AnswerCacheStats)
+async def answer_cache_stats(answer_cache: Optional[AnswerCache] = Depends(get_answer_cache)):
+    if answer_cache is None:
+        return AnswerCacheStats(enabled=False)
+    return AnswerCacheStats(enabled=True, **answer_cache.stats())
@@ -1,60 +1,297 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from typing import List, Optional, Tuple, Union
+import io
+import os
+import tempfile
+import time
+import zipfile
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException
 from app.config import settings
-from app.models.schemas import UploadResponse
-from app.services.pdf_parser import extract_text_from_pdf_bytes
-from app.services.docs_parser import extract_text_from_docx_bytes
-from app.services.txtparser import extract_text_from_txt_bytes
-from app.services.chunker import recursive_character_split
+from app.models.schemas import BulkUploadResponse, UploadResponse, JobStatus
 from app.services.embedder import Embedder
-from app.services.retriever import VectorStore
-from app.utils.helpers import file_ext, hash_text
-import uuid
+from app.services.retriever import UpsertError, VectorStore
+from app.services.doc_index import DocumentIndex
+from app.services.lexical_index import LexicalIndex
+from app.services.container import container, get_embedder, get_store, get_doc_index, get_lexical_index
+from app.services.ingestion import ingest_bulk, ingest_document
+from app.services.jobs import JobQueue, JobQueueFull, IngestJob
+from app.utils.concurrency import run_blocking
+from app.utils.helpers import file_ext
+from app.utils.metrics import observe
 
 
 router = APIRouter()
 
 
-_embedder = Embedder()
-_store = VectorStore()
+def _invalidate_answers(result: dict) -> None:
+    # Answers cached for a document are stale once a re-index has replaced it
+    if result.get("replaced_doc_id") and container.answer_cache is not None:
+        container.answer_cache.invalidate(result["replaced_doc_id"])
 
 
+def _ingest_job(job: IngestJob) -> dict:
+    result = ingest_document(
+        job.source, job.ext, job.filename,
+        container.embedder, container.store, container.doc_index, job.update, job.collection_id,
+        container.lexical_index, update=job.reindex,
+    )
+    _invalidate_answers(result)
+    return result
 
 
-@router.post("/", response_model=UploadResponse)
-async def upload_file(file: UploadFile = File(...)):
+async def _run_job(job: IngestJob) -> dict:
+    return await run_blocking("ingest", _ingest_job, job)
+
+
+job_queue = JobQueue(
+    _run_job,
+    concurrency=settings.INGEST_JOB_CONCURRENCY,
+    max_pending=settings.INGEST_JOB_QUEUE_SIZE,
+    retention=settings.INGEST_JOB_RETENTION,
+)
+
+
+def _discard(source: Union[bytes, str]) -> None:
+    if isinstance(source, str):
+        try:
+            os.unlink(source)
+        except FileNotFoundError:
+            pass
+
+
+class _TooLarge(Exception):
+    pass
+
+
+async def _spool(read, step: int, limit: int, ext: str) -> Union[bytes, str]:
+    """Drain `await read(step)` into bytes, or into a temp file past UPLOAD_SPOOL_THRESHOLD_MB."""
+    spool_at = settings.UPLOAD_SPOOL_THRESHOLD_MB * 1024 * 1024
+    buf = bytearray()
+    spool = path = None
+    size = 0
+    try:
+        while True:
+            chunk = await read(step)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise _TooLarge()
+            if spool is None and size > spool_at:
+                fd, path = tempfile.mkstemp(suffix=f".{ext}", dir=settings.UPLOAD_TMP_DIR or None)
+                spool = os.fdopen(fd, "wb")
+                spool.write(buf)
+                buf = bytearray()
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                buf += chunk
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            _discard(path)
+        raise
+    if spool is not None:
+        spool.close()
+        return path
+    return bytes(buf)
+
+
+async def _read_upload(file: UploadFile, allowed: Optional[Tuple[str, ...]] = None,
+                       limit_mb: Optional[int] = None):
+    """
+    Read the upload in bounded steps, failing with 413 as soon as it passes
+    `limit_mb` (default MAX_FILE_SIZE_MB). Small files come back as bytes; larger ones
+    are spooled to a temp file whose path is returned instead and must be discarded by the caller.
+    """
     ext = file_ext(file.filename)
-    if ext not in settings.ALLOWED_EXTS:
+    if ext not in (allowed or settings.ALLOWED_EXTS):
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
 
-    raw = await file.read()
-    size_mb = len(raw) / (1024 * 1024)
-    if size_mb > settings.MAX_FILE_SIZE_MB:
-        raise HTTPException(status_code=413, detail=f"File too large (> {settings.MAX_FILE_SIZE_MB} MB)")
-
-    # Extract text blocks
-    if ext == "pdf":
-        blocks = extract_text_from_pdf_bytes(raw)
-    elif ext == "docx":
-        blocks = extract_text_from_docx_bytes(raw)
-    else:
-        blocks = extract_text_from_txt_bytes(raw)
-
-    if not blocks:
-        raise HTTPException(status_code=422, detail="Could not extract any text from the file")
-
-    # Chunk
-    chunks = recursive_character_split(blocks, chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP)
-    if not chunks:
-        raise HTTPException(status_code=422, detail="No chunks produced from text")
-
-    # Embed
-    vectors = _embedder.embed(chunks)
-
-    # Persist to vector store
-    doc_id = str(uuid.uuid4())
-    base_id = hash_text([file.filename, doc_id])
-    ids = [f"{base_id}-{i}" for i in range(len(chunks))]
-    metadatas = [{"doc_id": doc_id, "filename": file.filename, "chunk": i, "text": chunks[i]} for i in range(len(chunks))]
-    _store.upsert(doc_id=doc_id, ids=ids, vectors=vectors, metadatas=metadatas)
-
-    return UploadResponse(doc_id=doc_id, chunk_count=len(chunks), filename=file.filename)
\ No newline at end of file
+    limit_mb = limit_mb or settings.MAX_FILE_SIZE_MB
+    limit = limit_mb * 1024 * 1024
+    step = settings.UPLOAD_READ_CHUNK_KB * 1024
+    started = time.perf_counter()
+    try:
+        source = await _spool(file.read, step, limit, ext)
+    except _TooLarge:
+        raise HTTPException(status_code=413, detail=f"File too large (> {limit_mb} MB)")
+    observe("upload.read", time.perf_counter() - started)
+    return ext, source
+
+
+# A bulk entry is (filename, ext, source) ready to ingest, or (filename, error message)
+BulkEntry = Union[Tuple[str, str, Union[bytes, str]], Tuple[str, str]]
+
+
+def _skip_member(info: zipfile.ZipInfo) -> bool:
+    parts = info.filename.split("/")
+    return info.is_dir() or parts[0] == "__MACOSX" or any(p.startswith(".") for p in parts)
+
+
+async def _unpack_zip(source: Union[bytes, str], name: str) -> List[BulkEntry]:
+    """
+    The supported files inside an uploaded ZIP archive. Sizes are checked against
+    MAX_FILE_SIZE_MB and BULK_MAX_TOTAL_MB from the archive directory before anything is
+    decompressed, and members are read in bounded steps like regular uploads.
+    Unsupported or oversized members become error entries.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source)
+    except (zipfile.BadZipFile, OSError) as e:
+        return [(name, f"Not a valid ZIP archive: {e}")]
+
+    entries: List[BulkEntry] = []
+    limit = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    step = settings.UPLOAD_READ_CHUNK_KB * 1024
+    members = [info for info in archive.infolist() if not _skip_member(info)]
+    if sum(info.file_size for info in members) > settings.BULK_MAX_TOTAL_MB * 1024 * 1024:
+        archive.close()
+        return [(name, f"Archive unpacks to more than {settings.BULK_MAX_TOTAL_MB} MB")]
+    try:
+        for info in members:
+            filename = f"{name}/{info.filename}"
+            ext = file_ext(info.filename)
+            if ext not in settings.ALLOWED_EXTS:
+                entries.append((filename, f"Unsupported file type: {ext}"))
+                continue
+            if info.file_size > limit:
+                entries.append((filename, f"File too large (> {settings.MAX_FILE_SIZE_MB} MB)"))
+                continue
+            try:
+                with archive.open(info) as member:
+                    data = await _spool(
+                        lambda n: run_blocking("ingest", member.read, n), step, limit, ext,
+                    )
+            except (zipfile.BadZipFile, NotImplementedError, RuntimeError, OSError, _TooLarge) as e:
+                entries.append((filename, f"Could not extract from archive: {e}"))
+                continue
+            entries.append((filename, ext, data))
+    except BaseException:
+        _discard_entries(entries)
+        raise
+    finally:
+        archive.close()
+    return entries
+
+
+def _discard_entries(entries: List[BulkEntry]) -> None:
+    for entry in entries:
+        if len(entry) == 3:
+            _discard(entry[2])
+
+
+@router.post("/", response_model=UploadResponse)
+async def upload_file(
+    file: UploadFile = File(...),
+    collection_id: Optional[str] = Form(None),
+    update: bool = Form(False),
+    embedder: Embedder = Depends(get_embedder),
+    store: VectorStore = Depends(get_store),
+    doc_index: DocumentIndex = Depends(get_doc_index),
+    lexical_index: Optional[LexicalIndex] = Depends(get_lexical_index),
+):
+    ext, source = await _read_upload(file)
+
+    # Parsing, embedding and upserting all block; keep them off the event loop
+    try:
+        result = await run_blocking(
+            "ingest", ingest_document, source, ext, file.filename, embedder, store, doc_index,
+            collection_id=collection_id, lexical_index=lexical_index, update=update,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except UpsertError as e:
+        # The vector store kept failing after retries; the upload can simply be sent again
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    finally:
+        _discard(source)
+
+    _invalidate_answers(result)
+    return UploadResponse(**result)
+
+
+@router.post("/bulk", response_model=BulkUploadResponse)
+async def upload_bulk(
+    files: List[UploadFile] = File(...),
+    collection_id: Optional[str] = Form(None),
+    update: bool = Form(False),
+    embedder: Embedder = Depends(get_embedder),
+    store: VectorStore = Depends(get_store),
+    doc_index: DocumentIndex = Depends(get_doc_index),
+    lexical_index: Optional[LexicalIndex] = Depends(get_lexical_index),
+):
+    """
+    Ingest many files in one request: any mix of PDF/DOCX/TXT files and ZIP archives
+    of them. Each file gets its own doc_id or error, in upload order (archive members
+    in place of their archive); a bad file does not fail the rest.
+    """
+    if len(files) > settings.BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files (> {settings.BULK_MAX_FILES})")
+
+    entries: List[BulkEntry] = []
+    try:
+        for file in files:
+            try:
+                ext, source = await _read_upload(
+                    file, settings.ALLOWED_EXTS + ("zip",),
+                    settings.BULK_MAX_TOTAL_MB if file_ext(file.filename) == "zip" else settings.MAX_FILE_SIZE_MB,
+                )
+            except HTTPException as e:
+                entries.append((file.filename, e.detail))
+                continue
+            if ext != "zip":
+                entries.append((file.filename, ext, source))
+                continue
+            try:
+                entries.extend(await _unpack_zip(source, file.filename))
+            finally:
+                _discard(source)
+            if len(entries) > settings.BULK_MAX_FILES:
+                raise HTTPException(status_code=400, detail=f"Too many files (> {settings.BULK_MAX_FILES})")
+
+        ready = [entry for entry in entries if len(entry) == 3]
+        outcome = await run_blocking(
+            "ingest", ingest_bulk, ready, embedder, store, doc_index,
+            collection_id=collection_id, lexical_index=lexical_index, update=update,
+        )
+    finally:
+        _discard_entries(entries)
+
+    ingested = iter(outcome["results"])
+    results = []
+    for entry in entries:
+        if len(entry) == 2:
+            results.append({"filename": entry[0], "error": entry[1]})
+            continue
+        result = next(ingested)
+        if not result.get("error"):
+            _invalidate_answers(result)
+        results.append(result)
+    stats = outcome["stats"]
+    stats.update(files=len(entries), failed=len(entries) - stats["succeeded"])
+    stats["files_per_second"] = len(entries) / stats["seconds"] if stats["seconds"] else 0.0
+    return BulkUploadResponse(results=results, stats=stats)
+
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_upload_job(
+    file: UploadFile = File(...),
+    collection_id: Optional[str] = Form(None),
+    update: bool = Form(False),
+):
+    """Queue the upload for background ingestion and return a job id to poll."""
+    ext, source = await _read_upload(file)
+    try:
+        job = job_queue.submit(file.filename, source, ext, collection_id, update)
+    except JobQueueFull as e:
+        _discard(source)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return JobStatus(**job.snapshot())
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_upload_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return JobStatus(**job.snapshot())
@@ -0,0 +1,452 @@
+from typing import Dict, List, Optional, Tuple
+import importlib.util
+import json
+import math
+import os
+import threading
+import time
+import numpy as np
+from app.services.numpy_store import NumpyIndex, _normalize, _scores, dequantize, quantize
+
+
+# hnswlib is optional; without it the IVF index below is used
+_HNSW_AVAILABLE = importlib.util.find_spec("hnswlib") is not None
+
+ANN_KINDS = ("auto", "hnsw", "ivf")
+
+
+def _grow(arr: np.ndarray, needed: int) -> np.ndarray:
+    """`arr` with room for at least `needed` rows, doubling capacity."""
+    if needed <= len(arr):
+        return arr
+    out = np.zeros((max(needed, 2 * len(arr), 64),) + arr.shape[1:], dtype=arr.dtype)
+    out[:len(arr)] = arr
+    return out
+
+
+class IVFIndex:
+    """
+    Inverted-file index in NumPy: vectors are bucketed by their nearest of `nlist`
+    spherical k-means centroids and a query scans only the `nprobe` closest buckets.
+    Vectors are kept as scaled int8 (candidates are rescored exactly by the caller).
+    Until `train_size` vectors have arrived everything sits in one flat bucket; with
+    an automatic `nlist` (0) the buckets are re-trained each time the index grows 8x.
+    """
+
+    def __init__(self, dim: int, nlist: int = 0, nprobe: int = 16, train_size: int = 20_000, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.auto_nlist = nlist <= 0
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_on = 0
+        # Per bucket: [int8 vectors, float32 scales, int64 labels, count]; one flat bucket until trained
+        self._lists: List[List] = [self._empty_list()]
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0  # vectors held, live or deleted
+
+    def _empty_list(self) -> List:
+        return [np.empty((0, self.dim), dtype=np.int8), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64), 0]
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def _append(self, bucket: int, data: np.ndarray, scales: np.ndarray, labels: np.ndarray) -> None:
+        entry = self._lists[bucket]
+        n, m = entry[3], len(labels)
+        entry[0] = _grow(entry[0], n + m)
+        entry[1] = _grow(entry[1], n + m)
+        entry[2] = _grow(entry[2], n + m)
+        entry[0][n:n + m] = data
+        entry[1][n:n + m] = scales
+        entry[2][n:n + m] = labels
+        entry[3] = n + m
+
+    def _add_bucketed(self, data: np.ndarray, scales: np.ndarray, labels: np.ndarray) -> None:
+        assigned = np.empty(len(labels), dtype=np.int64)
+        for start in range(0, len(labels), 8192):
+            block = data[start:start + 8192].astype(np.float32)
+            assigned[start:start + 8192] = np.argmax(block @ self.centroids.T, axis=1)
+        order = np.argsort(assigned, kind="stable")
+        buckets, firsts = np.unique(assigned[order], return_index=True)
+        for bucket, first, last in zip(buckets, firsts, list(firsts[1:]) + [len(order)]):
+            rows = order[first:last]
+            self._append(int(bucket), data[rows], scales[rows], labels[rows])
+
+    def _train(self) -> None:
+        """Spherical k-means over every held vector, then redistribute them into buckets."""
+        data = np.concatenate([e[0][:e[3]] for e in self._lists])
+        scales = np.concatenate([e[1][:e[3]] for e in self._lists])
+        labels = np.concatenate([e[2][:e[3]] for e in self._lists])
+        n = len(labels)
+        nlist = max(1, int(4 * math.sqrt(n))) if self.auto_nlist else self.nlist
+        rng = np.random.default_rng(self.seed)
+        picked = rng.choice(n, size=min(n, max(nlist * 40, 10_000)), replace=False)
+        sample = _normalize(dequantize(data[picked], scales[picked]))
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)]
+        for _ in range(10):
+            assigned = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assigned, kind="stable")
+            used, firsts = np.unique(assigned[order], return_index=True)
+            sums = sample[rng.choice(len(sample), size=len(centroids))]  # re-seed empty clusters
+            sums[used] = np.add.reduceat(sample[order], firsts)
+            centroids = _normalize(sums)
+        self.centroids = centroids
+        self.nlist = len(centroids)
+        self.trained_on = n
+        self._lists = [self._empty_list() for _ in range(self.nlist)]
+        self._add_bucketed(data, scales, labels)
+
+    def add(self, labels: np.ndarray, vectors: np.ndarray) -> None:
+        labels = np.asarray(labels, dtype=np.int64)
+        if not len(labels):
+            return
+        data, scales = quantize(np.asarray(vectors, dtype=np.float32), "int8")
+        self._alive = _grow(self._alive, int(labels.max()) + 1)
+        self._alive[labels] = True
+        self._size += len(labels)
+        if self.centroids is None:
+            self._append(0, data, scales, labels)
+            if self._size >= self.train_size:
+                self._train()
+            return
+        self._add_bucketed(data, scales, labels)
+        if self.auto_nlist and self._size >= 8 * self.trained_on:
+            self._train()
+
+    def delete(self, labels: np.ndarray) -> None:
+        labels = np.asarray(labels, dtype=np.int64)
+        self._alive[labels[labels < len(self._alive)]] = False
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(labels, approximate scores) of up to `k` live vectors, best first."""
+        if self.centroids is None:
+            probe = [0]
+        else:
+            closest = self.centroids @ query
+            nprobe = min(self.nprobe, self.nlist)
+            probe = np.argpartition(-closest, nprobe - 1)[:nprobe]
+        labels, scores = [], []
+        for bucket in probe:
+            data, scales, bucket_labels, n = self._lists[bucket]
+            if n:
+                labels.append(bucket_labels[:n])
+                scores.append(_scores(data[:n], scales[:n], query))
+        if not labels:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        labels = np.concatenate(labels)
+        scores = np.concatenate(scores)
+        scores[~self._alive[labels]] = -np.inf
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return labels[top], scores[top]
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as fh:
+            np.savez(
+                fh,
+                centroids=self.centroids if self.centroids is not None else np.empty((0, self.dim), np.float32),
+                data=np.concatenate([e[0][:e[3]] for e in self._lists]),
+                scales=np.concatenate([e[1][:e[3]] for e in self._lists]),
+                labels=np.concatenate([e[2][:e[3]] for e in self._lists]),
+                sizes=np.array([e[3] for e in self._lists], dtype=np.int64),
+                alive=self._alive,
+                trained_on=np.array(self.trained_on),
+            )
+
+    def load(self, path: str, live: int = 0) -> None:
+        with np.load(path) as saved:
+            self.centroids = saved["centroids"] if len(saved["centroids"]) else None
+            data, scales, labels, sizes = saved["data"], saved["scales"], saved["labels"], saved["sizes"]
+            self._alive = saved["alive"]
+            self.trained_on = int(saved["trained_on"])
+        if self.centroids is not None:
+            self.nlist = len(self.centroids)
+        self._size = len(labels)
+        self._lists = []
+        offset = 0
+        for size in sizes:
+            self._lists.append([data[offset:offset + size], scales[offset:offset + size],
+                                labels[offset:offset + size], int(size)])
+            offset += size
+
+
+class HNSWIndex:
+    """Graph index backed by hnswlib (inner-product space on normalized vectors)."""
+
+    def __init__(self, dim: int, m: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        import hnswlib
+
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(max_elements=1024, ef_construction=ef_construction, M=m)
+        self._index.set_ef(ef_search)
+        self._live = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def add(self, labels: np.ndarray, vectors: np.ndarray) -> None:
+        needed = self._index.get_current_count() + len(labels)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        self._index.add_items(np.asarray(vectors, dtype=np.float32), np.asarray(labels, dtype=np.int64))
+        self._live += len(labels)
+
+    def delete(self, labels: np.ndarray) -> None:
+        for label in labels:
+            try:
+                self._index.mark_deleted(int(label))
+                self._live -= 1
+            except RuntimeError:
+                pass  # never added (e.g. superseded before a checkpoint) or already deleted
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, self._live)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self._index.set_ef(max(self.ef_search, k))
+        labels, distances = self._index.knn_query(query[None, :], k=k)
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def save(self, path: str) -> None:
+        self._index.save_index(path)
+
+    def load(self, path: str, live: int = 0) -> None:
+        import hnswlib
+
+        self._index = hnswlib.Index(space="ip", dim=self.dim)
+        self._index.load_index(path)
+        self._index.set_ef(self.ef_search)
+        # hnswlib does not report how many elements are marked deleted
+        self._live = live
+
+
+class AnnIndex(NumpyIndex):
+    """
+    NumpyIndex with an approximate nearest-neighbour index over every stored chunk,
+    for searches that span many documents. The per-document files stay the source of
+    truth: the ANN index only proposes candidates, which are rescored exactly from
+    them. Scopes smaller than `min_rows` are scanned exactly as before.
+
+    Every upsert gives the document a fresh range of integer labels, appended to
+    `_ann/labels.jsonl`; the ANN index itself is checkpointed to disk at most every
+    `checkpoint_seconds` and on `flush()`, which also rewrites the log down to the live
+    ranges. On startup the checkpoint is loaded and only documents written after it
+    are re-added from their stored rows.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        kind: str = "auto",
+        min_rows: int = 20_000,
+        overfetch: int = 4,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef_search: int = 64,
+        ivf_lists: int = 0,
+        ivf_probe: int = 16,
+        ivf_train_size: int = 20_000,
+        checkpoint_seconds: float = 60.0,
+        **kwargs,
+    ):
+        super().__init__(root, **kwargs)
+        if kind not in ANN_KINDS:
+            raise ValueError(f"Unsupported ANN index {kind!r}; use one of {', '.join(ANN_KINDS)}")
+        if kind == "hnsw" and not _HNSW_AVAILABLE:
+            raise RuntimeError("NUMPY_ANN=hnsw needs the hnswlib package")
+        self.kind = "hnsw" if kind == "hnsw" or (kind == "auto" and _HNSW_AVAILABLE) else "ivf"
+        self.min_rows = min_rows
+        self.overfetch = max(1, overfetch)
+        self.checkpoint_seconds = checkpoint_seconds
+        self._params = {
+            "hnsw": dict(m=hnsw_m, ef_construction=hnsw_ef_construction, ef_search=hnsw_ef_search),
+            "ivf": dict(nlist=ivf_lists, nprobe=ivf_probe, train_size=ivf_train_size),
+        }[self.kind]
+        self._ann_dir = os.path.join(root, "_ann")
+        self._ann_lock = threading.RLock()
+        self._ann = None
+        self._ranges: Dict[str, Tuple[int, int]] = {}  # doc_id -> live (first label, count)
+        self._range_starts: List[int] = []  # live at the last checkpoint or allocated since, in label order
+        self._range_docs: List[str] = []
+        self._next_label = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        os.makedirs(self._ann_dir, exist_ok=True)
+        self._restore()
+
+    def _new_index(self, dim: int):
+        return HNSWIndex(dim, **self._params) if self.kind == "hnsw" else IVFIndex(dim, **self._params)
+
+    # ---- Label log and checkpoints ----
+    def _record_range(self, doc_id: str, start: int, count: int) -> Optional[Tuple[int, int]]:
+        """Make [start, start + count) the live labels of `doc_id`; returns the range it replaces."""
+        previous = self._ranges.get(doc_id)
+        self._ranges[doc_id] = (start, count)
+        self._range_starts.append(start)
+        self._range_docs.append(doc_id)
+        self._next_label = start + count
+        return previous
+
+    def _restore(self) -> None:
+        log_path = os.path.join(self._ann_dir, "labels.jsonl")
+        logged: List[Tuple[int, int]] = []
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as fh:
+                for line in fh:
+                    entry = json.loads(line)
+                    self._record_range(entry["doc_id"], entry["start"], entry["count"])
+                    logged.append((entry["start"], entry["count"]))
+        meta_path = os.path.join(self._ann_dir, "checkpoint.json")
+        checkpointed = 0
+        if os.path.exists(meta_path):
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+            if meta.get("kind") == self.kind:
+                self._ann = self._new_index(meta["dim"])
+                self._ann.load(os.path.join(self._ann_dir, meta["file"]), meta["live"])
+                checkpointed = meta["next_label"]
+                self._next_label = max(self._next_label, checkpointed)
+        # Labels allocated after the checkpoint are re-added from the stored documents
+        for doc_id, (start, count) in self._ranges.items():
+            if start >= checkpointed:
+                data_dir = self._data_dir(self._doc_dir(doc_id))
+                if data_dir is not None:
+                    self._add_to_ann(np.arange(start, start + count), self._read_full(data_dir))
+        if self._ann is not None:
+            # Ranges replaced after the checkpoint are still in it
+            live = {start for start, _ in self._ranges.values()}
+            for start, count in logged:
+                if start not in live and start < checkpointed:
+                    self._ann.delete(np.arange(start, min(start + count, checkpointed)))
+        self._dirty = any(start >= checkpointed for start, _ in self._ranges.values())
+
+    def _add_to_ann(self, labels: np.ndarray, vectors: np.ndarray) -> None:
+        if self._ann is None:
+            self._ann = self._new_index(vectors.shape[1])
+        self._ann.add(labels, vectors)
+
+    def flush(self) -> None:
+        """Checkpoint the ANN index to disk if it changed since the last checkpoint."""
+        with self._ann_lock:
+            if not self._dirty or self._ann is None:
+                return
+            name = "index.hnsw" if self.kind == "hnsw" else "index.npz"
+            tmp = os.path.join(self._ann_dir, f"tmp-{name}")
+            self._ann.save(tmp)
+            os.replace(tmp, os.path.join(self._ann_dir, name))
+            meta = {
+                "kind": self.kind,
+                "dim": self._ann.dim,
+                "file": name,
+                "next_label": self._next_label,
+                "live": len(self._ann),
+            }
+            with open(os.path.join(self._ann_dir, "checkpoint.json.tmp"), "w") as fh:
+                json.dump(meta, fh)
+            os.replace(os.path.join(self._ann_dir, "checkpoint.json.tmp"), os.path.join(self._ann_dir, "checkpoint.json"))
+            self._compact_log()
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def _compact_log(self) -> None:
+        """Rewrite the label log as just the live ranges, which the checkpoint now holds."""
+        live = sorted((start, count, doc_id) for doc_id, (start, count) in self._ranges.items())
+        log_path = os.path.join(self._ann_dir, "labels.jsonl")
+        with open(log_path + ".tmp", "wb") as fh:
+            for start, count, doc_id in live:
+                fh.write(json.dumps({"doc_id": doc_id, "start": start, "count": count}).encode() + b"\n")
+        os.replace(log_path + ".tmp", log_path)
+        self._range_starts = [start for start, _, _ in live]
+        self._range_docs = [doc_id for _, _, doc_id in live]
+
+    # ---- Upsert ----
+    def upsert(self, doc_id: str, ids: List[str], vectors, metadatas: List[Dict]) -> None:
+        super().upsert(doc_id, ids, vectors, metadatas)
+        # Re-read the merged rows: a re-upsert may have kept some of the previous ones
+        mat = self._read_full(self._data_dir(self._doc_dir(doc_id)))
+        with self._ann_lock:
+            start = self._next_label
+            previous = self._record_range(doc_id, start, len(mat))
+            with open(os.path.join(self._ann_dir, "labels.jsonl"), "ab") as fh:
+                fh.write(json.dumps({"doc_id": doc_id, "start": start, "count": len(mat)}).encode() + b"\n")
+            if previous is not None and self._ann is not None:
+                self._ann.delete(np.arange(previous[0], previous[0] + previous[1]))
+            self._add_to_ann(np.arange(start, start + len(mat)), mat)
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= self.checkpoint_seconds
+        if due:
+            self.flush()
+
+    # ---- Query ----
+    def query_batch(self, doc_ids: List[str], vectors, top_k: int = 5) -> List[List[Tuple[str, float, Dict]]]:
+        with self._ann_lock:
+            scope = {d: self._ranges[d] for d in doc_ids if d in self._ranges}
+            scope_rows = sum(count for _, count in scope.values())
+            if self._ann is None or scope_rows < self.min_rows or len(vectors) == 0 or top_k <= 0:
+                ann = False
+            else:
+                ann = True
+                total = len(self._ann)
+                starts = np.asarray(self._range_starts, dtype=np.int64)
+                range_docs = list(self._range_docs)
+        if not ann:
+            return super().query_batch(doc_ids, vectors, top_k)
+        # Fetch enough candidates that, after dropping other documents, top_k are likely left
+        k = top_k * self.overfetch * max(1, math.ceil(total / scope_rows))
+        out = []
+        for q in _normalize(vectors):
+            with self._ann_lock:
+                labels, _ = self._ann.search(q, min(k, total))
+            matches = self._rank_candidates(scope, starts, range_docs, labels, q, top_k)
+            if len(matches) < top_k:
+                # Too few candidates landed in scope; an exact scan is still correct
+                matches = super().query_batch(doc_ids, [q], top_k)[0]
+            out.append(matches)
+        return out
+
+    def _rank_candidates(self, scope, starts, range_docs, labels, q, top_k):
+        """Exact top-k among the candidate labels that belong to live ranges of `scope`."""
+        labels = np.sort(labels)
+        owners = np.searchsorted(starts, labels, side="right") - 1
+        groups, firsts = np.unique(owners, return_index=True)
+        found = []  # (doc_id, handle, rows, exact scores)
+        for owner, first, last in zip(groups, firsts, list(firsts[1:]) + [len(labels)]):
+            doc_id = range_docs[owner]
+            live = scope.get(doc_id)
+            if live is None or live[0] != starts[owner]:
+                continue
+            handle = self._load(doc_id)
+            if handle is None:
+                continue
+            rows = labels[first:last] - live[0]
+            rows = rows[rows < len(handle.vectors)]
+            # np.asarray drops the memmap subclass, whose per-item indexing overhead dominates here
+            if handle.full is not None:
+                mat = np.asarray(handle.full)[rows]
+            else:
+                mat = dequantize(np.asarray(handle.vectors)[rows],
+                                 np.asarray(handle.scales)[rows] if handle.scales is not None else None)
+            found.append((doc_id, handle, rows, mat @ q))
+        if not found:
+            return []
+        scores = np.concatenate([f[3] for f in found])
+        bounds = np.cumsum([0] + [len(f[2]) for f in found])
+        n = min(top_k, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        matches = []
+        for i in top[np.argsort(-scores[top])]:
+            j = int(np.searchsorted(bounds, i, side="right")) - 1
+            doc_id, handle, rows, _ = found[j]
+            record = self._read_records(handle, [rows[i - bounds[j]]])[0]
+            matches.append((record.pop("id"), float(scores[i]), record))
+        return matches
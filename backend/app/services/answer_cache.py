@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import itertools
+import threading
+import time
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Cache of generated answers scoped to a set of documents, looked up by cosine
+    similarity of the question embedding. Entries expire after `ttl_seconds`; the
+    least recently used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 10_000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._lru: "OrderedDict[int, Dict]" = OrderedDict()
+        self._by_doc: Dict[str, Dict[int, Dict]] = {}
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    @staticmethod
+    def _scope(doc_ids) -> Tuple[str, ...]:
+        if isinstance(doc_ids, str):
+            doc_ids = [doc_ids]
+        return tuple(sorted(set(doc_ids)))
+
+    def lookup(self, doc_ids: Sequence[str], vector, top_k: int) -> Optional[Dict]:
+        """Return the best cached entry for exactly this set of documents, or None."""
+        scope = self._scope(doc_ids)
+        q = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            entries = self._by_doc.get(scope[0], {}) if scope else {}
+            for entry_id in [eid for eid, e in entries.items() if now - e["created"] > self.ttl_seconds]:
+                self._remove(entry_id)
+                self.expirations += 1
+            candidates = [
+                e for e in (self._by_doc.get(scope[0], {}).values() if scope else [])
+                if e["scope"] == scope and e["top_k"] == top_k
+            ]
+            if candidates:
+                sims = np.stack([e["vector"] for e in candidates]) @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry = candidates[best]
+                    self._lru.move_to_end(entry["id"])
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def store(self, doc_ids: Sequence[str], vector, top_k: int, answer: str, sources: List[Dict], used_chunks: int) -> None:
+        entry = {
+            "id": next(self._ids),
+            "scope": self._scope(doc_ids),
+            "vector": self._unit(vector),
+            "top_k": top_k,
+            "answer": answer,
+            "sources": sources,
+            "used_chunks": used_chunks,
+            "created": time.time(),
+        }
+        with self._lock:
+            self._lru[entry["id"]] = entry
+            for doc_id in entry["scope"]:
+                self._by_doc.setdefault(doc_id, {})[entry["id"]] = entry
+            while len(self._lru) > self.max_entries:
+                self._remove(next(iter(self._lru)))
+                self.evictions += 1
+
+    def invalidate(self, doc_id: str) -> None:
+        """Drop every cached answer that used a document, e.g. after it is re-indexed."""
+        with self._lock:
+            stale = list(self._by_doc.get(doc_id, {}))
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._lru.pop(entry_id, None)
+        if entry is None:
+            return
+        for doc_id in entry["scope"]:
+            doc_entries = self._by_doc.get(doc_id)
+            if doc_entries is not None:
+                doc_entries.pop(entry_id, None)
+                if not doc_entries:
+                    del self._by_doc[doc_id]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "documents": len(self._by_doc),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -1,27 +1,178 @@
-from typing import List
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+import re
+from app.utils.helpers import estimate_tokens
 
 
-
-
-def recursive_character_split(
-    texts: List[str],
+def iter_character_chunks(
+    texts: Iterable[str],
     chunk_size: int = 1200,
     chunk_overlap: int = 200,
-) -> List[str]:
+) -> Iterator[str]:
     """
-    Simple, robust splitter by characters with overlap.
-    Takes a list of raw strings (e.g., pages/paragraphs), returns chunks.
+    Streaming form of `recursive_character_split`: consumes pages/paragraphs
+    as they arrive and yields chunks without waiting for the whole document.
     """
-    chunks: List[str] = []
     for t in texts:
         t = " ".join(t.split())  # normalize whitespace
         if len(t) <= chunk_size:
-            chunks.append(t)
+            if t.strip():
+                yield t
             continue
         start = 0
         end = chunk_size
         while start < len(t):
-            chunks.append(t[start:end])
+            chunk = t[start:end]
+            if chunk.strip():
+                yield chunk
             start = max(0, end - chunk_overlap)
             end = start + chunk_size
-    return [c for c in chunks if c.strip()]
\ No newline at end of file
+
+
+def recursive_character_split(
+    texts: Iterable[str],
+    chunk_size: int = 1200,
+    chunk_overlap: int = 200,
+) -> List[str]:
+    """
+    Simple, robust splitter by characters with overlap.
+    Takes a list of raw strings (e.g., pages/paragraphs), returns chunks.
+    """
+    return list(iter_character_chunks(texts, chunk_size=chunk_size, chunk_overlap=chunk_overlap))
+
+
+# Paragraphs are separated by blank lines; a sentence ends in .!? (plus any closing
+# quotes/brackets) followed by whitespace, or at the end of its paragraph
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t\r\f\v]*\n")
+_SENTENCE_END_RE = re.compile(r"[.!?]+[\"'”’)\]]*(?=\s)")
+_WORD_RE = re.compile(r"\S+")
+
+Block = Union[str, Tuple[Optional[int], str]]
+
+
+class _Unit(NamedTuple):
+    text: str  # whitespace-normalized
+    start: int  # offsets into the extracted text, blocks joined by "\n"
+    end: int
+    page: Optional[int]
+    tokens: int
+    paragraph_end: bool
+
+
+def _sentence_spans(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """(start, end, ends_paragraph) of each candidate sentence; spans may be blank."""
+    pos = 0
+    breaks = [m.start() for m in _PARAGRAPH_BREAK_RE.finditer(text)] + [len(text)]
+    for stop in breaks:
+        for end in _SENTENCE_END_RE.finditer(text, pos, stop):
+            yield pos, end.end(), False
+            pos = end.end()
+        yield pos, stop, True
+        pos = stop
+
+
+def _split_words(text: str, start: int, end: int, max_tokens: int, count_tokens) -> Iterator[Tuple[str, int, int]]:
+    """Word-boundary pieces of an oversized sentence, each within `max_tokens`."""
+    words: List[str] = []
+    piece_start = piece_end = start
+    for word in _WORD_RE.finditer(text, start, end):
+        if words and count_tokens(" ".join(words) + " " + word.group()) > max_tokens:
+            yield " ".join(words), piece_start, piece_end
+            words, piece_start = [], word.start()
+        words.append(word.group())
+        piece_end = word.end()
+    if words:
+        yield " ".join(words), piece_start, piece_end
+
+
+def _iter_units(
+    blocks: Iterable[Block],
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+) -> Iterator[_Unit]:
+    """Sentences of each block in order; sentences above `max_tokens` are split at word gaps."""
+    base = 0
+    for block in blocks:
+        page, text = block if isinstance(block, tuple) else (None, block)
+        pending = None  # held back until we know whether it closes its paragraph
+        for start, end, paragraph_end in _sentence_spans(text):
+            segment = text[start:end]
+            words = segment.split()
+            if words:
+                if pending is not None:
+                    yield pending
+                start += len(segment) - len(segment.lstrip())
+                end -= len(segment) - len(segment.rstrip())
+                normalized = " ".join(words)
+                tokens = count_tokens(normalized)
+                if tokens <= max_tokens:
+                    pending = _Unit(normalized, base + start, base + end, page, tokens, False)
+                else:
+                    pieces = list(_split_words(text, start, end, max_tokens, count_tokens))
+                    for piece, p_start, p_end in pieces[:-1]:
+                        yield _Unit(piece, base + p_start, base + p_end, page, count_tokens(piece), False)
+                    piece, p_start, p_end = pieces[-1]
+                    pending = _Unit(piece, base + p_start, base + p_end, page, count_tokens(piece), False)
+            if paragraph_end and pending is not None:
+                yield pending._replace(paragraph_end=True)
+                pending = None
+        base += len(text) + 1
+
+
+def _chunk(units: Sequence[_Unit]) -> Dict:
+    pages = [u.page for u in units if u.page is not None]
+    chunk = {
+        "text": " ".join(u.text for u in units),
+        "char_start": units[0].start,
+        "char_end": units[-1].end,
+    }
+    if pages:
+        chunk["page_start"], chunk["page_end"] = pages[0], pages[-1]
+    return chunk
+
+
+def iter_structured_chunks(
+    blocks: Iterable[Block],
+    chunk_tokens: int = 300,
+    overlap_tokens: int = 50,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> Iterator[Dict]:
+    """
+    Single-pass chunker over parser blocks (page texts, or `(page_number, text)` pairs).
+
+    Chunks hold up to `chunk_tokens` tokens, end on a sentence boundary and close
+    early at a paragraph end once at least half full. Each chunk repeats up to
+    `overlap_tokens` of trailing whole sentences from the previous one. Yields dicts
+    with `text`, `char_start`/`char_end` offsets into the extracted text (blocks
+    joined by newlines) and, when pages are known, `page_start`/`page_end`.
+    """
+    if not 0 <= overlap_tokens < chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+    buf: deque = deque()
+    size = 0
+    fresh = 0  # units in `buf` not already emitted as overlap
+
+    def emit():
+        nonlocal size, fresh
+        chunk = _chunk(buf)
+        # Keep the trailing sentences that fit in the overlap for the next chunk; a chunk
+        # that fits in the overlap whole still drops its first sentence, so chunks advance
+        size -= buf.popleft().tokens
+        while buf and size > overlap_tokens:
+            size -= buf.popleft().tokens
+        fresh = 0
+        return chunk
+
+    for unit in _iter_units(blocks, chunk_tokens, count_tokens):
+        if fresh and size + unit.tokens > chunk_tokens:
+            yield emit()
+        # Drop carried-over sentences that leave no room for the next one
+        while buf and size + unit.tokens > chunk_tokens:
+            size -= buf.popleft().tokens
+        buf.append(unit)
+        size += unit.tokens
+        fresh += 1
+        if unit.paragraph_end and size * 2 >= chunk_tokens:
+            yield emit()
+    if fresh:
+        yield _chunk(buf)
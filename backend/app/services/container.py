@@ -0,0 +1,131 @@
+from typing import Optional
+import threading
+from app.config import settings
+from app.services.embedder import Embedder
+from app.services.retriever import VectorStore
+from app.services.doc_index import DocumentIndex
+from app.services.llm import LLMRouter, build_router
+from app.services.answer_cache import AnswerCache
+from app.services.lexical_index import LexicalIndex
+
+
+class ServiceContainer:
+    """
+    One lazily-initialized instance of each heavyweight service per process.
+    Nothing is built at import time; the first request (or `warm_up`) pays the cost.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._embedder: Optional[Embedder] = None
+        self._store: Optional[VectorStore] = None
+        self._doc_index: Optional[DocumentIndex] = None
+        self._answer_cache: Optional[AnswerCache] = None
+        self._lexical_index: Optional[LexicalIndex] = None
+        self._llm: Optional[LLMRouter] = None
+
+    @property
+    def embedder(self) -> Embedder:
+        if self._embedder is None:
+            with self._lock:
+                if self._embedder is None:
+                    self._embedder = Embedder()
+        return self._embedder
+
+    @property
+    def store(self) -> VectorStore:
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = VectorStore()
+        return self._store
+
+    @property
+    def doc_index(self) -> DocumentIndex:
+        if self._doc_index is None:
+            with self._lock:
+                if self._doc_index is None:
+                    self._doc_index = DocumentIndex(settings.DOC_INDEX_PATH)
+        return self._doc_index
+
+    @property
+    def answer_cache(self) -> Optional[AnswerCache]:
+        if not settings.ANSWER_CACHE_ENABLED:
+            return None
+        if self._answer_cache is None:
+            with self._lock:
+                if self._answer_cache is None:
+                    self._answer_cache = AnswerCache(
+                        threshold=settings.ANSWER_CACHE_THRESHOLD,
+                        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                    )
+        return self._answer_cache
+
+    @property
+    def lexical_index(self) -> Optional[LexicalIndex]:
+        if not settings.HYBRID_SEARCH:
+            return None
+        if self._lexical_index is None:
+            with self._lock:
+                if self._lexical_index is None:
+                    self._lexical_index = LexicalIndex(
+                        settings.LEXICAL_INDEX_PATH, k1=settings.BM25_K1, b=settings.BM25_B
+                    )
+        return self._lexical_index
+
+    @property
+    def llm(self) -> LLMRouter:
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = build_router()
+        return self._llm
+
+    def peek(self, name: str):
+        """The named service if it has been built, without building it."""
+        return getattr(self, f"_{name}")
+
+    def override(self, **services) -> None:
+        """Replace services (e.g. with fakes in benchmarks); keys are property names."""
+        with self._lock:
+            for name, value in services.items():
+                if not hasattr(self, f"_{name}"):
+                    raise AttributeError(f"Unknown service: {name}")
+                setattr(self, f"_{name}", value)
+
+    def warm_up(self) -> None:
+        """Load the embedding model, open the vector store and build LLM clients ahead of traffic."""
+        self.embedder._encode(["warm-up"])
+        _ = self.store
+        _ = self.doc_index
+        _ = self.lexical_index
+        _ = self.llm
+
+
+container = ServiceContainer()
+
+
+# ---- FastAPI dependencies ----
+def get_embedder() -> Embedder:
+    return container.embedder
+
+
+def get_store() -> VectorStore:
+    return container.store
+
+
+def get_doc_index() -> DocumentIndex:
+    return container.doc_index
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    return container.answer_cache
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    return container.lexical_index
+
+
+def get_llm() -> LLMRouter:
+    return container.llm
@@ -0,0 +1,118 @@
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+from app.utils.helpers import estimate_tokens
+
+
+# Shorter suffix/prefix matches between neighbouring chunks are treated as coincidence
+_MIN_OVERLAP = 16
+_SHINGLE = 5
+
+
+def _join(left: str, right: str, max_overlap: int) -> str:
+    """Concatenate two consecutive chunks, dropping the text they share."""
+    limit = min(len(left), len(right), max_overlap)
+    for k in range(limit, _MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:k]):
+            return left + right[k:]
+    return f"{left} {right}"
+
+
+def _shingles(text: str) -> FrozenSet[Tuple[str, ...]]:
+    words = text.lower().split()
+    if len(words) <= _SHINGLE:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1))
+
+
+def _similarity(a: FrozenSet, b: FrozenSet) -> float:
+    # Containment rather than Jaccard, so a span repeated inside a larger one counts
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def merge_spans(matches: Sequence[Tuple[str, float, Dict]], max_overlap: int) -> List[Dict]:
+    """
+    Group matches into contiguous spans: consecutive chunks of the same document are
+    joined back together with their overlap removed. A span scores as its best chunk.
+    """
+    by_doc: Dict[str, List[Tuple[str, float, Dict]]] = {}
+    loose = []
+    for match in matches:
+        meta = match[2]
+        if meta.get("doc_id") is None or meta.get("chunk") is None:
+            loose.append(match)
+        else:
+            by_doc.setdefault(meta["doc_id"], []).append(match)
+
+    spans = []
+    for doc_matches in by_doc.values():
+        doc_matches.sort(key=lambda m: m[2]["chunk"])
+        span = None
+        for mid, score, meta in doc_matches:
+            if span is not None and meta["chunk"] == span["last_chunk"] + 1:
+                span["text"] = _join(span["text"], meta.get("text", ""), max_overlap)
+                span["score"] = max(span["score"], score)
+                span["matches"].append((mid, score, meta))
+                span["last_chunk"] = meta["chunk"]
+                continue
+            span = {"text": meta.get("text", ""), "score": score, "matches": [(mid, score, meta)], "last_chunk": meta["chunk"]}
+            spans.append(span)
+    for mid, score, meta in loose:
+        spans.append({"text": meta.get("text", ""), "score": score, "matches": [(mid, score, meta)], "last_chunk": None})
+    return spans
+
+
+def _truncate(text: str, tokens: int) -> str:
+    return text[:max(0, tokens - 1) * 4]
+
+
+def format_context(spans: Sequence[Dict]) -> str:
+    return "\n".join(f"- {span['text']}" for span in spans)
+
+
+def assemble_context(
+    matches: Sequence[Tuple[str, float, Dict]],
+    token_budget: int = 0,
+    dedup_threshold: float = 0.9,
+    max_overlap: int = 200,
+) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Merge overlapping chunks into spans, drop near-duplicate spans and pack the rest
+    into `token_budget` tokens (0 = unlimited) in retrieval order: `matches` come best
+    first, and a span ranks as its best chunk. (Scores are not re-sorted on, since
+    fused hybrid results are ranked by something other than their similarity.)
+
+    Returns the packed spans, best first, and token counts versus the naive prompt
+    that lists every retrieved chunk verbatim.
+    """
+    naive = estimate_tokens(format_context([{"text": m[2].get("text", "")} for m in matches])) if matches else 0
+    position = {m[0]: i for i, m in reversed(list(enumerate(matches)))}
+    spans = sorted(merge_spans(matches, max_overlap), key=lambda s: min(position[m[0]] for m in s["matches"]))
+
+    packed: List[Dict] = []
+    kept_shingles: List[FrozenSet] = []
+    used = 0
+    dropped_duplicates = 0
+    for span in spans:
+        shingles = _shingles(span["text"])
+        if any(_similarity(shingles, seen) >= dedup_threshold for seen in kept_shingles):
+            dropped_duplicates += 1
+            continue
+        cost = estimate_tokens(f"- {span['text']}\n")
+        if token_budget and used + cost > token_budget:
+            if packed:
+                continue
+            # Never send an empty context: keep the head of the best span
+            span["text"] = _truncate(span["text"], token_budget)
+            cost = token_budget
+        packed.append(span)
+        kept_shingles.append(shingles)
+        used += cost
+
+    context_tokens = estimate_tokens(format_context(packed)) if packed else 0
+    return packed, {
+        "naive_tokens": naive,
+        "context_tokens": context_tokens,
+        "tokens_saved": max(0, naive - context_tokens),
+        "dropped_duplicates": dropped_duplicates,
+    }
@@ -0,0 +1,132 @@
+from typing import Dict, List, Optional
+import sqlite3
+import threading
+import time
+
+
+_DOCUMENTS = (
+    "(file_hash TEXT NOT NULL, "
+    "chunk_size INTEGER NOT NULL, "
+    "chunk_overlap INTEGER NOT NULL, "
+    "embedding_model TEXT NOT NULL, "
+    "vector_db TEXT NOT NULL, "
+    "chunker TEXT NOT NULL DEFAULT 'character', "
+    "doc_id TEXT NOT NULL, "
+    "chunk_count INTEGER NOT NULL, "
+    "filename TEXT, "
+    "created_at REAL NOT NULL, "
+    "PRIMARY KEY (file_hash, chunk_size, chunk_overlap, embedding_model, vector_db, chunker))"
+)
+
+
+class DocumentIndex:
+    """
+    Persistent document catalog: maps (file hash, indexing parameters) to an already
+    indexed doc_id, and records which documents belong to each collection/course.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS documents {_DOCUMENTS}")
+        columns = {row[1]: row[5] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if not columns.get("chunker"):
+            self._migrate_documents("chunker" in columns)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS collections ("
+            "collection_id TEXT NOT NULL, doc_id TEXT NOT NULL, added_at REAL NOT NULL, "
+            "PRIMARY KEY (collection_id, doc_id))"
+        )
+        self._conn.commit()
+
+    def _migrate_documents(self, has_chunker: bool) -> None:
+        """
+        Rebuild a catalog whose primary key predates the chunker, so the same file can be
+        recorded once per chunker instead of each record replacing the other. Catalogs
+        written before the chunker became configurable hold character chunks.
+        """
+        chunker = "chunker" if has_chunker else "'character'"
+        self._conn.execute("BEGIN")
+        self._conn.execute(f"CREATE TABLE documents_rebuilt {_DOCUMENTS}")
+        self._conn.execute(
+            "INSERT INTO documents_rebuilt (file_hash, chunk_size, chunk_overlap, embedding_model, "
+            "vector_db, chunker, doc_id, chunk_count, filename, created_at) "
+            f"SELECT file_hash, chunk_size, chunk_overlap, embedding_model, vector_db, {chunker}, "
+            "doc_id, chunk_count, filename, created_at FROM documents"
+        )
+        self._conn.execute("DROP TABLE documents")
+        self._conn.execute("ALTER TABLE documents_rebuilt RENAME TO documents")
+        self._conn.commit()
+
+    def lookup(
+        self,
+        file_hash: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        embedding_model: str,
+        vector_db: str,
+        chunker: str = "character",
+    ) -> Optional[Dict]:
+        """Return the stored document for this key, or None if it was never indexed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id, chunk_count, filename FROM documents WHERE file_hash = ? "
+                "AND chunk_size = ? AND chunk_overlap = ? AND embedding_model = ? AND vector_db = ? "
+                "AND chunker = ?",
+                (file_hash, chunk_size, chunk_overlap, embedding_model, vector_db, chunker),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"doc_id": row[0], "chunk_count": row[1], "filename": row[2]}
+
+    def record(
+        self,
+        file_hash: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        embedding_model: str,
+        vector_db: str,
+        chunker: str = "character",
+        *,
+        doc_id: str,
+        chunk_count: int,
+        filename: str,
+    ) -> Optional[str]:
+        """
+        Remember that these bytes were indexed under `doc_id` with these parameters.
+        Returns the doc_id previously recorded for them, which this one replaces.
+        """
+        key = (file_hash, chunk_size, chunk_overlap, embedding_model, vector_db, chunker)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id FROM documents WHERE file_hash = ? AND chunk_size = ? AND chunk_overlap = ? "
+                "AND embedding_model = ? AND vector_db = ? AND chunker = ?",
+                key,
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (file_hash, chunk_size, chunk_overlap, "
+                "embedding_model, vector_db, chunker, doc_id, chunk_count, filename, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, doc_id, chunk_count, filename, time.time()),
+            )
+            self._conn.commit()
+        return row[0] if row and row[0] != doc_id else None
+
+    def add_to_collection(self, collection_id: str, doc_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO collections (collection_id, doc_id, added_at) VALUES (?, ?, ?)",
+                (collection_id, doc_id, time.time()),
+            )
+            self._conn.commit()
+
+    def collection_docs(self, collection_id: str) -> List[str]:
+        """doc_ids in a collection, in the order they were added."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM collections WHERE collection_id = ? ORDER BY added_at",
+                (collection_id,),
+            ).fetchall()
+        return [r[0] for r in rows]
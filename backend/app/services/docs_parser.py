@@ -1,16 +1,120 @@
-from typing import List
-from docx import Document
+from typing import Iterator, List, Union
 from io import BytesIO
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
 
 
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_MAIN_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+# Run content that stands for a character, as python-docx renders it
+_CHARACTERS = {_W + "tab": "\t", _W + "ptab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+
+def _main_part(archive: zipfile.ZipFile) -> str:
+    """Name of the main document part, from the package relationships (normally word/document.xml)."""
+    try:
+        rels = archive.read("_rels/.rels").decode("utf-8", errors="ignore")
+    except KeyError:
+        return "word/document.xml"
+    for rel in re.findall(r"<Relationship\b[^>]*>", rels):
+        if f'Type="{_MAIN_DOCUMENT}"' in rel:
+            target = re.search(r'Target="([^"]+)"', rel)
+            if target:
+                return posixpath.normpath(target.group(1).lstrip("/"))
+    return "word/document.xml"
+
+
+def iter_docx_blocks(source: Union[bytes, str]) -> Iterator[str]:
+    """
+    Paragraph and table text of a DOCX file (bytes, or a path opened in place), in
+    document order. The main document XML is parsed incrementally from the ZIP
+    container, so only the block being read is held in memory and embedded media is
+    never decompressed. Body paragraphs match python-docx's `paragraph.text`; each
+    table row becomes one block of its cells' text joined with " | ".
+    Raises ValueError if the file is not a DOCX package.
+    """
+    try:
+        archive = zipfile.ZipFile(BytesIO(source) if isinstance(source, bytes) else source)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not a valid DOCX file: {e}")
+    try:
+        try:
+            stream = archive.open(_main_part(archive))
+        except KeyError:
+            raise ValueError("Not a valid DOCX file: no main document part")
+        with stream:
+            yield from _iter_blocks(stream)
+    finally:
+        archive.close()
+
+
+def _iter_blocks(stream) -> Iterator[str]:
+    body = None
+    depth = 0  # element depth, to spot the end of each top-level body block
+    skip = 0  # inside mc:Fallback, which repeats the content of the preferred mc:Choice
+    runs: List[List[str]] = []  # text of each open paragraph (text boxes nest paragraphs)
+    cells: List[List[str]] = []  # paragraphs of each open table cell
+    rows: List[List[str]] = []  # cells of each open table row
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            depth += 1
+            if skip or tag == _MC_FALLBACK:
+                skip += 1
+            elif tag == _W + "p":
+                runs.append([])
+            elif tag == _W + "tc":
+                cells.append([])
+            elif tag == _W + "tr":
+                rows.append([])
+            elif tag == _W + "body":
+                body = elem
+            continue
+
+        depth -= 1
+        if skip:
+            skip -= 1
+        elif tag == _W + "t" and runs:
+            runs[-1].append(elem.text or "")
+        elif tag in _CHARACTERS and runs and elem.get(_W + "val") is None:  # w:tab inside w:tabs is a tab stop
+            runs[-1].append(_CHARACTERS[tag])
+        elif tag == _W + "br" and runs:
+            if elem.get(_W + "type", "textWrapping") == "textWrapping":
+                runs[-1].append("\n")
+        elif tag == _W + "p" and runs:
+            text = "".join(runs.pop()).strip()
+            if text:
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+        elif tag == _W + "tc" and cells:
+            text = "\n".join(cells.pop())
+            if rows:
+                rows[-1].append(text)
+        elif tag == _W + "tr" and rows:
+            text = " | ".join(cell for cell in rows.pop() if cell)
+            if text:
+                # A nested table's rows belong to the enclosing cell
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+        # Drop each finished top-level block so the parsed tree never grows
+        if body is not None and depth == 2:
+            body.clear()
+
+
+def extract_text_from_docx(source: Union[bytes, str]) -> List[str]:
+    """Extract paragraphs and table rows from a DOCX file (bytes, or a path opened in place) as a list of strings."""
+    return list(iter_docx_blocks(source))
 
 
 def extract_text_from_docx_bytes(docx_bytes: bytes) -> List[str]:
-    """Extract paragraphs from a DOCX file as a list of strings."""
-    document = Document(BytesIO(docx_bytes))
-    paras = []
-    for para in document.paragraphs:
-        text = para.text.strip()
-        if text:
-            paras.append(text)
-    return paras
\ No newline at end of file
+    """Extract paragraphs and table rows from a DOCX file as a list of strings."""
+    return extract_text_from_docx(docx_bytes)
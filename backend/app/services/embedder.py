@@ -1,41 +1,203 @@
-from typing import List
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import contextvars
+import importlib.util
+import random
+import threading
+import time
+import numpy as np
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache, cache_key
+from app.utils.concurrency import get_pool
+from app.utils.helpers import estimate_tokens
+from app.utils.metrics import span
 
 
-# OpenAI v1 SDK
-try:
-    from openai import OpenAI  # type: ignore
-    _OPENAI_AVAILABLE = True
-except Exception:  # pragma: no cover
-    _OPENAI_AVAILABLE = False
+# Both SDKs take seconds to import (torch for sentence-transformers), so they are
+# only probed here and imported when an Embedder is actually built.
+_OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None  # OpenAI v1 SDK
+_ST_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None  # Local fallback
 
 
-# Local fallback
-try:
-    from sentence_transformers import SentenceTransformer  # type: ignore
-    _ST_AVAILABLE = True
-except Exception:  # pragma: no cover
-    _ST_AVAILABLE = False
+LOCAL_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def plan_batches(texts: Sequence[str], max_items: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Split `texts` into contiguous [start, end) spans bounded by item count and
+    estimated tokens. A single text above the token limit gets a span of its own.
+    """
+    spans = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        t = estimate_tokens(text)
+        if i > start and (i - start >= max_items or tokens + t > max_tokens):
+            spans.append((start, i))
+            start, tokens = i, 0
+        tokens += t
+    if start < len(texts):
+        spans.append((start, len(texts)))
+    return spans
+
+
+class BatchStats:
+    """Thread-safe per-batch latency/throughput counters for embedding requests."""
+
+    def __init__(self, history: int = 256):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self.batches = 0
+        self.items = 0
+        self.tokens = 0
+        self.retries = 0
+        self.failures = 0
+        self.seconds = 0.0
+
+    def record(self, items: int, tokens: int, seconds: float, retries: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += items
+            self.tokens += tokens
+            self.retries += retries
+            self.seconds += seconds
+            self._recent.append({"items": items, "tokens": tokens, "seconds": seconds, "retries": retries})
+
+    def record_failure(self, retries: int) -> None:
+        with self._lock:
+            self.failures += 1
+            self.retries += retries
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            recent = sorted(b["seconds"] for b in self._recent)
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "tokens": self.tokens,
+                "retries": self.retries,
+                "failures": self.failures,
+                "mean_batch_seconds": (self.seconds / self.batches) if self.batches else 0.0,
+                "p95_batch_seconds": recent[int(0.95 * (len(recent) - 1))] if recent else 0.0,
+                "items_per_second": (self.items / self.seconds) if self.seconds else 0.0,
+            }
 
 
 class Embedder:
-    def __init__(self):
+    def __init__(self, cache: Optional[EmbeddingCache] = None):
         self.use_openai = _OPENAI_AVAILABLE and bool(settings.OPENAI_API_KEY)
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY) if self.use_openai else None
-        self.local_model = (
-            SentenceTransformer("all-MiniLM-L6-v2") if (not self.use_openai and _ST_AVAILABLE) else None
-        )
+        self.client = None
+        self.local_model = None
+        if self.use_openai:
+            from openai import OpenAI  # type: ignore
+            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        elif _ST_AVAILABLE:
+            from sentence_transformers import SentenceTransformer  # type: ignore
+            self.local_model = SentenceTransformer(LOCAL_EMBEDDING_MODEL)
         if not self.use_openai and not self.local_model:
             raise RuntimeError(
                 "No embedding backend available. Provide OPENAI_API_KEY or install sentence-transformers."
             )
+        self.model_name = (
+            f"openai/{settings.OPENAI_EMBEDDING_MODEL}" if self.use_openai
+            else f"sentence-transformers/{LOCAL_EMBEDDING_MODEL}"
+        )
+        if cache is None and settings.EMBED_CACHE_ENABLED:
+            cache = EmbeddingCache(settings.EMBED_CACHE_PATH, settings.EMBED_CACHE_MAX_ENTRIES)
+        self.cache = cache
+        self.stats = BatchStats()
 
     def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed `texts` as plain lists (see `embed_array`)."""
+        return self.embed_array(texts).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed `texts` into a float32 (len(texts), dim) matrix, sending only cache
+        misses to the backend model.
+        """
+        if self.cache is None:
+            return self._encode_batched(texts)
+
+        keys = [cache_key(self.model_name, t) for t in texts]
+        with span("embed.cache"):
+            vectors = self.cache.get_many(keys)
+
+        # Identical chunks inside one call are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            miss_keys = list(missing.keys())
+
+            # Cache each batch as it lands so a failed call never re-embeds finished batches
+            def store(start: int, end: int, vecs: np.ndarray):
+                with span("embed.cache"):
+                    self.cache.put_many(dict(zip(miss_keys[start:end], vecs)))
+
+            fresh = self._encode_batched(list(missing.values()), on_batch=store)
+            vectors.update(zip(miss_keys, fresh))
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([vectors[k] for k in keys]).astype(np.float32, copy=False)
+
+    def _encode_batched(
+        self,
+        texts: List[str],
+        on_batch: Optional[Callable[[int, int, np.ndarray], None]] = None,
+    ) -> np.ndarray:
+        """
+        Encode in size-bounded batches, EMBED_CONCURRENCY at a time, retrying each
+        failed batch independently. Rows are returned in input order.
+        """
+        spans = plan_batches(texts, settings.EMBED_MAX_BATCH_ITEMS, settings.EMBED_MAX_BATCH_TOKENS)
+        results: List[Optional[np.ndarray]] = [None] * len(spans)
+
+        def run(n: int):
+            start, end = spans[n]
+            vecs = np.asarray(self._encode_with_retry(texts[start:end]), dtype=np.float32)
+            if on_batch:
+                on_batch(start, end, vecs)
+            results[n] = vecs
+
+        if len(spans) <= 1 or settings.EMBED_CONCURRENCY <= 1:
+            for n in range(len(spans)):
+                run(n)
+        else:
+            # Each batch runs in a copy of the caller's context so its timings reach the request
+            futures = [get_pool("embed").submit(contextvars.copy_context().run, run, n) for n in range(len(spans))]
+            errors = [f.exception() for f in futures]  # wait for every batch before failing
+            for error in errors:
+                if error is not None:
+                    raise error
+        if not results:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(results)
+
+    def _encode_with_retry(self, texts: List[str]) -> np.ndarray:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        for attempt in range(settings.EMBED_MAX_RETRIES + 1):
+            t0 = time.perf_counter()
+            try:
+                with span("embed.backend"):
+                    vecs = self._encode(texts)
+            except Exception:
+                if attempt == settings.EMBED_MAX_RETRIES:
+                    self.stats.record_failure(attempt)
+                    raise
+                delay = settings.EMBED_RETRY_BACKOFF * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay / 2))
+                continue
+            self.stats.record(len(texts), tokens, time.perf_counter() - t0, attempt)
+            return vecs
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
         if self.use_openai:
             resp = self.client.embeddings.create(
                 model=settings.OPENAI_EMBEDDING_MODEL,
                 input=texts,
             )
-            return [d.embedding for d in resp.data]
+            return np.asarray([d.embedding for d in resp.data], dtype=np.float32)
         # Local fallback
-        return self.local_model.encode(texts, normalize_embeddings=True).tolist()
\ No newline at end of file
+        return self.local_model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
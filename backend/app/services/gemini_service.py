@@ -1,4 +1,4 @@
-from typing import List
+from typing import AsyncIterator, Iterator, List
 import google.generativeai as genai
 from app.config import settings
 
@@ -29,6 +29,54 @@ class GeminiService:
         except Exception as e:
             raise RuntimeError(f"Gemini API error: {str(e)}")
     
+    def stream_response(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """Yield response text as Gemini produces it."""
+        try:
+            full_prompt = f"{system_prompt}\n\n{user_prompt}"
+            response = self.model.generate_content(
+                full_prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.1,
+                    max_output_tokens=2048,
+                ),
+                stream=True,
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise RuntimeError(f"Gemini API error: {str(e)}")
+    
+    async def generate_response_async(self, system_prompt: str, user_prompt: str) -> str:
+        """`generate_response` on Gemini's async client, so the event loop is never blocked."""
+        try:
+            response = await self.model.generate_content_async(
+                f"{system_prompt}\n\n{user_prompt}",
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.1,
+                    max_output_tokens=2048,
+                )
+            )
+            return response.text
+        except Exception as e:
+            raise RuntimeError(f"Gemini API error: {str(e)}")
+
+    async def stream_response_async(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        try:
+            response = await self.model.generate_content_async(
+                f"{system_prompt}\n\n{user_prompt}",
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.1,
+                    max_output_tokens=2048,
+                ),
+                stream=True,
+            )
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise RuntimeError(f"Gemini API error: {str(e)}")
+
     def is_available(self) -> bool:
         """Check if Gemini service is available."""
         return bool(settings.GEMINI_API_KEY)
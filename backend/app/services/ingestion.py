@@ -0,0 +1,318 @@
+from concurrent.futures import as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import time
+import uuid
+import numpy as np
+from app.config import settings
+from app.services.pdf_parser import iter_pdf_pages, iter_pdf_pages_parallel
+from app.services.docs_parser import iter_docx_blocks
+from app.services.txtparser import iter_txt_paragraphs
+from app.services.chunker import Block, iter_character_chunks, iter_structured_chunks
+from app.services.embedder import Embedder
+from app.services.retriever import VectorStore
+from app.services.doc_index import DocumentIndex
+from app.services.lexical_index import LexicalIndex
+from app.utils.concurrency import get_pool, process_pool_size
+from app.utils.helpers import hash_text, hash_source, batched
+from app.utils.metrics import observe, span, timed_iter
+
+
+# Uploads arrive as bytes, or as a path when they were spooled to disk
+DocumentSource = Union[bytes, str]
+
+
+def iter_blocks(ext: str, source: DocumentSource, numbered: bool = False, parallel: bool = True) -> Iterable[Block]:
+    """
+    Text blocks (pages/paragraphs) for a supported file type; PDF pages and DOCX blocks stream lazily.
+    With `numbered`, PDF pages come as `(page_number, text)` pairs. Without `parallel`,
+    large PDFs are not split across the process pool (e.g. inside a pool worker).
+    """
+    if ext == "pdf":
+        if not parallel:
+            return iter_pdf_pages(source, numbered=numbered)
+        return iter_pdf_pages_parallel(source, numbered=numbered)
+    if ext == "docx":
+        return iter_docx_blocks(source)
+    return iter_txt_paragraphs(source)
+
+
+def chunking_params() -> Tuple[str, int, int]:
+    """(chunker, size, overlap) as configured; sizes are tokens or characters per chunker."""
+    if settings.CHUNKER.lower() == "character":
+        return "character", settings.CHUNK_SIZE, settings.CHUNK_OVERLAP
+    return "structured", settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS
+
+
+def iter_chunks(ext: str, source: DocumentSource, parallel: bool = True) -> Iterator[Dict]:
+    """Chunks of the file as dicts with `text` plus any position metadata."""
+    chunker, size, overlap = chunking_params()
+    if chunker == "character":
+        blocks = timed_iter("ingest.parse", iter_blocks(ext, source, parallel=parallel))
+        for text in iter_character_chunks(blocks, chunk_size=size, chunk_overlap=overlap):
+            yield {"text": text}
+        return
+    blocks = timed_iter("ingest.parse", iter_blocks(ext, source, numbered=True, parallel=parallel))
+    yield from iter_structured_chunks(blocks, chunk_tokens=size, overlap_tokens=overlap)
+
+
+def _dedup_key(source: DocumentSource, embedder: Embedder) -> Tuple:
+    chunker, size, overlap = chunking_params()
+    return hash_source(source), size, overlap, embedder.model_name, settings.VECTOR_DB.lower(), chunker
+
+
+def _rows(doc_id: str, filename: str, chunks: List[Dict]) -> Tuple[List[str], List[Dict]]:
+    """Vector ids and metadata for a new document's chunks."""
+    base_id = hash_text([filename, doc_id])
+    ids = [f"{base_id}-{i}" for i in range(len(chunks))]
+    metadatas = [{"doc_id": doc_id, "filename": filename, "chunk": i, **chunk} for i, chunk in enumerate(chunks)]
+    return ids, metadatas
+
+
+def ingest_document(
+    source: DocumentSource,
+    ext: str,
+    filename: str,
+    embedder: Embedder,
+    store: VectorStore,
+    doc_index: Optional[DocumentIndex] = None,
+    progress: Optional[Callable[[str, int], None]] = None,
+    collection_id: Optional[str] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    update: bool = False,
+) -> dict:
+    """
+    Blocking parse -> chunk -> embed -> upsert pipeline for one file, given as bytes
+    or as the path of a spooled upload.
+    Returns the UploadResponse fields; raises ValueError when no text can be extracted.
+    `progress(stage, chunks_processed)` is called as the pipeline advances.
+    The document is added to `collection_id`, if given, whether or not it was deduplicated.
+    With `update`, a file already in the catalog is indexed again under a new doc_id,
+    which replaces the old one there; the old one is returned as `replaced_doc_id`.
+    """
+    report = progress or (lambda stage, chunks: None)
+    report("parsing", 0)
+
+    # Byte-identical files indexed with the same parameters reuse the existing doc_id
+    dedup_key = None
+    if doc_index is not None and settings.DEDUP_UPLOADS:
+        with span("ingest.dedup"):
+            dedup_key = _dedup_key(source, embedder)
+            existing = doc_index.lookup(*dedup_key)
+        if existing and not update:
+            if collection_id:
+                doc_index.add_to_collection(collection_id, existing["doc_id"])
+            return {
+                "doc_id": existing["doc_id"],
+                "chunk_count": existing["chunk_count"],
+                "filename": filename,
+                "deduplicated": True,
+            }
+
+    # Chunk and embed as pages arrive instead of after the whole document is parsed;
+    # each stage's share of the interleaved work is timed separately. A round spans
+    # several embedding requests, which the embedder sends concurrently, and covers
+    # most documents whole; larger ones keep only one round of chunks unembedded.
+    chunks = []
+    vectors = []
+    for batch in batched(timed_iter("ingest.chunk", iter_chunks(ext, source)), settings.EMBED_BATCH_SIZE):
+        chunks.extend(batch)
+        with span("ingest.embed"):
+            vectors.append(embedder.embed_array([c["text"] for c in batch]))
+        report("embedding", len(chunks))
+
+    if not chunks:
+        raise ValueError("Could not extract any text from the file")
+
+    # Persist to vector store
+    report("upserting", len(chunks))
+    doc_id = str(uuid.uuid4())
+    ids, metadatas = _rows(doc_id, filename, chunks)
+    with span("ingest.upsert"):
+        store.upsert(doc_id=doc_id, ids=ids, vectors=np.concatenate(vectors), metadatas=metadatas)
+    if lexical_index is not None:
+        with span("ingest.lexical_index"):
+            lexical_index.add_document(doc_id, ids, metadatas)
+
+    replaced = None
+    if dedup_key is not None:
+        replaced = doc_index.record(*dedup_key, doc_id=doc_id, chunk_count=len(chunks), filename=filename)
+    if doc_index is not None and collection_id:
+        doc_index.add_to_collection(collection_id, doc_id)
+
+    return {"doc_id": doc_id, "chunk_count": len(chunks), "filename": filename, "deduplicated": False,
+            "replaced_doc_id": replaced}
+
+
+def _parse_file(ext: str, source: DocumentSource) -> Tuple[List[Dict], float]:
+    """Process-pool task: every chunk of one file, and the seconds spent parsing it."""
+    started = time.perf_counter()
+    chunks = list(iter_chunks(ext, source, parallel=False))
+    return chunks, time.perf_counter() - started
+
+
+def ingest_bulk(
+    files: List[Tuple[str, str, DocumentSource]],
+    embedder: Embedder,
+    store: VectorStore,
+    doc_index: Optional[DocumentIndex] = None,
+    collection_id: Optional[str] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    update: bool = False,
+) -> dict:
+    """
+    Blocking ingestion of many `(filename, ext, source)` files at once. Files are parsed
+    in parallel on the process pool; the chunks of finished files are pooled into rounds
+    of about BULK_EMBED_WINDOW chunks, each embedded with one `embed_array` call and
+    written with one `upsert_many`. A file that fails gets an `error` instead of a
+    doc_id; the rest of the batch is unaffected. `update` re-indexes files already in
+    the catalog, as in `ingest_document`.
+    Returns `{"results": [...], "stats": {...}}`, results in the order of `files`.
+    """
+    started = time.perf_counter()
+    results: List[Optional[dict]] = [None] * len(files)
+    stats = {"parse_seconds": 0.0, "embed_seconds": 0.0, "upsert_seconds": 0.0}
+
+    def fail(i: int, error: Exception) -> None:
+        results[i] = {"filename": files[i][0], "error": str(error) or type(error).__name__}
+
+    # Dedup against the catalog, and within the batch: a repeated file waits for its first copy
+    keys: Dict[int, Tuple] = {}
+    first_copy: Dict[Tuple, int] = {}
+    copies: Dict[int, int] = {}
+    pending: List[int] = []
+    for i, (filename, _, source) in enumerate(files):
+        if doc_index is None or not settings.DEDUP_UPLOADS:
+            pending.append(i)
+            continue
+        try:
+            with span("ingest.dedup"):
+                key = _dedup_key(source, embedder)
+                existing = doc_index.lookup(*key)
+        except Exception as e:
+            fail(i, e)
+            continue
+        if existing and not update:
+            results[i] = {"doc_id": existing["doc_id"], "chunk_count": existing["chunk_count"],
+                          "filename": filename, "deduplicated": True}
+        elif key in first_copy:
+            copies[i] = first_copy[key]
+        else:
+            keys[i] = key
+            first_copy[key] = i
+            pending.append(i)
+
+    window: List[Tuple[int, List[Dict]]] = []
+
+    def flush() -> None:
+        if not window:
+            return
+        texts = [c["text"] for _, chunks in window for c in chunks]
+        t0 = time.perf_counter()
+        try:
+            with span("ingest.embed"):
+                vectors = embedder.embed_array(texts)
+        except Exception as e:
+            for i, _ in window:
+                fail(i, e)
+            window.clear()
+            return
+        stats["embed_seconds"] += time.perf_counter() - t0
+
+        docs, offset = [], 0
+        for i, chunks in window:
+            doc_id = str(uuid.uuid4())
+            ids, metadatas = _rows(doc_id, files[i][0], chunks)
+            docs.append((doc_id, ids, vectors[offset:offset + len(chunks)], metadatas))
+            offset += len(chunks)
+        t0 = time.perf_counter()
+        with span("ingest.upsert"):
+            try:
+                errors = store.upsert_many(docs)
+            except Exception as e:
+                errors = {doc[0]: e for doc in docs}
+        stats["upsert_seconds"] += time.perf_counter() - t0
+
+        for (i, chunks), (doc_id, ids, _, metadatas) in zip(window, docs):
+            if doc_id in errors:
+                fail(i, errors[doc_id])
+                continue
+            replaced = None
+            try:
+                if lexical_index is not None:
+                    with span("ingest.lexical_index"):
+                        lexical_index.add_document(doc_id, ids, metadatas)
+                if i in keys:
+                    replaced = doc_index.record(*keys[i], doc_id=doc_id, chunk_count=len(chunks),
+                                                filename=files[i][0])
+            except Exception as e:
+                fail(i, e)
+                continue
+            results[i] = {"doc_id": doc_id, "chunk_count": len(chunks), "filename": files[i][0],
+                          "deduplicated": False, "replaced_doc_id": replaced}
+        window.clear()
+
+    def parsed(i: int, outcome: Tuple[List[Dict], float]) -> None:
+        chunks, seconds = outcome
+        stats["parse_seconds"] += seconds
+        observe("ingest.parse", seconds)
+        if not chunks:
+            fail(i, ValueError("Could not extract any text from the file"))
+            return
+        window.append((i, chunks))
+        if sum(len(c) for _, c in window) >= settings.BULK_EMBED_WINDOW:
+            flush()
+
+    # Embed and write each round while the remaining files are still being parsed
+    if len(pending) > 1 and process_pool_size() > 1:
+        pool = get_pool("process")
+        futures = {pool.submit(_parse_file, files[i][1], files[i][2]): i for i in pending}
+        try:
+            for future in as_completed(futures):
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    fail(futures[future], e)
+                    continue
+                parsed(futures[future], outcome)
+        finally:
+            for future in futures:
+                future.cancel()
+    else:
+        for i in pending:
+            try:
+                outcome = _parse_file(files[i][1], files[i][2])
+            except Exception as e:
+                fail(i, e)
+                continue
+            parsed(i, outcome)
+    flush()
+
+    for i, first in copies.items():
+        original = results[first]
+        if original.get("error"):
+            results[i] = {"filename": files[i][0], "error": original["error"]}
+        else:
+            results[i] = {**original, "filename": files[i][0], "deduplicated": True, "replaced_doc_id": None}
+
+    if doc_index is not None and collection_id:
+        for result in results:
+            if not result.get("error"):
+                doc_index.add_to_collection(collection_id, result["doc_id"])
+
+    seconds = time.perf_counter() - started
+    succeeded = [r for r in results if not r.get("error")]
+    chunks = sum(r["chunk_count"] for r in succeeded if not r["deduplicated"])
+    return {
+        "results": results,
+        "stats": {
+            "files": len(files),
+            "succeeded": len(succeeded),
+            "failed": len(files) - len(succeeded),
+            "deduplicated": sum(1 for r in succeeded if r["deduplicated"]),
+            "chunks": chunks,
+            "seconds": seconds,
+            "files_per_second": len(files) / seconds if seconds else 0.0,
+            "chunks_per_second": chunks / seconds if seconds else 0.0,
+            **stats,
+        },
+    }
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Union
+import asyncio
+import os
+import threading
+import time
+import uuid
+from app.utils.metrics import observe
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the pending-job queue is at capacity."""
+
+
+SHUTDOWN_ERROR = "Server shut down before the job finished"
+
+
+class IngestJob:
+    """Mutable progress record for one background upload."""
+
+    def __init__(
+        self,
+        filename: str,
+        source: Union[bytes, str],
+        ext: str,
+        collection_id: Optional[str] = None,
+        reindex: bool = False,
+    ):
+        self.job_id = str(uuid.uuid4())
+        self.filename = filename
+        self.ext = ext
+        self.collection_id = collection_id
+        self.reindex = reindex  # the upload's `update` flag; `update` is the progress callback
+        # Upload bytes, or the path of a spooled temp file that the job owns
+        self.source: Optional[Union[bytes, str]] = source
+        self.status = "queued"
+        self.stage = "queued"
+        self.chunks_processed = 0
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def update(self, stage: str, chunks_processed: int) -> None:
+        """Progress callback; called from the ingestion worker thread."""
+        with self._lock:
+            self.stage = stage
+            self.chunks_processed = chunks_processed
+
+    def release(self) -> None:
+        """Drop the upload bytes, or delete the spooled file, once the job no longer needs them."""
+        source, self.source = self.source, None
+        if isinstance(source, str):
+            try:
+                os.unlink(source)
+            except FileNotFoundError:
+                pass
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = (end - self.started_at) if self.started_at else 0.0
+            return {
+                "job_id": self.job_id,
+                "filename": self.filename,
+                "status": self.status,
+                "stage": self.stage,
+                "chunks_processed": self.chunks_processed,
+                "elapsed_seconds": round(elapsed, 3),
+                "chunks_per_second": round(self.chunks_processed / elapsed, 2) if elapsed > 0 else 0.0,
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobQueue:
+    """
+    Bounded queue of ingestion jobs drained by a fixed number of asyncio workers.
+    The queue size caps how many uploads can wait (in memory, or spooled to disk).
+    """
+
+    def __init__(self, runner: Callable, concurrency: int, max_pending: int, retention: int):
+        self._runner = runner
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.retention = retention
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._runs: Set[asyncio.Task] = set()  # runner calls still in flight
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Cancel the workers and fail every unfinished job, deleting the uploads they hold."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Jobs still waiting would otherwise keep their spooled files after shutdown
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.status = "failed"
+            job.error = SHUTDOWN_ERROR
+            job.finished_at = time.time()
+            job.release()
+        self._queue = None
+        # A blocking call cannot be interrupted: wait until the threads let go of their uploads
+        await asyncio.gather(*self._runs, return_exceptions=True)
+
+    def submit(
+        self,
+        filename: str,
+        source: Union[bytes, str],
+        ext: str,
+        collection_id: Optional[str] = None,
+        reindex: bool = False,
+    ) -> IngestJob:
+        """
+        Enqueue a job without waiting; raises JobQueueFull when at capacity.
+        The job takes ownership of `source` once it is accepted.
+        """
+        self.start()
+        job = IngestJob(filename, source, ext, collection_id, reindex)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Ingestion queue is full ({self.max_pending} pending jobs)")
+        self._jobs[job.job_id] = job
+        self._trim()
+        return job
+
+    @property
+    def pending(self) -> int:
+        """Jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def _trim(self) -> None:
+        # Forget the oldest finished jobs; queued and running jobs are always kept
+        finished = [jid for jid, j in self._jobs.items() if j.status in ("completed", "failed")]
+        for jid in finished[: max(0, len(finished) - self.retention)]:
+            del self._jobs[jid]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            observe("ingest.queue_wait", job.started_at - job.submitted_at)
+            # Cancelling the worker leaves the run going, since its thread keeps reading the upload
+            run = asyncio.ensure_future(self._runner(job))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+            try:
+                job.result = await asyncio.shield(run)
+                job.status = "completed"
+                job.update("done", job.result["chunk_count"])
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e) or e.__class__.__name__
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = SHUTDOWN_ERROR
+                raise
+            finally:
+                job.finished_at = time.time()
+                # Free the upload as soon as the run has ended, and no sooner
+                if run.done():
+                    job.release()
+                else:
+                    run.add_done_callback(lambda _, job=job: job.release())
+                self._queue.task_done()
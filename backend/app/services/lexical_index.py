@@ -0,0 +1,197 @@
+from collections import Counter
+from typing import Callable, Dict, List, Sequence, Tuple
+import math
+import re
+import sqlite3
+import threading
+import numpy as np
+
+
+# Keeps dotted section numbers ("3.2.1") and formula-ish tokens ("h2o") intact
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "what which who will with how does do about".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    On-disk BM25 inverted index over chunks, stored in SQLite with integer term and
+    chunk ids (postings are a WITHOUT ROWID table keyed by (term, chunk)). Only the
+    chunk id, doc_id and length are kept per chunk; text and metadata live in the
+    vector store. Documents can be added incrementally; re-adding a doc_id replaces it.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS terms (term_id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " chunk INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, doc_id TEXT NOT NULL,"
+            " length INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term_id INTEGER NOT NULL, chunk INTEGER NOT NULL, tf INTEGER NOT NULL,"
+            " PRIMARY KEY (term_id, chunk)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk);"
+            # Documents in scope for the current search; joined instead of binding one parameter each
+            "CREATE TEMP TABLE scope (doc_id TEXT PRIMARY KEY) WITHOUT ROWID;"
+        )
+        # Indexes written before metadata moved out kept a copy of every chunk's text
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        if "meta" in columns:
+            self._conn.executescript(
+                "BEGIN;"
+                "CREATE TABLE chunks_compact ("
+                " chunk INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, doc_id TEXT NOT NULL,"
+                " length INTEGER NOT NULL);"
+                "INSERT INTO chunks_compact SELECT chunk, chunk_id, doc_id, length FROM chunks;"
+                "DROP TABLE chunks;"
+                "ALTER TABLE chunks_compact RENAME TO chunks;"
+                "COMMIT;"
+                "VACUUM;"
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id)")
+        self._conn.commit()
+
+    # ---- Indexing ----
+    def add_document(self, doc_id: str, ids: Sequence[str], metadatas: Sequence[Dict]) -> None:
+        """Index a document's chunks; the text is read from each metadata's "text"."""
+        with self._lock:
+            self._delete(doc_id)
+            term_ids: Dict[str, int] = {}
+            for chunk_id, meta in zip(ids, metadatas):
+                counts = Counter(tokenize(meta.get("text", "")))
+                cur = self._conn.execute(
+                    "INSERT OR REPLACE INTO chunks (chunk_id, doc_id, length) VALUES (?, ?, ?)",
+                    (chunk_id, doc_id, sum(counts.values())),
+                )
+                chunk = cur.lastrowid
+                rows = []
+                for term, tf in counts.items():
+                    if term not in term_ids:
+                        self._conn.execute("INSERT OR IGNORE INTO terms (term) VALUES (?)", (term,))
+                        term_ids[term] = self._conn.execute(
+                            "SELECT term_id FROM terms WHERE term = ?", (term,)
+                        ).fetchone()[0]
+                    rows.append((term_ids[term], chunk, tf))
+                self._conn.executemany("INSERT INTO postings (term_id, chunk, tf) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def _delete(self, doc_id: str) -> None:
+        self._conn.execute(
+            "DELETE FROM postings WHERE chunk IN (SELECT chunk FROM chunks WHERE doc_id = ?)", (doc_id,)
+        )
+        self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+
+    # ---- Search ----
+    def search(self, doc_ids: Sequence[str], query: str, top_k: int = 5) -> List[Tuple[str, float, Dict]]:
+        """
+        BM25 over the chunks of `doc_ids`; returns (chunk_id, score, {"doc_id": ...})
+        tuples. The caller reads the rest of each chunk from the vector store.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not doc_ids:
+            return []
+        with self._lock:
+            self._conn.execute("DELETE FROM scope")
+            self._conn.executemany("INSERT OR IGNORE INTO scope (doc_id) VALUES (?)", [(d,) for d in doc_ids])
+            n_chunks, total_len = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(c.length), 0) FROM chunks c JOIN scope s ON s.doc_id = c.doc_id"
+            ).fetchone()
+            if not n_chunks:
+                return []
+            avgdl = total_len / n_chunks or 1.0
+
+            scores: Dict[int, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.chunk, p.tf, c.length FROM postings p "
+                    "JOIN terms t ON t.term_id = p.term_id JOIN chunks c ON c.chunk = p.chunk "
+                    "JOIN scope s ON s.doc_id = c.doc_id WHERE t.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (n_chunks - len(rows) + 0.5) / (len(rows) + 0.5))
+                for chunk, tf, length in rows:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+                    scores[chunk] = scores.get(chunk, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+            out = []
+            for chunk, score in best:
+                chunk_id, doc_id = self._conn.execute(
+                    "SELECT chunk_id, doc_id FROM chunks WHERE chunk = ?", (chunk,)
+                ).fetchone()
+                out.append((chunk_id, score, {"doc_id": doc_id}))
+        return out
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[str, float, Dict]]],
+    top_k: int,
+    k: int = 60,
+) -> List[Tuple[str, float, Dict]]:
+    """
+    Fuse ranked (id, score, metadata) lists by summing 1 / (k + rank). The result is
+    in fused order but keeps each match's own score (its first ranking's, e.g. the
+    dense similarity); the fused value is added to a copy of its metadata as `fused_score`.
+    """
+    fused: Dict[str, float] = {}
+    firsts: Dict[str, Tuple[float, Dict]] = {}
+    for ranking in rankings:
+        for rank, (mid, score, meta) in enumerate(ranking, start=1):
+            fused[mid] = fused.get(mid, 0.0) + 1.0 / (k + rank)
+            firsts.setdefault(mid, (score, meta))
+    best = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+    return [(mid, firsts[mid][0], {**firsts[mid][1], "fused_score": value}) for mid, value in best]
+
+
+def fuse_hybrid(
+    dense: Sequence[Sequence[Tuple[str, float, Dict]]],
+    lexical: Sequence[Sequence[Tuple[str, float, Dict]]],
+    queries,
+    fetch: Callable[[List[Tuple[str, str]]], Dict[str, Tuple[np.ndarray, Dict]]],
+    top_k: int,
+    k: int = 60,
+) -> List[List[Tuple[str, float, Dict]]]:
+    """
+    Per query, fuse its dense and BM25 rankings by reciprocal rank. BM25 hits the dense
+    search did not return are rehydrated in one `fetch((doc_id, id) list)` call (e.g.
+    `VectorStore.fetch`) and scored by cosine similarity to the query, so every
+    match's score is a dense similarity; the fused value is in its `fused_score`.
+    Hits missing from the vector store are dropped.
+    """
+    seen = [{m[0] for m in ranking} for ranking in dense]
+    missing = sorted({
+        (meta["doc_id"], mid)
+        for ranking, known in zip(lexical, seen)
+        for mid, _, meta in ranking
+        if mid not in known
+    })
+    fetched = fetch(missing) if missing else {}
+
+    out = []
+    for dense_ranking, lexical_ranking, q in zip(dense, lexical, queries):
+        by_id = {m[0]: m for m in dense_ranking}
+        q = np.asarray(q, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        rehydrated = []
+        for mid, _, _ in lexical_ranking:
+            if mid in by_id:
+                rehydrated.append(by_id[mid])
+            elif mid in fetched:
+                vector, meta = fetched[mid]
+                rehydrated.append((mid, float(vector @ q) / float(np.linalg.norm(vector) or 1.0), meta))
+        out.append(reciprocal_rank_fusion([dense_ranking, rehydrated], top_k, k=k))
+    return out
@@ -0,0 +1,394 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import threading
+import time
+from app.config import settings
+from app.utils import metrics
+from app.utils.concurrency import iterate_blocking, run_blocking
+
+
+class ProviderError(RuntimeError):
+    """Every provider failed, timed out or was skipped by its circuit breaker."""
+
+
+class CircuitBreaker:
+    """
+    Closed until `failure_threshold` consecutive failures, then open: calls are
+    refused without waiting for `reset_seconds`, after which one trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False  # a half-open trial call is in flight
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._trial or self._clock() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or self._clock() - self._opened_at < self.reset_seconds:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial = False
+
+    def release(self) -> None:
+        """Give back a half-open trial that ended without a verdict (e.g. a cancelled hedge)."""
+        with self._lock:
+            self._trial = False
+
+
+class Provider(ABC):
+    """Async chat provider: `generate` returns the whole answer, `stream` yields text chunks."""
+
+    name = "provider"
+
+    @abstractmethod
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAIProvider(Provider):
+    """Chat completions over a pooled keep-alive AsyncOpenAI client; retries are left to the router."""
+
+    name = "openai"
+
+    def __init__(self, model: str, timeout: float, max_connections: int):
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        self.model = model
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=timeout,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            ),
+        )
+
+    def _create(self, system_prompt: str, user_prompt: str, stream: bool):
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.1,
+            stream=stream,
+        )
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        response = await self._create(system_prompt, user_prompt, stream=False)
+        return response.choices[0].message.content
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        response = await self._create(system_prompt, user_prompt, stream=True)
+        # Close explicitly: a stream cancelled by a deadline or a lost hedge would
+        # otherwise keep its HTTP response, and pooled connection, open
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def __init__(self, service):
+        self.service = service
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        return await self.service.generate_response_async(system_prompt, user_prompt)
+
+    def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        return self.service.stream_response_async(system_prompt, user_prompt)
+
+
+class ThreadedProvider(Provider):
+    """
+    Adapts a blocking service with `generate_response` / `stream_response` (LocalAI,
+    benchmark fakes) by running it on the 'qa' pool. A deadline stops the wait, not the
+    worker thread, which finishes the call in the background.
+    """
+
+    def __init__(self, name: str, service):
+        self.name = name
+        self.service = service
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        return await run_blocking("qa", self.service.generate_response, system_prompt, user_prompt)
+
+    def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        return iterate_blocking("qa", self.service.stream_response(system_prompt, user_prompt))
+
+
+class _Stats:
+    __slots__ = ("calls", "ok", "errors", "timeouts", "skipped", "hedged", "cancelled", "seconds")
+
+    def __init__(self):
+        self.calls = self.ok = self.errors = self.timeouts = self.skipped = self.hedged = self.cancelled = 0
+        self.seconds = 0.0
+
+
+class LLMRouter:
+    """
+    Sends each prompt to the first healthy provider in preference order, with a
+    deadline per call. A provider that fails or times out is recorded against its
+    circuit breaker and the next one is tried; providers with an open circuit are
+    skipped without waiting. With `hedge_after` > 0, if the current call has not
+    answered (or, when streaming, produced its first token) within that many seconds,
+    the next provider is started alongside it and the first to succeed wins. The
+    `fallback` (LocalAI) is used last, outside deadlines and breakers.
+    """
+
+    def __init__(
+        self,
+        providers: List[Provider],
+        fallback: Optional[Provider] = None,
+        timeout: float = 30.0,
+        hedge_after: float = 0.0,
+        failure_threshold: int = 3,
+        reset_seconds: float = 30.0,
+    ):
+        self.providers = providers
+        self.fallback = fallback
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.breakers = {p.name: CircuitBreaker(failure_threshold, reset_seconds) for p in providers}
+        self._stats: Dict[str, _Stats] = {p.name: _Stats() for p in providers + ([fallback] if fallback else [])}
+        self._lock = threading.Lock()
+
+    def _count(self, provider: Provider, outcome: str, seconds: Optional[float] = None) -> None:
+        with self._lock:
+            stats = self._stats[provider.name]
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            if seconds is not None:
+                stats.calls += 1
+                stats.seconds += seconds
+        if metrics.is_enabled():
+            metrics.LLM_CALLS.inc(provider=provider.name, outcome=outcome)
+            if seconds is not None:
+                metrics.LLM_SECONDS.observe(seconds, provider=provider.name, outcome=outcome)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-provider counters, mean latency and circuit state."""
+        with self._lock:
+            out = {}
+            for name, s in self._stats.items():
+                out[name] = {
+                    "state": self.breakers[name].state if name in self.breakers else "fallback",
+                    "calls": s.calls, "ok": s.ok, "errors": s.errors, "timeouts": s.timeouts,
+                    "skipped": s.skipped, "hedged": s.hedged, "cancelled": s.cancelled,
+                    "mean_seconds": s.seconds / s.calls if s.calls else 0.0,
+                }
+            return out
+
+    async def _attempt(self, provider: Provider, call: Callable[[], Awaitable]):
+        """One deadline-bound call, recorded against the provider's breaker and metrics."""
+        breaker = self.breakers[provider.name]
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(call(), self.timeout)
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            self._count(provider, "timeouts", time.perf_counter() - start)
+            raise
+        except asyncio.CancelledError:
+            breaker.release()
+            self._count(provider, "cancelled", time.perf_counter() - start)
+            raise
+        except Exception:
+            breaker.record_failure()
+            self._count(provider, "errors", time.perf_counter() - start)
+            raise
+        breaker.record_success()
+        self._count(provider, "ok", time.perf_counter() - start)
+        return result
+
+    def _next_provider(self, remaining: List[Provider]) -> Optional[Provider]:
+        while remaining:
+            provider = remaining.pop(0)
+            if self.breakers[provider.name].allow():
+                return provider
+            self._count(provider, "skipped")
+        return None
+
+    async def _race(self, call: Callable[[Provider], Awaitable], discard: Optional[Callable[[Any], Awaitable]] = None):
+        """
+        (provider, result) of the first provider call to succeed, hedging and falling back in order.
+        Calls that succeed in the same round as the winner are lost; `discard` releases their results.
+        """
+        remaining = list(self.providers)
+        running: Dict[asyncio.Task, Provider] = {}
+        errors: List[str] = []
+        try:
+            while True:
+                if not running:
+                    provider = self._next_provider(remaining)
+                    if provider is None:
+                        break
+                    running[asyncio.ensure_future(self._attempt(provider, lambda p=provider: call(p)))] = provider
+                hedge = self.hedge_after > 0 and len(running) == 1 and remaining
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_after if hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    provider = self._next_provider(remaining)
+                    if provider is not None:
+                        self._count(provider, "hedged")
+                        running[asyncio.ensure_future(self._attempt(provider, lambda p=provider: call(p)))] = provider
+                    else:
+                        # Nothing left to hedge with; wait for the call in flight without another hedge
+                        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                # Several calls can finish in one round; the preferred provider wins
+                for task in sorted(done, key=lambda t: self.providers.index(running[t])):
+                    provider = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if winner is None:
+                            winner = provider, task.result()
+                        elif discard is not None:
+                            await discard(task.result())
+                        continue
+                    reason = "timed out" if isinstance(error, asyncio.TimeoutError) else (str(error) or type(error).__name__)
+                    errors.append(f"{provider.name}: {reason}")
+                if winner is not None:
+                    return winner
+        finally:
+            for task in running:
+                task.cancel()
+        if self.fallback is not None:
+            return self.fallback, None
+        raise ProviderError("No LLM provider available" + (f" ({'; '.join(errors)})" if errors else ""))
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        provider, answer = await self._race(lambda p: p.generate(system_prompt, user_prompt))
+        if provider is self.fallback:
+            start = time.perf_counter()
+            answer = await self.fallback.generate(system_prompt, user_prompt)
+            self._count(provider, "ok", time.perf_counter() - start)
+        return answer
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """
+        Stream from the first provider to produce a token (the race above applies to
+        the first token). Later tokens must each arrive within the deadline; a failure
+        after the first token is raised, since the answer is already partly sent.
+        """
+
+        async def first_token(p: Provider) -> Tuple[AsyncIterator[str], Optional[str]]:
+            iterator = p.stream(system_prompt, user_prompt).__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, None
+            except BaseException:
+                await _close(iterator)
+                raise
+
+        provider, opened = await self._race(first_token, discard=lambda lost: _close(lost[0]))
+        if provider is self.fallback:
+            start = time.perf_counter()
+            opened = await first_token(provider)
+            self._count(provider, "ok", time.perf_counter() - start)
+        iterator, token = opened
+        try:
+            if token is None:
+                return
+            yield token
+            while True:
+                try:
+                    if provider is self.fallback:
+                        token = await iterator.__anext__()
+                    else:
+                        token = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                except Exception:
+                    if provider is not self.fallback:
+                        self.breakers[provider.name].record_failure()
+                        self._count(provider, "errors")
+                    raise
+                yield token
+        finally:
+            await _close(iterator)
+
+    async def aclose(self) -> None:
+        for provider in self.providers + ([self.fallback] if self.fallback else []):
+            await provider.aclose()
+
+
+async def _close(iterator) -> None:
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+
+def build_router() -> LLMRouter:
+    """Providers in AI_PROVIDER preference order from the configured API keys, LocalAI as fallback."""
+    from app.services.local_ai import LocalAI
+
+    available: Dict[str, Callable[[], Provider]] = {}
+    if settings.OPENAI_API_KEY:
+        available["openai"] = lambda: OpenAIProvider(
+            settings.OPENAI_CHAT_MODEL, settings.LLM_TIMEOUT, settings.LLM_MAX_CONNECTIONS
+        )
+    if settings.GEMINI_API_KEY:
+        def gemini() -> Provider:
+            from app.services.gemini_service import GeminiService
+            return GeminiProvider(GeminiService())
+        available["gemini"] = gemini
+    preferred = settings.AI_PROVIDER.lower()
+    order = sorted(available, key=lambda name: name != preferred)
+    return LLMRouter(
+        [available[name]() for name in order],
+        fallback=ThreadedProvider("local", LocalAI()),
+        timeout=settings.LLM_TIMEOUT,
+        hedge_after=settings.LLM_HEDGE_AFTER,
+        failure_threshold=settings.LLM_BREAKER_FAILURES,
+        reset_seconds=settings.LLM_BREAKER_RESET,
+    )
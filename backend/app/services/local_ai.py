@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterator, List
 import re
 
 
@@ -38,6 +38,11 @@ The document has been successfully processed and indexed. You can see the releva
         
         return response
     
+    def stream_response(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """Yield the local response word by word, so streaming can be exercised offline."""
+        for token in re.findall(r"\S+\s*|\s+", self.generate_response(system_prompt, user_prompt)):
+            yield token
+
     def is_available(self) -> bool:
         """Local AI is always available."""
         return True
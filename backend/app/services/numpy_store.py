@@ -0,0 +1,318 @@
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import uuid
+import numpy as np
+
+
+DTYPES = ("float32", "float16", "int8")
+
+# Quantized rows are widened to float32 this many at a time while scoring
+_SCORE_BLOCK = 1024
+
+
+def _normalize(vectors) -> np.ndarray:
+    mat = np.asarray(vectors, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat[None, :]
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def quantize(mat: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compact form of a float32 matrix: float16, or int8 with one float32 scale per
+    row (row = int8 * scale). Returns (data, scales); scales is None unless int8.
+    """
+    if dtype == "float16":
+        return mat.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(mat).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.rint(mat / scales[:, None]).astype(np.int8)
+        return data, scales.astype(np.float32)
+    return mat, None
+
+
+def dequantize(data: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    mat = np.asarray(data, dtype=np.float32)
+    return mat * scales[:, None] if scales is not None else mat
+
+
+def _scores(data: np.ndarray, scales: Optional[np.ndarray], q: np.ndarray) -> np.ndarray:
+    """
+    Dot products of every stored row with `q` (one vector, or queries as the columns
+    of a matrix), without widening the whole matrix at once.
+    """
+    if data.dtype == np.float32:
+        return data @ q
+    out = np.empty((len(data),) + q.shape[1:], dtype=np.float32)
+    for start in range(0, len(data), _SCORE_BLOCK):
+        block = data[start:start + _SCORE_BLOCK]
+        out[start:start + len(block)] = block.astype(np.float32) @ q
+    if scales is None:
+        return out
+    return out * (scales if q.ndim == 1 else scales[:, None])
+
+
+class _Handle(NamedTuple):
+    vectors: np.ndarray  # float32, float16 or int8 rows
+    scales: Optional[np.ndarray]  # per-row scale for int8
+    full: Optional[np.ndarray]  # float32 copy for rescoring quantized rows
+    offsets: np.ndarray
+    meta: Optional[mmap.mmap]  # records of the same version, so a later rewrite cannot shift them
+
+
+class NumpyIndex:
+    """
+    In-process vector index: one contiguous matrix of L2-normalized embeddings
+    per doc_id, memory-mapped from `<root>/<doc_id>/<version>/vectors.npy`.
+    Ids, metadata and chunk text live in a JSON-lines side store with a byte
+    offset table, so a query only reads the lines for its top-k hits. Each write
+    goes to a new version directory and `<doc_id>/current` is switched to it in one
+    rename, so readers always see the files of a single version.
+
+    With `dtype` float16 or int8 the matrix is stored quantized and queries scan
+    it instead of float32. When `rescore` is on, a float32 copy is also kept on
+    disk and only the top `top_k * rescore_factor` candidates are read from it
+    and rescored exactly.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_open_docs: int = 256,
+        dtype: str = "float32",
+        rescore: bool = True,
+        rescore_factor: int = 4,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}; use one of {', '.join(DTYPES)}")
+        self.root = root
+        self.max_open_docs = max_open_docs
+        self.dtype = dtype
+        self.rescore = rescore
+        self.rescore_factor = max(1, rescore_factor)
+        self._lock = threading.Lock()
+        self._open: "OrderedDict[str, _Handle]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+
+    def _doc_dir(self, doc_id: str) -> str:
+        # doc_ids are uuids today; keep anything else from escaping the store root
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_.-]", "_", doc_id))
+
+    # ---- Upsert ----
+    def upsert(self, doc_id: str, ids: List[str], vectors, metadatas: List[Dict]) -> None:
+        mat = _normalize(vectors)
+        records = [dict(meta, id=i) for i, meta in zip(ids, metadatas)]
+        doc_dir = self._doc_dir(doc_id)
+
+        with self._lock:
+            self._open.pop(doc_id, None)
+            data_dir = self._data_dir(doc_dir)
+            if data_dir is not None:
+                # Merge with what is already stored; new rows replace rows with the same id
+                old_mat = self._read_full(data_dir)
+                old_records = self._read_all_records(data_dir)
+                replaced = {r["id"] for r in records}
+                keep = [i for i, r in enumerate(old_records) if r["id"] not in replaced]
+                mat = np.concatenate([old_mat[keep], mat]) if keep else mat
+                records = [old_records[i] for i in keep] + records
+            os.makedirs(doc_dir, exist_ok=True)
+            self._write(doc_dir, mat, records, previous=data_dir)
+
+    def _write(self, doc_dir: str, mat: np.ndarray, records: List[Dict], previous: Optional[str] = None) -> None:
+        version = f"v{uuid.uuid4().hex}"
+        data_dir = os.path.join(doc_dir, version)
+        os.makedirs(data_dir)
+        offsets = np.empty(len(records), dtype=np.int64)
+        with open(os.path.join(data_dir, "meta.jsonl"), "wb") as fh:
+            for i, record in enumerate(records):
+                offsets[i] = fh.tell()
+                fh.write(json.dumps(record).encode("utf-8") + b"\n")
+        data, scales = quantize(mat, self.dtype)
+        arrays = {"vectors": data, "offsets": offsets, "scales": scales}
+        if self.dtype != "float32" and self.rescore:
+            arrays["full"] = mat
+        for name, arr in arrays.items():
+            if arr is not None:
+                with open(os.path.join(data_dir, f"{name}.npy"), "wb") as fh:
+                    np.save(fh, arr)
+        # Switching `current` is the one step readers can observe
+        tmp = os.path.join(doc_dir, f"current.{version}.tmp")
+        with open(tmp, "w") as fh:
+            fh.write(version)
+        os.replace(tmp, os.path.join(doc_dir, "current"))
+        # Handles already open keep reading the old version through their memory maps
+        if previous == doc_dir:
+            # Written before versioning, straight into the document directory
+            for name in ("vectors.npy", "offsets.npy", "scales.npy", "full.npy", "meta.jsonl"):
+                try:
+                    os.unlink(os.path.join(doc_dir, name))
+                except OSError:
+                    pass
+        elif previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    @staticmethod
+    def _data_dir(doc_dir: str) -> Optional[str]:
+        """Directory with the current version of a stored document; None if it is not stored."""
+        try:
+            with open(os.path.join(doc_dir, "current")) as fh:
+                return os.path.join(doc_dir, fh.read().strip())
+        except FileNotFoundError:
+            pass
+        # Stores written before versioning keep the files in the document directory itself
+        return doc_dir if os.path.exists(os.path.join(doc_dir, "vectors.npy")) else None
+
+    @staticmethod
+    def _read_full(data_dir: str) -> np.ndarray:
+        """Best available float32 rows of a stored document version."""
+        full_path = os.path.join(data_dir, "full.npy")
+        if os.path.exists(full_path):
+            return np.load(full_path)
+        scales_path = os.path.join(data_dir, "scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        return dequantize(np.load(os.path.join(data_dir, "vectors.npy")), scales)
+
+    @staticmethod
+    def _read_all_records(data_dir: str) -> List[Dict]:
+        with open(os.path.join(data_dir, "meta.jsonl"), "rb") as fh:
+            return [json.loads(line) for line in fh]
+
+    # ---- Query ----
+    def _load(self, doc_id: str) -> Optional[_Handle]:
+        with self._lock:
+            handle = self._open.get(doc_id)
+            if handle is not None:
+                self._open.move_to_end(doc_id)
+                return handle
+            doc_dir = self._doc_dir(doc_id)
+            for attempt in range(3):
+                data_dir = self._data_dir(doc_dir)
+                if data_dir is None:
+                    return None
+                try:
+                    handle = self._open_version(data_dir)
+                    break
+                except FileNotFoundError:
+                    # Another process replaced this version meanwhile; read the new one
+                    if attempt == 2:
+                        raise
+            self._open[doc_id] = handle
+            while len(self._open) > self.max_open_docs:
+                self._open.popitem(last=False)
+            return handle
+
+    @staticmethod
+    def _open_version(data_dir: str) -> _Handle:
+        # Documents keep the dtype they were written with, whatever the current setting
+        def optional(name):
+            path = os.path.join(data_dir, f"{name}.npy")
+            return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+        with open(os.path.join(data_dir, "meta.jsonl"), "rb") as fh:
+            # An empty file cannot be mapped; a document without rows has no records to read
+            meta = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(fh.fileno()).st_size else None
+        return _Handle(
+            np.load(os.path.join(data_dir, "vectors.npy"), mmap_mode="r"),
+            optional("scales"),
+            optional("full"),
+            np.load(os.path.join(data_dir, "offsets.npy"), mmap_mode="r"),
+            meta,
+        )
+
+    @staticmethod
+    def _read_records(handle: _Handle, rows) -> List[Dict]:
+        out = []
+        for row in rows:
+            start = int(handle.offsets[row])
+            out.append(json.loads(handle.meta[start:handle.meta.find(b"\n", start)]))
+        return out
+
+    def fetch(self, doc_id: str, ids: List[str]) -> Dict[str, Tuple[np.ndarray, Dict]]:
+        """Stored float32 vector and metadata of each of `ids` found in the document."""
+        handle = self._load(doc_id)
+        if handle is None or not ids:
+            return {}
+        # Ingestion writes chunk i of a document as row i with id "<hash>-<i>"; check that
+        # guess against the record and scan the document only for ids it does not fit
+        rows: Dict[str, int] = {}
+        for mid in ids:
+            suffix = mid.rsplit("-", 1)[-1]
+            if suffix.isdigit() and int(suffix) < len(handle.offsets):
+                rows[mid] = int(suffix)
+        guessed = self._read_records(handle, list(rows.values()))
+        found = {mid: (row, record) for (mid, row), record in zip(rows.items(), guessed) if record["id"] == mid}
+        if len(found) < len(set(ids)):
+            wanted = set(ids) - set(found)
+            for row in range(len(handle.offsets)):
+                record = self._read_records(handle, [row])[0]
+                if record["id"] in wanted:
+                    found[record["id"]] = (row, record)
+        out = {}
+        for mid, (row, record) in found.items():
+            if handle.full is not None:
+                vector = np.asarray(handle.full[row], dtype=np.float32)
+            else:
+                scales = handle.scales[row:row + 1] if handle.scales is not None else None
+                vector = dequantize(np.asarray(handle.vectors[row:row + 1]), scales)[0]
+            record = dict(record)
+            record.pop("id")
+            out[mid] = (vector, record)
+        return out
+
+    def query(self, doc_id: str, vector, top_k: int = 5) -> List[Tuple[str, float, Dict]]:
+        return self.query_many([doc_id], vector, top_k)
+
+    def query_many(self, doc_ids: List[str], vector, top_k: int = 5) -> List[Tuple[str, float, Dict]]:
+        """
+        Score every chunk of every listed document against one query vector and
+        return the global top-k, merged by score across documents.
+        """
+        return self.query_batch(doc_ids, [vector], top_k)[0]
+
+    def query_batch(self, doc_ids: List[str], vectors, top_k: int = 5) -> List[List[Tuple[str, float, Dict]]]:
+        """
+        `query_many` for several query vectors at once: every document matrix is
+        scored against all queries in one matrix product. One match list per query.
+        """
+        if len(vectors) == 0:
+            return []
+        queries = _normalize(vectors)
+        loaded = [(d, h) for d, h in ((d, self._load(d)) for d in doc_ids) if h is not None and len(h.vectors)]
+        if not loaded or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+        scores = np.concatenate([_scores(h.vectors, h.scales, queries.T) for _, h in loaded])
+        # Row i of `scores` belongs to document j where starts[j] <= i < starts[j + 1]
+        starts = np.cumsum([0] + [len(h.vectors) for _, h in loaded])
+        return [self._top(loaded, starts, scores[:, n], q, top_k) for n, q in enumerate(queries)]
+
+    def _top(self, loaded, starts: np.ndarray, scores: np.ndarray, q: np.ndarray, top_k: int):
+        """The top-k matches of one query given its scores over the stacked document rows."""
+        rescoring = self.rescore and any(h.full is not None for _, h in loaded)
+        n = min(top_k * self.rescore_factor if rescoring else top_k, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        if rescoring:
+            # Exact scores for the shortlisted rows only, read from the float32 copies
+            owners = np.searchsorted(starts, top, side="right") - 1
+            for j in np.unique(owners):
+                full = loaded[j][1].full
+                if full is not None:
+                    rows = top[owners == j]
+                    scores[rows] = full[rows - starts[j]] @ q
+        top = top[np.argsort(-scores[top])][:top_k]
+
+        matches = []
+        for row in top:
+            j = int(np.searchsorted(starts, row, side="right")) - 1
+            doc_id, handle = loaded[j]
+            record = self._read_records(handle, [row - starts[j]])[0]
+            matches.append((record.pop("id"), float(scores[row]), record))
+        return matches
@@ -1,17 +1,91 @@
-from typing import List
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional, Tuple, Union
+import os
+import tempfile
 import fitz # PyMuPDF
+from app.config import settings
+from app.utils.concurrency import get_pool, process_pool_size
 
 
+PdfSource = Union[bytes, str]
+
+
+def _open(source: PdfSource):
+    """Open the PDF; a corrupt, truncated or empty file raises ValueError like the other parsers."""
+    try:
+        if isinstance(source, str):
+            return fitz.open(source)
+        return fitz.open(stream=source, filetype="pdf")
+    except fitz.FileDataError as e:
+        raise ValueError(f"Not a valid PDF file: {e}")
+
+
+def iter_pdf_pages(
+    source: PdfSource, start: int = 0, stop: Optional[int] = None, numbered: bool = False
+) -> Iterator[Union[str, Tuple[int, str]]]:
+    """
+    Yield the text of each non-empty page in [start, stop) as soon as it is decoded.
+    `source` is either the PDF bytes or a path to a PDF on disk. With `numbered`,
+    yields `(page_number, text)` pairs, counting pages from 1.
+    """
+    doc = _open(source)
+    try:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for page_no in range(start, stop):
+            text = doc.load_page(page_no).get_text("text")
+            if text and text.strip():
+                yield (page_no + 1, text) if numbered else text
+    finally:
+        doc.close()
+
+
+def _extract_page_range(path: str, start: int, stop: int, numbered: bool = False) -> List:
+    """Process-pool task: decode one slice of the page range."""
+    return list(iter_pdf_pages(path, start, stop, numbered))
+
+
+def iter_pdf_pages_parallel(
+    source: PdfSource, pool: Optional[Executor] = None, numbered: bool = False
+) -> Iterator[Union[str, Tuple[int, str]]]:
+    """
+    Yield page texts in document order, decoding slices of the page range in a
+    process pool. Small documents (below PDF_PARALLEL_MIN_PAGES) are decoded serially.
+    """
+    doc = _open(source)
+    page_count = doc.page_count
+    doc.close()
+    if (pool is None and process_pool_size() <= 1) or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        yield from iter_pdf_pages(source, numbered=numbered)
+        return
+
+    # Workers open the file by path so the PDF bytes are not pickled once per task
+    tmp_path = None
+    if isinstance(source, bytes):
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(source)
+    path = tmp_path or source
+
+    try:
+        step = max(1, settings.PDF_PAGES_PER_TASK)
+        pool = pool or get_pool("process")
+        futures = [
+            pool.submit(_extract_page_range, path, start, min(start + step, page_count), numbered)
+            for start in range(0, page_count, step)
+        ]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
 
 
 def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> List[str]:
     """
     Extract text from a PDF (bytes) using PyMuPDF, return a list of page texts.
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    pages = []
-    for page in doc:
-        text = page.get_text("text")
-        if text and text.strip():
-            pages.append(text)
-    return pages
\ No newline at end of file
+    return list(iter_pdf_pages(pdf_bytes))
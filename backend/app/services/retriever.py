@@ -1,22 +1,34 @@
-from typing import List, Dict, Tuple
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import importlib.util
+import logging
+import random
+import threading
+import time
+import numpy as np
 from app.config import settings
+from app.utils.concurrency import get_pool
 
 
-try:
-    from pinecone import Pinecone
-    _PC_AVAILABLE = True
-except Exception:  # pragma: no cover
-    _PC_AVAILABLE = False
+# Client libraries are imported when the matching backend is selected, not at import time
+_PC_AVAILABLE = importlib.util.find_spec("pinecone") is not None
+_CHROMA_AVAILABLE = importlib.util.find_spec("chromadb") is not None
 
+logger = logging.getLogger(__name__)
 
-try:
-    import chromadb
-    from chromadb.config import Settings as ChromaSettings
-    _CHROMA_AVAILABLE = True
-except Exception:  # pragma: no cover
-    _CHROMA_AVAILABLE = False
 
 
+class UpsertError(RuntimeError):
+    """
+    Some upsert batches still failed after their retries. `failed` holds the
+    [start, end) row ranges that were not written; ids are stable, so upserting
+    those rows again (or the whole document) resumes without duplicates.
+    """
+
+    def __init__(self, target: str, failed: List[Tuple[int, int]], cause: Exception):
+        rows = sum(end - start for start, end in failed)
+        super().__init__(f"Upsert of {rows} vectors for {target} failed: {cause}")
+        self.failed = failed
 
 
 class VectorStore:
@@ -27,54 +39,216 @@ class VectorStore:
                 raise RuntimeError("pinecone package not installed")
             if not settings.PINECONE_API_KEY:
                 raise RuntimeError("PINECONE_API_KEY not set")
+            from pinecone import Pinecone
             self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
             self.index = self.pc.Index(settings.PINECONE_INDEX_NAME)
         elif self.backend == "chroma":
             if not _CHROMA_AVAILABLE:
                 raise RuntimeError("chromadb package not installed")
+            import chromadb
+            from chromadb.config import Settings as ChromaSettings
             self.client = chromadb.PersistentClient(
                 path=settings.CHROMA_DIR,
                 settings=ChromaSettings(allow_reset=True),
             )
-            # collection per document id; will be created on demand
+            # LRU of per-document collection handles, so each operation skips a lookup round trip
+            self._collections: "OrderedDict[str, object]" = OrderedDict()
+            self._collections_lock = threading.Lock()
+            self._legacy: Optional[frozenset] = None
+            self.shared_layout = settings.CHROMA_LAYOUT.lower() == "shared"
+            if self.shared_layout:
+                # One collection for every document, filtered by doc_id metadata
+                self.shared = self.client.get_or_create_collection(
+                    settings.CHROMA_COLLECTION, metadata={"hnsw:space": "cosine"}
+                )
+            # otherwise: collection per document id; will be created on demand
+        elif self.backend == "numpy":
+            from app.services.numpy_store import NumpyIndex
+            options = dict(
+                max_open_docs=settings.NUMPY_STORE_MAX_OPEN_DOCS,
+                dtype=settings.NUMPY_VECTOR_DTYPE.lower(),
+                rescore=settings.NUMPY_RESCORE,
+                rescore_factor=settings.NUMPY_RESCORE_FACTOR,
+            )
+            ann = settings.NUMPY_ANN.lower()
+            if ann == "none":
+                self.np_index = NumpyIndex(settings.NUMPY_STORE_DIR, **options)
+            else:
+                from app.services.ann_index import AnnIndex
+                self.np_index = AnnIndex(
+                    settings.NUMPY_STORE_DIR,
+                    kind=ann,
+                    min_rows=settings.ANN_MIN_ROWS,
+                    overfetch=settings.ANN_OVERFETCH,
+                    hnsw_m=settings.ANN_HNSW_M,
+                    hnsw_ef_construction=settings.ANN_HNSW_EF_CONSTRUCTION,
+                    hnsw_ef_search=settings.ANN_HNSW_EF_SEARCH,
+                    ivf_lists=settings.ANN_IVF_LISTS,
+                    ivf_probe=settings.ANN_IVF_PROBE,
+                    ivf_train_size=settings.ANN_IVF_TRAIN_SIZE,
+                    checkpoint_seconds=settings.ANN_CHECKPOINT_SECONDS,
+                    **options,
+                )
         else:
-            raise RuntimeError("Unsupported VECTOR_DB. Use 'pinecone' or 'chroma'.")
+            raise RuntimeError("Unsupported VECTOR_DB. Use 'pinecone', 'chroma' or 'numpy'.")
 
 
     # ---- Upsert ----
-    def upsert(self, doc_id: str, ids: List[str], vectors: List[List[float]], metadatas: List[Dict]):
+    def upsert(self, doc_id: str, ids: List[str], vectors, metadatas: List[Dict]):
+        """
+        `vectors` is a float32 matrix (or list of lists), one row per id. Chroma and
+        Pinecone writes are split into UPSERT_BATCH_SIZE requests sent concurrently;
+        each batch is retried on failure, and since both upsert by id a retried or
+        resumed batch never duplicates rows. Raises UpsertError if batches still fail.
+        """
+        if self.backend == "numpy":
+            self.np_index.upsert(doc_id, ids, vectors, metadatas)
+            return
+        write, batch_size = self._writer(doc_id)
+        self._write_batches(f"document {doc_id}", write, batch_size, ids, np.asarray(vectors, dtype=np.float32), metadatas)
+
+    def upsert_many(self, docs: List[Tuple[str, List[str], np.ndarray, List[Dict]]]) -> Dict[str, Exception]:
+        """
+        Upsert several (doc_id, ids, vectors, metadatas) documents. Where every document
+        lands in the same index (Pinecone, Chroma's shared layout) their rows are written
+        together, so small documents still fill whole batches. Returns the error of each
+        document that was not completely written, by doc_id.
+        """
+        if not docs:
+            return {}
+        if self.backend == "pinecone" or (self.backend == "chroma" and self.shared_layout):
+            ids = [i for doc in docs for i in doc[1]]
+            vectors = np.concatenate([np.asarray(doc[2], dtype=np.float32) for doc in docs])
+            metadatas = [m for doc in docs for m in doc[3]]
+            write, batch_size = self._writer(docs[0][0])
+            try:
+                self._write_batches(f"{len(docs)} documents", write, batch_size, ids, vectors, metadatas)
+            except UpsertError as e:
+                # Map the failed row ranges back to the documents they belong to
+                bounds = np.cumsum([0] + [len(doc[1]) for doc in docs])
+                return {
+                    doc[0]: e for k, doc in enumerate(docs)
+                    if any(start < bounds[k + 1] and end > bounds[k] for start, end in e.failed)
+                }
+            return {}
+        errors = {}
+        for doc_id, ids, vectors, metadatas in docs:
+            try:
+                self.upsert(doc_id, ids, vectors, metadatas)
+            except Exception as e:
+                errors[doc_id] = e
+        return errors
+
+    def _writer(self, doc_id: str):
+        """(write(ids=, embeddings=, metadatas=), batch size) for the document's Chroma collection or Pinecone."""
         if self.backend == "pinecone":
-            # Pinecone supports metadata per vector
-            vectors_to_upsert = []
-            for i, (vector, metadata) in enumerate(zip(vectors, metadatas)):
-                vectors_to_upsert.append({
-                    "id": ids[i],
-                    "values": vector,
-                    "metadata": metadata
-                })
-            self.index.upsert(vectors=vectors_to_upsert)
-        elif self.backend == "chroma":
-            # Get or create collection for this document
-            collection_name = f"doc_{doc_id}"
+            return self._pinecone_write, settings.UPSERT_BATCH_SIZE
+        collection = self.shared if self.shared_layout else self._collection(doc_id, create=True)
+        return collection.upsert, min(settings.UPSERT_BATCH_SIZE, self.client.get_max_batch_size())
+
+    def _write_batches(self, label: str, write, batch_size: int, ids: List[str], vectors: np.ndarray,
+                       metadatas: List[Dict]) -> None:
+        batch_size = max(1, batch_size)
+        ranges = [(start, min(start + batch_size, len(ids))) for start in range(0, len(ids), batch_size)]
+
+        def run(bounds: Tuple[int, int]) -> None:
+            start, end = bounds
+            self._with_retries(write, ids=ids[start:end], embeddings=vectors[start:end], metadatas=metadatas[start:end])
+
+        if len(ranges) <= 1:
+            results = [self._capture(run, bounds) for bounds in ranges]
+        else:
+            pool = get_pool("upsert")
+            results = [f.result() for f in [pool.submit(self._capture, run, bounds) for bounds in ranges]]
+        failed = [(bounds, error) for bounds, error in zip(ranges, results) if error is not None]
+        if failed:
+            raise UpsertError(label, [bounds for bounds, _ in failed], failed[0][1])
+
+    @staticmethod
+    def _capture(fn, *args) -> Optional[Exception]:
+        try:
+            fn(*args)
+        except Exception as e:
+            return e
+        return None
+
+    @staticmethod
+    def _with_retries(write, **kwargs) -> None:
+        for attempt in range(settings.UPSERT_RETRIES + 1):
             try:
-                collection = self.client.get_collection(collection_name)
-            except:
-                collection = self.client.create_collection(collection_name)
-            
-            collection.add(
-                ids=ids,
-                embeddings=vectors,
-                metadatas=metadatas
-            )
+                return write(**kwargs)
+            except (TypeError, ValueError):
+                raise  # malformed request; retrying cannot help
+            except Exception:
+                if attempt == settings.UPSERT_RETRIES:
+                    raise
+                # Exponential backoff with jitter so concurrent batches don't retry in lockstep
+                time.sleep(settings.UPSERT_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+
+    def _pinecone_write(self, ids: List[str], embeddings: np.ndarray, metadatas: List[Dict]) -> None:
+        # Pinecone supports metadata per vector; its client wants plain lists
+        self.index.upsert(vectors=[
+            {"id": id_val, "values": vector, "metadata": metadata}
+            for id_val, vector, metadata in zip(ids, embeddings.tolist(), metadatas)
+        ])
+
+    def _collection(self, doc_id: str, create: bool = False):
+        """Cached handle of a per-document Chroma collection; None if it doesn't exist and `create` is off."""
+        name = f"doc_{doc_id}"
+        with self._collections_lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                self._collections.move_to_end(name)
+                return collection
+        if create:
+            collection = self.client.get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
+        else:
+            try:
+                collection = self.client.get_collection(name)
+            except Exception:
+                return None
+        with self._collections_lock:
+            self._collections[name] = collection
+            while len(self._collections) > settings.CHROMA_MAX_CACHED_COLLECTIONS:
+                self._collections.popitem(last=False)
+        return collection
+
+    def _legacy_docs(self, doc_ids: List[str]) -> List[str]:
+        """
+        The `doc_ids` that have a per-document collection: all of them in the per_doc
+        layout; in the shared layout, documents indexed before the switch. The shared
+        layout never creates those collections, so they are listed once per process.
+        """
+        if not self.shared_layout:
+            return list(doc_ids)
+        if self._legacy is None:
+            names = [c if isinstance(c, str) else c.name for c in self.client.list_collections()]
+            self._legacy = frozenset(name[len("doc_"):] for name in names if name.startswith("doc_"))
+        return [doc_id for doc_id in doc_ids if doc_id in self._legacy]
+
+    def flush(self) -> None:
+        """Persist in-memory index state (the NumPy backend's ANN checkpoint); a no-op elsewhere."""
+        if self.backend == "numpy" and hasattr(self.np_index, "flush"):
+            self.np_index.flush()
 
     # ---- Query ----
     def query(self, doc_id: str, vector: List[float], top_k: int = 5) -> List[Tuple[str, float, Dict]]:
         """Query for similar vectors and return (id, score, metadata) tuples."""
+        return self.query_many([doc_id], vector, top_k)
+
+    def query_many(self, doc_ids: List[str], vector: List[float], top_k: int = 5) -> List[Tuple[str, float, Dict]]:
+        """
+        Search several documents in one pass and return the global top-k
+        (id, score, metadata) tuples, merged by score.
+        """
+        if not doc_ids:
+            return []
         if self.backend == "pinecone":
+            doc_filter = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
             results = self.index.query(
                 vector=vector,
                 top_k=top_k,
-                filter={"doc_id": doc_id},
+                filter=doc_filter,
                 include_metadata=True
             )
             matches = []
@@ -82,23 +256,122 @@ class VectorStore:
                 matches.append((match.id, match.score, match.metadata))
             return matches
         elif self.backend == "chroma":
-            collection_name = f"doc_{doc_id}"
-            try:
-                collection = self.client.get_collection(collection_name)
-                results = collection.query(
-                    query_embeddings=[vector],
-                    n_results=top_k
-                )
-                matches = []
-                for i, (id_val, distance, metadata) in enumerate(zip(
-                    results["ids"][0], 
-                    results["distances"][0], 
-                    results["metadatas"][0]
-                )):
-                    # Convert distance to similarity score (1 - distance for cosine similarity)
-                    score = 1 - distance
-                    matches.append((id_val, score, metadata))
-                return matches
-            except:
-                return []
-        return []
\ No newline at end of file
+            matches = []
+            if self.shared_layout:
+                doc_filter = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
+                matches = self._chroma_query(self.shared, vector, top_k, where=doc_filter)
+            # Per-document collections (legacy layout, or documents indexed before the switch)
+            for doc_id in self._legacy_docs(doc_ids):
+                collection = self._collection(doc_id)
+                if collection is None:
+                    continue
+                matches.extend(self._chroma_query(collection, vector, top_k))
+            return sorted(matches, key=lambda m: m[1], reverse=True)[:top_k]
+        elif self.backend == "numpy":
+            return self.np_index.query_many(doc_ids, vector, top_k)
+        return []
+
+    def fetch(self, keys: List[Tuple[str, str]]) -> Dict[str, Tuple[np.ndarray, Dict]]:
+        """
+        Stored vector and metadata of each `(doc_id, id)` that exists, by id: how
+        lexical search hits, which keep no text of their own, are rehydrated and scored.
+        """
+        by_doc: Dict[str, List[str]] = {}
+        for doc_id, mid in keys:
+            by_doc.setdefault(doc_id, []).append(mid)
+        out: Dict[str, Tuple[np.ndarray, Dict]] = {}
+        if not by_doc:
+            return out
+        if self.backend == "numpy":
+            for doc_id, ids in by_doc.items():
+                out.update(self.np_index.fetch(doc_id, ids))
+        elif self.backend == "pinecone":
+            ids = [mid for _, mid in keys]
+            for start in range(0, len(ids), 100):
+                response = self.index.fetch(ids=ids[start:start + 100])
+                for mid, record in response.vectors.items():
+                    out[mid] = (np.asarray(record.values, dtype=np.float32), dict(record.metadata or {}))
+        elif self.backend == "chroma":
+            if self.shared_layout:
+                out.update(self._chroma_get(self.shared, [mid for _, mid in keys]))
+            # Per-document collections (legacy layout, or documents indexed before the switch)
+            for doc_id in self._legacy_docs(list(by_doc)):
+                missing = [mid for mid in by_doc[doc_id] if mid not in out]
+                collection = self._collection(doc_id) if missing else None
+                if collection is not None:
+                    out.update(self._chroma_get(collection, missing))
+        return out
+
+    @staticmethod
+    def _chroma_get(collection, ids: List[str]) -> Dict[str, Tuple[np.ndarray, Dict]]:
+        result = collection.get(ids=ids, include=["embeddings", "metadatas"])
+        return {
+            mid: (np.asarray(vector, dtype=np.float32), dict(meta or {}))
+            for mid, vector, meta in zip(result["ids"], result["embeddings"], result["metadatas"])
+        }
+
+    def query_batch(self, doc_ids: List[str], vectors, top_k: int = 5) -> List[List[Tuple[str, float, Dict]]]:
+        """
+        `query_many` for several query vectors, one match list per query: one matrix
+        product (numpy) or one multi-query request (chroma). Pinecone queries take a
+        single vector, so it falls back to one request per query.
+        """
+        if len(vectors) == 0:
+            return []
+        if not doc_ids:
+            return [[] for _ in range(len(vectors))]
+        if self.backend == "numpy":
+            return self.np_index.query_batch(doc_ids, vectors, top_k)
+        if self.backend == "chroma":
+            vectors = np.asarray(vectors, dtype=np.float32)
+            merged = [[] for _ in range(len(vectors))]
+            if self.shared_layout:
+                doc_filter = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": doc_ids}}
+                merged = self._chroma_query_batch(self.shared, vectors, top_k, where=doc_filter)
+            # Per-document collections (legacy layout, or documents indexed before the switch)
+            for doc_id in self._legacy_docs(doc_ids):
+                collection = self._collection(doc_id)
+                if collection is None:
+                    continue
+                for matches, found in zip(merged, self._chroma_query_batch(collection, vectors, top_k)):
+                    matches.extend(found)
+            return [sorted(m, key=lambda m: m[1], reverse=True)[:top_k] for m in merged]
+        return [self.query_many(doc_ids, vector, top_k) for vector in vectors]
+
+    @staticmethod
+    def _chroma_query(collection, vector: List[float], top_k: int, where: Dict = None) -> List[Tuple[str, float, Dict]]:
+        return VectorStore._chroma_query_batch(collection, [vector], top_k, where)[0]
+
+    @staticmethod
+    def _chroma_query_batch(collection, vectors, top_k: int, where: Dict = None) -> List[List[Tuple[str, float, Dict]]]:
+        try:
+            results = collection.query(
+                query_embeddings=vectors,
+                n_results=top_k,
+                where=where,
+            )
+        except Exception:
+            logger.warning("Chroma query on collection %s failed", collection.name, exc_info=True)
+            return [[] for _ in range(len(vectors))]
+        similarity = _similarity(_space(collection))
+        batches = []
+        for ids, distances, metadatas in zip(results["ids"], results["distances"], results["metadatas"]):
+            batches.append([(id_val, similarity(distance), metadata) for id_val, distance, metadata in zip(ids, distances, metadatas)])
+        return batches
+
+
+def _space(collection) -> str:
+    """Distance a Chroma collection was created with; collections made without one use l2."""
+    space = (collection.metadata or {}).get("hnsw:space")
+    if space is None:
+        config = getattr(collection, "configuration", None) or {}
+        space = (config.get("hnsw") or {}).get("space")
+    return space or "l2"
+
+
+def _similarity(space: str):
+    """Distance -> cosine similarity, so matches from collections of different spaces sort together."""
+    if space == "l2":
+        # Chroma reports squared L2; for unit-length embeddings that is 2 - 2 * cosine
+        return lambda distance: 1 - distance / 2
+    return lambda distance: 1 - distance
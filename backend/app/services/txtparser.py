@@ -1,8 +1,34 @@
-from typing import List
+from io import BytesIO, TextIOWrapper
+from typing import Iterable, Iterator, List, Union
+
+
+def _paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Runs of non-blank lines; a line holding only whitespace ends a paragraph."""
+    paragraph: List[str] = []
+    for line in lines:
+        if line.strip():
+            paragraph.append(line)
+            continue
+        if paragraph:
+            yield "".join(paragraph).strip()
+            paragraph = []
+    if paragraph:
+        yield "".join(paragraph).strip()
 
 
 def extract_text_from_txt_bytes(txt_bytes: bytes) -> List[str]:
-    text = txt_bytes.decode("utf-8", errors="ignore")
-    # Split by double newlines into paragraphs
-    parts = [p.strip() for p in text.split("\n\n") if p.strip()]
-    return parts if parts else ([text] if text.strip() else [])
\ No newline at end of file
+    return list(iter_txt_paragraphs(txt_bytes))
+
+
+def iter_txt_paragraphs(source: Union[bytes, str]) -> Iterator[str]:
+    """
+    Paragraphs of a text file given as bytes or a path. Both are decoded and split
+    the same way, so an upload yields the same paragraphs whether or not it was
+    spooled; files on disk are read line by line, holding only the current paragraph.
+    """
+    if isinstance(source, bytes):
+        with TextIOWrapper(BytesIO(source), encoding="utf-8", errors="ignore") as fh:
+            yield from _paragraphs(fh)
+        return
+    with open(source, "r", encoding="utf-8", errors="ignore") as fh:
+        yield from _paragraphs(fh)
@@ -0,0 +1,76 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, TypeVar
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from app.config import settings
+
+
+T = TypeVar("T")
+
+_pools: Dict[str, Executor] = {}
+_lock = threading.Lock()
+
+
+def _create(name: str) -> Executor:
+    if name == "ingest":
+        return ThreadPoolExecutor(max_workers=settings.INGEST_WORKERS, thread_name_prefix="ingest")
+    if name == "qa":
+        return ThreadPoolExecutor(max_workers=settings.QA_WORKERS, thread_name_prefix="qa")
+    if name == "embed":
+        return ThreadPoolExecutor(max_workers=settings.EMBED_CONCURRENCY, thread_name_prefix="embed")
+    if name == "upsert":
+        return ThreadPoolExecutor(max_workers=settings.UPSERT_CONCURRENCY, thread_name_prefix="upsert")
+    if name == "process":
+        # Never fork: the server is multi-threaded by the time this pool is built, and a
+        # forked child can inherit locks (logging, SQLite, tokenizers) held by other threads
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(max_workers=process_pool_size(), mp_context=multiprocessing.get_context(method))
+    raise ValueError(f"Unknown pool: {name}")
+
+
+def process_pool_size() -> int:
+    return settings.PDF_WORKERS or os.cpu_count() or 1
+
+
+def get_pool(name: str) -> Executor:
+    """
+    Return the shared, bounded executor for a pipeline: 'ingest' (upload stages),
+    'qa' (question answering), 'embed' (embedding requests), 'upsert' (vector store
+    write batches) or 'process' (CPU-bound parsing).
+    Keeping ingestion and QA on separate pools stops large uploads from starving questions.
+    """
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = _create(name)
+        return pool
+
+
+async def run_blocking(pool: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking call on the named pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_pool(pool), call)
+
+
+async def iterate_blocking(pool: str, iterator: Iterator[T]) -> AsyncIterator[T]:
+    """Drive a blocking iterator (e.g. a streaming SDK response) on the named pool."""
+    done = object()
+    while True:
+        item = await run_blocking(pool, next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def shutdown_pools(wait: bool = True) -> None:
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
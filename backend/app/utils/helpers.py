@@ -1,5 +1,9 @@
 import hashlib
-from typing import List
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar, Union
+
+
+T = TypeVar("T")
 
 
 def file_ext(filename: str) -> str:
@@ -13,3 +17,34 @@ def hash_text(texts: List[str]) -> str:
     """Generate a hash from a list of text strings."""
     combined = "|".join(texts)
     return hashlib.md5(combined.encode()).hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """Generate a content hash for raw file bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_source(source: Union[bytes, str], block_size: int = 1 << 20) -> str:
+    """`hash_bytes` of in-memory bytes or of the file at a path, read in blocks."""
+    if isinstance(source, bytes):
+        return hash_bytes(source)
+    digest = hashlib.sha256()
+    with open(source, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield successive lists of at most `size` items from any iterable."""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
@@ -0,0 +1,70 @@
+from typing import Sequence
+from starlette.responses import JSONResponse
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies above `max_bytes` under the given
+    path prefixes with 413: up front when Content-Length already exceeds the limit,
+    otherwise as soon as the streamed body crosses it, before the rest is received.
+    Paths under `exclude` are left to another instance with its own limit.
+    """
+
+    def __init__(self, app, max_bytes: int, prefixes: Sequence[str] = ("/",), exclude: Sequence[str] = ()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.prefixes = tuple(prefixes)
+        self.exclude = tuple(exclude)
+
+    def _reject(self) -> JSONResponse:
+        limit_mb = self.max_bytes / (1024 * 1024)
+        return JSONResponse({"detail": f"Request body too large (> {limit_mb:.0f} MB)"}, status_code=413)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.prefixes)
+            or (self.exclude and scope["path"].startswith(self.exclude))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject()(scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            # Whatever error response the app builds from the aborted read is replaced by a 413
+            if too_large:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large and not started:
+            await self._reject()(scope, receive, send)
@@ -0,0 +1,265 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import threading
+import time
+
+
+T = TypeVar("T")
+
+# Seconds; spans from sub-millisecond cache lookups up to slow LLM calls and uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, List] = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        self.observe_key(value, tuple(sorted(labels.items())))
+
+    def observe_key(self, value: float, key: LabelKey) -> None:
+        """`observe` with the label key already built (sorted (name, value) pairs)."""
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def totals(self) -> Dict[LabelKey, Tuple[int, float]]:
+        """(count, sum) per label set."""
+        with self._lock:
+            return {k: (v[2], v[1]) for k, v in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for key, counts, total, count in sorted(series):
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                lines.append(f"{self.name}_bucket{_labels(key, le=repr(bound))} {running}")
+            lines.append(f'{self.name}_bucket{_labels(key, le="+Inf")} {count}')
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(key)} {value}" for key, value in values)
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(key: LabelKey, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def sample_lines(
+    name: str, kind: str, help_text: str, values: Iterable[Tuple[Dict[str, str], float]]
+) -> List[str]:
+    """Prometheus lines for a counter or gauge whose values are read from elsewhere at scrape time."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(tuple(sorted(labels.items())))} {value}" for labels, value in values)
+    return lines
+
+
+STAGE_SECONDS = Histogram(
+    "studybuddy_stage_seconds",
+    "Time spent in each pipeline stage, excluding nested stages on the same thread.",
+)
+STAGE_ERRORS = Counter("studybuddy_stage_errors_total", "Pipeline stages that raised.")
+REQUEST_SECONDS = Histogram("studybuddy_request_seconds", "HTTP request latency up to the response headers.")
+REQUESTS = Counter("studybuddy_requests_total", "HTTP requests by handler and status.")
+LLM_SECONDS = Histogram(
+    "studybuddy_llm_seconds",
+    "LLM provider call latency (to the answer, or to the first token when streaming) by outcome.",
+)
+LLM_CALLS = Counter(
+    "studybuddy_llm_calls_total", "LLM provider calls by outcome (ok, errors, timeouts, skipped, hedged, cancelled)."
+)
+
+_enabled = True
+# Per-request stage totals (seconds), shared with worker threads through run_blocking's context copy
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+_local = threading.local()
+_stage_keys: Dict[str, LabelKey] = {}
+
+
+def configure(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def begin_request() -> Dict[str, float]:
+    """Start collecting a stage breakdown for the current request context."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a stage timed by the caller (e.g. one that awaits, where `span` does not apply)."""
+    if not _enabled:
+        return
+    key = _stage_keys.get(stage)
+    if key is None:
+        key = _stage_keys[stage] = (("stage", stage),)
+    STAGE_SECONDS.observe_key(seconds, key)
+    timings = _request_timings.get()
+    if timings is not None:
+        # dict updates are atomic under the GIL; concurrent stages of one request may add here
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class span:
+    """
+    Context manager timing a block of synchronous code as `stage`. Time spent in spans
+    nested inside it on the same thread is attributed to those instead. Do not await
+    inside a span: the nesting stack is per thread, and other coroutines would interleave.
+    """
+
+    __slots__ = ("stage", "_start", "_frame", "_stack")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = None
+
+    def __enter__(self) -> "span":
+        if not _enabled:
+            return self
+        try:
+            stack = _local.stack
+        except AttributeError:
+            stack = _local.stack = []
+        self._stack = stack
+        self._frame = [0.0]  # time taken by nested spans
+        stack.append(self._frame)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._start is None:
+            return
+        elapsed = time.perf_counter() - self._start
+        stack = self._stack
+        stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+        observe(self.stage, elapsed - self._frame[0])
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+
+
+def timed(stage: str, fn: Callable[..., T]) -> Callable[..., T]:
+    """`fn` wrapped in `span(stage)`, e.g. for handing to `run_blocking`."""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(stage):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def timed_iter(stage: str, iterator: Iterable[T]) -> Iterator[T]:
+    """
+    Attribute the time spent producing each item of a lazy pipeline stage to `stage`,
+    so interleaved stages (parse -> chunk -> embed) are measured separately.
+    """
+    it = iter(iterator)
+    while True:
+        with span(stage):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in (STAGE_SECONDS, STAGE_ERRORS, REQUEST_SECONDS, REQUESTS, LLM_SECONDS, LLM_CALLS):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    """`Server-Timing` header value for a request's stage breakdown (milliseconds)."""
+    parts = [f"{stage.replace('.', '-')};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times each HTTP request by handler and status and, with
+    `timing_headers`, adds the request's per-stage breakdown as a `Server-Timing` header.
+    """
+
+    def __init__(self, app, timing_headers: bool = False):
+        self.app = app
+        self.timing_headers = timing_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+        timings = begin_request()
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                # The endpoint's name stays unique however routers are nested and prefixed
+                handler = getattr(scope.get("endpoint"), "__name__", "unmatched")
+                status = str(message["status"])
+                REQUEST_SECONDS.observe(elapsed, method=scope["method"], handler=handler)
+                REQUESTS.inc(method=scope["method"], handler=handler, status=status)
+                if self.timing_headers:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(timings, elapsed).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1 @@
+# Benchmarks package. Run from backend/, e.g. `python -m benchmarks.pdf_extraction`.
@@ -0,0 +1,209 @@
+"""
+Approximate nearest-neighbour indexes over synthetic clustered embeddings:
+build time, recall@k against exact search and queries/second across a sweep of
+the search-time knob (IVF nprobe, HNSW ef), plus save/reload time and size on
+disk. `--store` also runs the NumPy store end to end (AnnIndex vs the exact
+NumpyIndex over many documents), including a restart from its checkpoint.
+
+    python -m benchmarks.ann --vectors 100000 --dim 384
+    python -m benchmarks.ann --vectors 1000000 --dim 128 --queries 200
+    python -m benchmarks.ann --vectors 200000 --store
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+def clustered(n: int, dim: int, clusters: int, seed: int, noise: float = 0.6):
+    """`n` unit vectors drawn around `clusters` random centres (embeddings are far from uniform)."""
+    rng = np.random.default_rng(seed)
+    centres = np.random.default_rng(12345).normal(size=(clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 50_000):
+        m = min(50_000, n - start)
+        block = centres[rng.integers(0, clusters, m)] + noise * rng.normal(size=(m, dim)).astype(np.float32)
+        out[start:start + m] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return out
+
+
+def exact_top(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    best = np.empty((len(queries), k), dtype=np.int64)
+    for i in range(0, len(queries), 64):
+        scores = queries[i:i + 64] @ base.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        best[i:i + 64] = np.take_along_axis(top, order, axis=1)
+    return best
+
+
+def recall(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def dir_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def bench_index(kind, base, queries, truth, args, workdir):
+    from app.services.ann_index import HNSWIndex, IVFIndex
+
+    dim = base.shape[1]
+    if kind == "hnsw":
+        index = HNSWIndex(dim, m=args.hnsw_m, ef_construction=args.ef_construction)
+        knob, sweep = "ef", args.ef
+    else:
+        index = IVFIndex(dim, nlist=args.nlist, train_size=args.train_size)
+        knob, sweep = "nprobe", args.nprobe
+    t = time.perf_counter()
+    for start in range(0, len(base), args.batch):
+        index.add(np.arange(start, min(start + args.batch, len(base))), base[start:start + args.batch])
+    build = time.perf_counter() - t
+    extra = f", {index.nlist} lists" if kind == "ivf" else ""
+    print(f"\n{kind}: built {len(base)} vectors in {build:.2f} s ({len(base) / build:.0f} vectors/s{extra})")
+
+    k = args.k
+    rows = []
+    print(f"{knob:>8} {'recall@' + str(k):>10} {'rescored':>9} {'QPS':>9} {'ms/query':>9}")
+    for value in sweep:
+        if kind == "hnsw":
+            index.ef_search = value
+        else:
+            index.nprobe = value
+        raw, rescored = [], []
+        t = time.perf_counter()
+        for q in queries:
+            labels, _ = index.search(q, k * args.overfetch)
+            raw.append(labels[:k])
+            # What the store does with the candidates: exact rescoring from the float32 rows
+            exact = base[labels] @ q
+            rescored.append(labels[np.argsort(-exact)[:k]])
+        elapsed = time.perf_counter() - t
+        row = {knob: value, "recall": recall(raw, truth), "recall_rescored": recall(rescored, truth),
+               "qps": len(queries) / elapsed}
+        rows.append(row)
+        print(f"{value:>8} {row['recall']:>10.3f} {row['recall_rescored']:>9.3f} {row['qps']:>9.0f} "
+              f"{elapsed / len(queries) * 1000:>9.2f}")
+
+    path = os.path.join(workdir, f"index.{kind}")
+    t = time.perf_counter()
+    index.save(path)
+    saved = time.perf_counter() - t
+    live = len(index)
+    del index
+    fresh = HNSWIndex(dim) if kind == "hnsw" else IVFIndex(dim)
+    t = time.perf_counter()
+    fresh.load(path, live)
+    loaded = time.perf_counter() - t
+    size = dir_size(path)
+    print(f"save {saved:.2f} s, reload {loaded:.2f} s (vs build {build:.2f} s), {size / 2**20:.1f} MiB on disk")
+    return {"kind": kind, "build_s": build, "save_s": saved, "reload_s": loaded, "disk_bytes": size, "sweep": rows}
+
+
+def bench_store(base, queries, args, workdir):
+    """AnnIndex vs exact NumpyIndex over `base` split into documents of `--doc-size` chunks."""
+    from app.services.ann_index import AnnIndex
+    from app.services.numpy_store import NumpyIndex
+
+    root = os.path.join(workdir, "store")
+    options = dict(kind=args.kind, min_rows=0, overfetch=args.overfetch, ivf_lists=args.nlist,
+                   ivf_probe=args.nprobe[len(args.nprobe) // 2], ivf_train_size=args.train_size,
+                   hnsw_m=args.hnsw_m, hnsw_ef_construction=args.ef_construction,
+                   hnsw_ef_search=args.ef[len(args.ef) // 2], checkpoint_seconds=float("inf"),
+                   max_open_docs=args.max_open_docs or -(-len(base) // args.doc_size))
+    store = AnnIndex(root, **options)
+    doc_ids = []
+    t = time.perf_counter()
+    for start in range(0, len(base), args.doc_size):
+        doc_id = f"doc{start // args.doc_size}"
+        rows = base[start:start + args.doc_size]
+        ids = [f"{doc_id}-{i}" for i in range(len(rows))]
+        store.upsert(doc_id, ids, rows, [{"text": ""} for _ in ids])
+        doc_ids.append(doc_id)
+    build = time.perf_counter() - t
+    print(f"\nstore ({store.kind}): {len(doc_ids)} documents upserted in {build:.2f} s, "
+          f"{options['max_open_docs']} kept open")
+
+    exact = NumpyIndex(root, max_open_docs=options["max_open_docs"])
+    results = {}
+    for name, index in (("exact", exact), ("ann", store)):
+        t = time.perf_counter()
+        results[name] = [[m[0] for m in matches] for matches in index.query_batch(doc_ids, queries, args.k)]
+        elapsed = time.perf_counter() - t
+        print(f"{name:>6}: {len(queries) / elapsed:>8.0f} QPS ({elapsed / len(queries) * 1000:.2f} ms/query)")
+        results[f"{name}_qps"] = len(queries) / elapsed
+    store_recall = recall(results["ann"], results["exact"])
+    print(f"recall@{args.k} vs exact store: {store_recall:.3f}")
+
+    t = time.perf_counter()
+    store.flush()
+    flushed = time.perf_counter() - t
+    del store
+    t = time.perf_counter()
+    AnnIndex(root, **options)
+    restart = time.perf_counter() - t
+    print(f"checkpoint {flushed:.2f} s; restart from checkpoint {restart:.2f} s (vs {build:.2f} s to build)")
+    return {"documents": len(doc_ids), "build_s": build, "exact_qps": results["exact_qps"],
+            "ann_qps": results["ann_qps"], "recall": store_recall, "checkpoint_s": flushed, "restart_s": restart}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=10_000, help="vectors per add() call")
+    parser.add_argument("--kind", choices=("auto", "ivf", "hnsw"), default="auto")
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--train-size", type=int, default=20_000)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--store", action="store_true", help="also benchmark AnnIndex vs NumpyIndex")
+    parser.add_argument("--doc-size", type=int, default=500, help="chunks per document with --store")
+    parser.add_argument("--max-open-docs", type=int, default=0,
+                        help="store handle cache size with --store (default: every document)")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    from app.services.ann_index import _HNSW_AVAILABLE
+
+    kinds = ["ivf", "hnsw"] if args.kind == "auto" else [args.kind]
+    if "hnsw" in kinds and not _HNSW_AVAILABLE:
+        print("hnswlib is not installed; skipping HNSW")
+        kinds.remove("hnsw")
+    if args.kind == "auto":
+        args.kind = "hnsw" if _HNSW_AVAILABLE else "ivf"
+
+    t = time.perf_counter()
+    base = clustered(args.vectors, args.dim, args.clusters, seed=1)
+    queries = clustered(args.queries, args.dim, args.clusters, seed=2)
+    truth = exact_top(base, queries, args.k)
+    print(f"{args.vectors} x {args.dim} vectors, {args.queries} queries; data + ground truth in "
+          f"{time.perf_counter() - t:.1f} s")
+
+    workdir = tempfile.mkdtemp(prefix="studybuddy-ann-")
+    try:
+        results = {"vectors": args.vectors, "dim": args.dim, "k": args.k,
+                   "indexes": [bench_index(kind, base, queries, truth, args, workdir) for kind in kinds]}
+        if args.store:
+            results["store"] = bench_store(base, queries, args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Ingesting a course of many files: one `/upload/` request per file (sequential,
+and concurrent) vs one `/upload/bulk` request with every file attached, and vs
+one ZIP archive of them. Uses the fake embedder with simulated per-call latency,
+so the pooled embedding rounds show up. A corrupt and an unsupported file are
+mixed into the bulk requests to check that they fail on their own.
+
+    python -m benchmarks.bulk_upload --files 40 --pages 5 --embed-latency 0.02
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+
+async def run(args):
+    os.chdir(tempfile.mkdtemp(prefix="studybuddy-bulk-"))
+    os.environ["VECTOR_DB"] = args.store
+    os.environ["DEDUP_UPLOADS"] = "false"  # every mode indexes the same files again
+    import httpx
+    from benchmarks import corpus, fakes
+
+    fakes.install(latency=args.embed_latency)
+    from app.main import app
+    from app.services.container import container
+
+    formats = ["pdf", "docx", "txt"]
+    files = [(f"lecture{i:03d}.{formats[i % 3]}", corpus.make_document(formats[i % 3], args.pages, seed=i))
+             for i in range(args.files)]
+    bad = [("broken.pdf", b"%PDF-1.4 not really a pdf"), ("slides.pptx", b"PK\x03\x04")]
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files + bad:
+            zf.writestr(f"course/{name}", data)
+    size_mb = sum(len(d) for _, d in files) / 2**20
+    print(f"{args.files} files ({size_mb:.1f} MB, {args.pages} pages each), {args.store}, "
+          f"embed {args.embed_latency * 1000:.0f} ms/call")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def single(name, data):
+            r = await client.post("/upload/", files={"file": (name, data)})
+            r.raise_for_status()
+            return r.json()["chunk_count"]
+
+        async def sequential():
+            return [await single(name, data) for name, data in files], None
+
+        async def concurrent():
+            gate = asyncio.Semaphore(args.concurrency)
+
+            async def limited(name, data):
+                async with gate:
+                    return await single(name, data)
+
+            return await asyncio.gather(*(limited(name, data) for name, data in files)), None
+
+        async def bulk(upload):
+            r = await client.post("/upload/bulk", files=[("files", item) for item in upload])
+            r.raise_for_status()
+            body = r.json()
+            return [item["chunk_count"] for item in body["results"] if not item["error"]], body
+
+        modes = [
+            ("/upload/ sequential", sequential),
+            (f"/upload/ x{args.concurrency} concurrent", concurrent),
+            ("/upload/bulk files", lambda: bulk(files + bad)),
+            ("/upload/bulk zip", lambda: bulk([("course.zip", archive.getvalue())])),
+        ]
+        print(f"{'mode':>26} {'seconds':>8} {'files/s':>8} {'chunks/s':>9} {'embed calls':>12} {'failed':>7}")
+        for label, fn in modes:
+            before = container.embedder.stats.snapshot()["batches"]
+            t = time.perf_counter()
+            counts, body = await fn()
+            seconds = time.perf_counter() - t
+            calls = container.embedder.stats.snapshot()["batches"] - before
+            failed = body["stats"]["failed"] if body else 0
+            print(f"{label:>26} {seconds:>8.2f} {len(counts) / seconds:>8.1f} {sum(counts) / seconds:>9.0f} "
+                  f"{calls:>12} {failed:>7}")
+            if body:
+                s = body["stats"]
+                errors = "; ".join(f"{i['filename']}: {i['error']}" for i in body["results"] if i["error"])
+                print(f"{'':>27}parse {s['parse_seconds']:.2f} s (summed over workers), embed "
+                      f"{s['embed_seconds']:.2f} s, upsert {s['upsert_seconds']:.2f} s; {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--store", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel /upload/ requests")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Chunker comparison: fixed-width character chunks versus the structured chunker
+(token-sized, sentence/paragraph-snapped), on throughput and boundary quality.
+Randomized property checks of the structured chunker live in tests/test_chunking.py.
+
+    python -m benchmarks.chunking --pages 500
+"""
+import argparse
+import random
+import re
+import time
+from app.config import settings
+from app.services.chunker import iter_character_chunks, iter_structured_chunks
+from app.utils.helpers import estimate_tokens
+
+
+# Fixed-width words make a cut word recognisable by its length
+WORD = re.compile(r"^[wW]\d{4}[.]?$")
+
+
+def make_pages(pages: int, seed: int):
+    rng = random.Random(seed)
+
+    def sentence():
+        words = [f"w{rng.randrange(10_000):04d}" for _ in range(rng.randint(4, 30))]
+        return "W" + " ".join(words)[1:] + "."
+
+    out = []
+    for page in range(1, pages + 1):
+        paragraphs = []
+        for _ in range(rng.randint(2, 6)):
+            # Single newlines inside a paragraph mimic PDF line wrapping
+            sents = [sentence() for _ in range(rng.randint(1, 8))]
+            paragraphs.append("\n".join(" ".join(sents[i:i + 2]) for i in range(0, len(sents), 2)))
+        out.append((page, "\n\n".join(paragraphs)))
+    return out
+
+
+def boundary_quality(texts):
+    """Share of chunks that start/end on a sentence boundary, and chunk edges that split a word."""
+    starts = ends = cut = 0
+    for text in texts:
+        words = text.split()
+        starts += words[0][0] == "W" and bool(WORD.match(words[0]))
+        ends += words[-1].endswith(".") and bool(WORD.match(words[-1]))
+        cut += (not WORD.match(words[0])) + (not WORD.match(words[-1]))
+    n = len(texts)
+    return starts / n, ends / n, cut / (2 * n)
+
+
+def run(name, fn, pages, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t = time.perf_counter()
+        texts = fn(pages)
+        best = min(best, time.perf_counter() - t)
+    size_mb = sum(len(text) for _, text in pages) / 1e6
+    tokens = sorted(estimate_tokens(t) for t in texts)
+    start, end, cut = boundary_quality(texts)
+    print(
+        f"{name:>10} {len(texts):>7} {size_mb / best:>8.1f} {sum(tokens) / len(tokens):>7.0f} "
+        f"{tokens[int(len(tokens) * 0.95)]:>5} {start:>7.1%} {end:>7.1%} {cut:>7.1%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, seed=1)
+    print(
+        f"{sum(len(t) for _, t in pages) / 1e6:.1f} MB over {args.pages} pages; "
+        f"character {settings.CHUNK_SIZE}/{settings.CHUNK_OVERLAP} chars, "
+        f"structured {settings.CHUNK_TOKENS}/{settings.CHUNK_OVERLAP_TOKENS} tokens"
+    )
+    print(f"{'chunker':>10} {'chunks':>7} {'MB/s':>8} {'mean tk':>7} {'p95':>5} {'starts':>7} {'ends':>7} {'cut':>7}")
+    run("character", lambda p: list(iter_character_chunks(
+        (t for _, t in p), settings.CHUNK_SIZE, settings.CHUNK_OVERLAP
+    )), pages, args.repeats)
+    run("structured", lambda p: [c["text"] for c in iter_structured_chunks(
+        p, settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS
+    )], pages, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Prompt context size: naive chunk concatenation versus merged, deduplicated and
+budgeted context assembly, on retrievals that mix neighbouring chunks and repeats.
+
+    python -m benchmarks.context_assembly --top-k 5 10 20 --budget 3000
+"""
+import argparse
+import random
+import time
+from app.config import settings
+from app.services.chunker import iter_character_chunks
+from app.services.context import assemble_context
+
+
+def make_document(words: int, seed: int) -> str:
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def retrieval(chunks, doc_id: str, top_k: int, rng: random.Random):
+    """Runs of neighbouring chunks (as dense search tends to return) plus copied boilerplate."""
+    picked = set()
+    while len(picked) < min(top_k, len(chunks)):
+        start = rng.randrange(len(chunks))
+        picked.update(range(start, min(start + rng.randint(1, 3), len(chunks))))
+    matches = [
+        (f"{doc_id}-{i}", 1.0 - n * 0.01, {"doc_id": doc_id, "chunk": i, "text": chunks[i], "filename": "doc.pdf"})
+        for n, i in enumerate(sorted(picked)[:top_k])
+    ]
+    # The same passage indexed under another document (e.g. a re-uploaded edition)
+    dup = matches[0][2]
+    matches.append((f"copy-{dup['chunk']}", 0.5, {**dup, "doc_id": "copy"}))
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--budget", type=int, default=settings.CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    chunks = list(iter_character_chunks(
+        [make_document(40_000, seed=1)], chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP
+    ))
+    rng = random.Random(7)
+    print(f"chunk_size={settings.CHUNK_SIZE} overlap={settings.CHUNK_OVERLAP} budget={args.budget}")
+    print(f"{'top_k':>6} {'naive tok':>10} {'packed tok':>11} {'saved':>7} {'dups':>5} {'us/call':>8}")
+    for top_k in args.top_k:
+        naive = packed = dups = 0
+        seconds = 0.0
+        for _ in range(args.queries):
+            matches = retrieval(chunks, "doc", top_k, rng)
+            t = time.perf_counter()
+            _, usage = assemble_context(
+                matches, args.budget, settings.CONTEXT_DEDUP_THRESHOLD, settings.CHUNK_OVERLAP
+            )
+            seconds += time.perf_counter() - t
+            naive += usage["naive_tokens"]
+            packed += usage["context_tokens"]
+            dups += usage["dropped_duplicates"]
+        n = args.queries
+        print(
+            f"{top_k:>6} {naive / n:>10.0f} {packed / n:>11.0f} {1 - packed / naive:>7.1%} "
+            f"{dups / n:>5.2f} {seconds / n * 1e6:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Deterministic synthetic study material as PDF, DOCX or TXT bytes.
+
+Each document is a sequence of "pages" of topic paragraphs built from a seeded
+vocabulary, so a corpus is reproducible from (seed, pages) and questions about a
+topic have a known best-matching passage.
+"""
+from typing import List, Tuple
+import io
+import random
+
+
+TOPICS = [
+    ("osmosis", "water membrane solute concentration gradient diffusion cell"),
+    ("photosynthesis", "chlorophyll light glucose carbon dioxide oxygen chloroplast"),
+    ("mitochondria", "ATP respiration electron transport chain oxidative phosphorylation"),
+    ("enzymes", "catalyst substrate active site activation energy inhibition"),
+    ("dna replication", "helicase polymerase primer leading strand lagging strand okazaki"),
+    ("plate tectonics", "crust mantle subduction rift earthquake continental drift"),
+    ("supply and demand", "price equilibrium market surplus shortage elasticity"),
+    ("newtons laws", "force mass acceleration inertia momentum reaction"),
+    ("french revolution", "monarchy estates bastille republic napoleon tax"),
+    ("recursion", "base case stack call function induction termination"),
+]
+
+_FILLER = (
+    "the of and a in is that for it as was with be by on not this are at from "
+    "which can also these their has have been more when into most other some"
+).split()
+
+
+def _paragraph(rng: random.Random, topic: Tuple[str, str], sentences: int) -> str:
+    name, terms = topic
+    words = terms.split()
+    out = []
+    for _ in range(sentences):
+        body = [rng.choice(words if rng.random() < 0.35 else _FILLER) for _ in range(rng.randint(10, 22))]
+        out.append(f"In {name}, " + " ".join(body) + ".")
+    return " ".join(out)
+
+
+def make_pages(pages: int, seed: int = 0, paragraphs_per_page: int = 4) -> List[List[str]]:
+    """Paragraphs of each page; every page covers one topic, cycling through TOPICS."""
+    rng = random.Random(seed)
+    offset = rng.randrange(len(TOPICS))
+    return [
+        [_paragraph(rng, TOPICS[(offset + p) % len(TOPICS)], rng.randint(3, 6)) for _ in range(paragraphs_per_page)]
+        for p in range(pages)
+    ]
+
+
+def to_txt(pages: List[List[str]]) -> bytes:
+    return "\n\n".join(p for page in pages for p in page).encode()
+
+
+def to_pdf(pages: List[List[str]]) -> bytes:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for page_paragraphs in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 800), "\n\n".join(page_paragraphs), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def to_docx(pages: List[List[str]]) -> bytes:
+    from docx import Document
+    from docx.enum.text import WD_BREAK
+
+    doc = Document()
+    for i, page_paragraphs in enumerate(pages):
+        for text in page_paragraphs:
+            doc.add_paragraph(text)
+        if i < len(pages) - 1:
+            doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def make_document(fmt: str, pages: int, seed: int = 0) -> bytes:
+    """A synthetic document of `pages` pages in `fmt` ("pdf", "docx" or "txt")."""
+    content = make_pages(pages, seed)
+    if fmt == "pdf":
+        return to_pdf(content)
+    if fmt == "docx":
+        return to_docx(content)
+    if fmt == "txt":
+        return to_txt(content)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def questions(n: int, seed: int = 0) -> List[str]:
+    """Questions that each target one of the corpus topics."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        name, terms = TOPICS[i % len(TOPICS)]
+        picked = rng.sample(terms.split(), 2)
+        out.append(f"How does {picked[0]} relate to {picked[1]} in {name}? ({i})")
+    return out
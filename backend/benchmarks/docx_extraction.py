@@ -0,0 +1,132 @@
+"""
+DOCX text extraction: the streaming parser (incremental XML over the ZIP
+container) vs the python-docx object model it replaced, on synthetic documents
+with many pages, tables and incompressible embedded images. Each run happens in
+a fresh process, so peak RSS is measured per parser; time is the median of
+`--repeat` runs. Also checks that the body paragraphs match python-docx and
+counts the table rows only the streaming parser returns.
+
+    python -m benchmarks.docx_extraction --pages 500 --tables 50 --images 40 --image-kb 500
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def make_docx(path: str, pages: int, tables: int, images: int, image_kb: int, seed: int = 0) -> None:
+    import fitz
+    from docx import Document
+    from docx.enum.text import WD_BREAK
+    from docx.shared import Inches
+    from benchmarks import corpus
+
+    side = max(8, int((image_kb * 1024 / 3) ** 0.5))
+    doc = Document()
+    content = corpus.make_pages(pages, seed)
+    for i, page_paragraphs in enumerate(content):
+        for text in page_paragraphs:
+            doc.add_paragraph(text)
+        if tables and i % max(1, pages // tables) == 0:
+            table = doc.add_table(rows=6, cols=4)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"Table {i} row {r} column {c}: {page_paragraphs[0][:40]}"
+        if images and i % max(1, pages // images) == 0:
+            # Random pixels do not compress, so the media part is as large as the image
+            pix = fitz.Pixmap(fitz.csRGB, side, side, os.urandom(side * side * 3), False)
+            doc.add_picture(io.BytesIO(pix.tobytes("png")), width=Inches(2))
+        if i < pages - 1:
+            doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+    doc.save(path)
+
+
+def python_docx_paragraphs(path: str):
+    """The previous extractor: every body paragraph of the python-docx object model."""
+    from docx import Document
+
+    for para in Document(path).paragraphs:
+        text = para.text.strip()
+        if text:
+            yield text
+
+
+def _rss_mb(field: str) -> float:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _measure(parser: str, path: str):
+    """Child process: (seconds, blocks, characters, peak RSS above the pre-parse baseline in MB)."""
+    from app.services.docs_parser import iter_docx_blocks
+
+    parse = iter_docx_blocks if parser == "streaming" else python_docx_paragraphs
+    baseline = _rss_mb("VmRSS")
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")  # reset the high-water mark to the current RSS
+    except OSError:
+        pass
+    t = time.perf_counter()
+    blocks = chars = 0
+    for text in parse(path):  # consumed as ingestion does, without keeping the list
+        blocks += 1
+        chars += len(text)
+    seconds = time.perf_counter() - t
+    return seconds, blocks, chars, _rss_mb("VmHWM") - baseline
+
+
+def _blocks(parser: str, path: str):
+    from app.services.docs_parser import iter_docx_blocks
+
+    return list(iter_docx_blocks(path) if parser == "streaming" else python_docx_paragraphs(path))
+
+
+def run_isolated(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--image-kb", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="studybuddy-docx-")
+    path = os.path.join(workdir, "large.docx")
+    t = time.perf_counter()
+    make_docx(path, args.pages, args.tables, args.images, args.image_kb)
+    print(f"{args.pages} pages, {args.tables} tables, {args.images} images: "
+          f"{os.path.getsize(path) / 2**20:.1f} MB on disk, built in {time.perf_counter() - t:.1f} s")
+
+    print(f"{'parser':>12} {'seconds':>8} {'blocks':>7} {'chars':>9} {'peak MB':>8}")
+    for name in ("python-docx", "streaming"):
+        runs = [run_isolated(_measure, name, path) for _ in range(args.repeat)]
+        seconds = statistics.median(r[0] for r in runs)
+        peak = statistics.median(r[3] for r in runs)
+        _, blocks, chars, _ = runs[0]
+        print(f"{name:>12} {seconds:>8.3f} {blocks:>7} {chars:>9} {peak:>8.1f}")
+
+    old = run_isolated(_blocks, "python-docx", path)
+    new = run_isolated(_blocks, "streaming", path)
+    remaining = iter(new)
+    same = all(any(block == text for block in remaining) for text in old)  # old is a subsequence of new
+    print(f"python-docx paragraphs all present, in order: {same}; "
+          f"{len(new) - len(old)} extra blocks (table rows)")
+    os.unlink(path)
+    os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+End-to-end benchmark: ingest a synthetic PDF/DOCX/TXT corpus through `/upload/`,
+then load `/qa/` and `/qa/stream`, all in-process against `app.main:app` with the
+fake embedder and chat provider and a vector store in a temp dir. No API keys or
+network are needed.
+
+Reports ingest throughput (pages/s, chunks/s), QA latency percentiles, streamed
+time to first token, peak RSS per phase and the per-stage time breakdown, and
+writes them as JSON; `--compare` checks a run against a saved baseline and exits
+non-zero on regressions beyond `--tolerance`.
+
+    python -m benchmarks.e2e --docs 3 --pages 20 --questions 200 --output e2e.json
+    python -m benchmarks.e2e --compare e2e.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+
+# (result path, True when higher is better) checked by --compare
+KEY_METRICS = [
+    ("ingest.pages_per_s", True),
+    ("ingest.chunks_per_s", True),
+    ("qa.throughput_rps", True),
+    ("qa.latency_ms.p50", False),
+    ("qa.latency_ms.p95", False),
+    ("qa.latency_ms.p99", False),
+    ("qa_stream.ttft_ms.p50", False),
+    ("memory.peak_rss_mb", False),
+]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+
+    def pct(p):
+        return ordered[max(0, min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1)))))]
+
+    return {
+        "mean": round(statistics.mean(ordered), 3),
+        "p50": round(pct(50), 3),
+        "p90": round(pct(90), 3),
+        "p95": round(pct(95), 3),
+        "p99": round(pct(99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class RssSampler:
+    """Samples this process's RSS in a background thread; `peak()` since the last `reset()`."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self._peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def rss_mb() -> float:
+        try:
+            with open("/proc/self/status") as fh:
+                for line in fh:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        # Not Linux: fall back to the lifetime peak (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._peak = max(self._peak, self.rss_mb())
+            time.sleep(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def reset(self):
+        self._peak = self.rss_mb()
+
+    def peak(self) -> float:
+        return round(max(self._peak, self.rss_mb()), 1)
+
+
+def git_rev() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+async def run(args) -> Dict:
+    # Settings are read at import time, so configure the app before importing it
+    workdir = tempfile.mkdtemp(prefix="studybuddy-e2e-")
+    os.chdir(workdir)
+    os.environ["VECTOR_DB"] = args.store
+    os.environ["ANSWER_CACHE_ENABLED"] = "true" if args.answer_cache else "false"
+    os.environ["OPENAI_API_KEY"] = ""
+    os.environ["GEMINI_API_KEY"] = ""
+
+    import httpx
+    from benchmarks import corpus, fakes
+    from app.utils import metrics
+
+    fakes.install(
+        latency=args.embed_latency,
+        chat=fakes.FakeChat(latency=args.chat_latency, token_latency=args.token_latency),
+    )
+    from app.main import app
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    files = []
+    t0 = time.perf_counter()
+    for fmt in formats:
+        for i in range(args.docs):
+            data = corpus.make_document(fmt, args.pages, seed=args.seed * 1000 + len(files))
+            files.append((fmt, f"{fmt}-{i}.{fmt}", data))
+    print(f"generated {len(files)} documents ({sum(len(f[2]) for f in files) / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+    sampler = RssSampler()
+    sampler.start()
+    rss_start = sampler.rss_mb()
+    result: Dict = {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # One small upload and question first so store and index setup are not counted
+        r = await client.post("/upload/", files={"file": ("warmup.txt", corpus.make_document("txt", 1, seed=-1))})
+        r.raise_for_status()
+        await client.post("/qa/", json={"question": "warm-up", "doc_id": r.json()["doc_id"]})
+
+        # ---- Ingest ----
+        sampler.reset()
+        doc_ids = []
+        by_format: Dict[str, Dict] = {fmt: {"documents": 0, "pages": 0, "chunks": 0, "bytes": 0, "seconds": 0.0}
+                                      for fmt in formats}
+        upload_gate = asyncio.Semaphore(args.upload_concurrency)
+
+        async def upload(fmt, name, data):
+            async with upload_gate:
+                t = time.perf_counter()
+                r = await client.post(
+                    "/upload/", files={"file": (name, data)}, data={"collection_id": "e2e"}
+                )
+                r.raise_for_status()
+                stats = by_format[fmt]
+                stats["seconds"] += time.perf_counter() - t
+                stats["documents"] += 1
+                stats["pages"] += args.pages
+                stats["chunks"] += r.json()["chunk_count"]
+                stats["bytes"] += len(data)
+                doc_ids.append(r.json()["doc_id"])
+
+        t = time.perf_counter()
+        await asyncio.gather(*(upload(*f) for f in files))
+        ingest_seconds = time.perf_counter() - t
+        pages = sum(s["pages"] for s in by_format.values())
+        chunks = sum(s["chunks"] for s in by_format.values())
+        size = sum(s["bytes"] for s in by_format.values())
+        for stats in by_format.values():
+            stats["pages_per_s"] = round(stats["pages"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+            stats["seconds"] = round(stats["seconds"], 3)
+        result["ingest"] = {
+            "documents": len(files),
+            "pages": pages,
+            "chunks": chunks,
+            "bytes": size,
+            "seconds": round(ingest_seconds, 3),
+            "pages_per_s": round(pages / ingest_seconds, 2),
+            "chunks_per_s": round(chunks / ingest_seconds, 2),
+            "mb_per_s": round(size / 1e6 / ingest_seconds, 3),
+            "by_format": by_format,
+        }
+        peak_ingest = sampler.peak()
+
+        # ---- QA ----
+        sampler.reset()
+        rng = random.Random(args.seed)
+        questions = corpus.questions(args.questions, seed=args.seed)
+        gate = asyncio.Semaphore(args.concurrency)
+        latencies, errors = [], 0
+
+        def scope():
+            if args.scope == "collection":
+                return {"collection_id": "e2e"}
+            return {"doc_id": rng.choice(doc_ids)}
+
+        async def ask(question):
+            nonlocal errors
+            async with gate:
+                t = time.perf_counter()
+                r = await client.post("/qa/", json={"question": question, "top_k": args.top_k, **scope()})
+                if r.status_code != 200:
+                    errors += 1
+                    return
+                latencies.append((time.perf_counter() - t) * 1000)
+
+        t = time.perf_counter()
+        await asyncio.gather(*(ask(q) for q in questions))
+        qa_seconds = time.perf_counter() - t
+        result["qa"] = {
+            "requests": len(questions),
+            "errors": errors,
+            "concurrency": args.concurrency,
+            "scope": args.scope,
+            "seconds": round(qa_seconds, 3),
+            "throughput_rps": round(len(latencies) / qa_seconds, 2),
+            "latency_ms": percentiles(latencies),
+        }
+
+        # ---- Streaming QA: time to first token as reported by the server ----
+        ttfts = []
+        for question in questions[: max(1, args.questions // 4)]:
+            r = await client.post("/qa/stream", json={"question": question, "top_k": args.top_k, **scope()})
+            for block in r.text.split("\n\n"):
+                if block.startswith("event: done"):
+                    ttfts.append(json.loads(block.split("data: ", 1)[1])["ttft_ms"])
+        result["qa_stream"] = {"requests": len(ttfts), "ttft_ms": percentiles(ttfts)}
+        peak_qa = sampler.peak()
+
+    sampler.stop()
+    result["memory"] = {
+        "rss_start_mb": round(rss_start, 1),
+        "peak_rss_ingest_mb": peak_ingest,
+        "peak_rss_qa_mb": peak_qa,
+        "peak_rss_mb": max(peak_ingest, peak_qa),
+    }
+    result["stages"] = {
+        dict(key)["stage"]: {"count": count, "total_s": round(total, 4), "mean_ms": round(total / count * 1000, 3)}
+        for key, (count, total) in sorted(metrics.STAGE_SECONDS.totals().items())
+        if count
+    }
+    return result
+
+
+def lookup(result: Dict, path: str):
+    value = result
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> bool:
+    """Print each key metric against the baseline; False if any regressed beyond `tolerance`."""
+    ok = True
+    print(f"\n{'metric':<26} {'baseline':>11} {'current':>11} {'change':>8}")
+    for path, higher_is_better in KEY_METRICS:
+        old, new = lookup(baseline, path), lookup(result, path)
+        if not old or new is None:
+            continue
+        change = new / old - 1
+        regressed = (-change if higher_is_better else change) > tolerance
+        ok &= not regressed
+        print(f"{path:<26} {old:>11.2f} {new:>11.2f} {change * 100:>+7.1f}%{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def _workload(config: Dict) -> Dict:
+    return {k: v for k, v in config.items() if k not in ("output", "compare", "tolerance")}
+
+
+def print_summary(result: Dict) -> None:
+    ingest, qa, stream, mem = result["ingest"], result["qa"], result["qa_stream"], result["memory"]
+    print(f"ingest: {ingest['documents']} docs, {ingest['pages']} pages, {ingest['chunks']} chunks in "
+          f"{ingest['seconds']:.2f}s -> {ingest['pages_per_s']:.1f} pages/s, {ingest['chunks_per_s']:.1f} chunks/s")
+    for fmt, stats in ingest["by_format"].items():
+        print(f"  {fmt:>5}: {stats['pages_per_s']:.1f} pages/s ({stats['chunks']} chunks)")
+    lat = qa["latency_ms"]
+    print(f"qa: {qa['requests']} requests x{qa['concurrency']}, {qa['errors']} errors, {qa['throughput_rps']:.1f} req/s; "
+          f"ms p50 {lat['p50']:.1f} p95 {lat['p95']:.1f} p99 {lat['p99']:.1f}")
+    if stream["ttft_ms"]:
+        print(f"qa/stream: ttft ms p50 {stream['ttft_ms']['p50']:.1f} p95 {stream['ttft_ms']['p95']:.1f}")
+    print(f"memory: start {mem['rss_start_mb']:.0f} MB, peak ingest {mem['peak_rss_ingest_mb']:.0f} MB, "
+          f"peak qa {mem['peak_rss_qa_mb']:.0f} MB")
+    print("stages (mean ms / total s):")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<22} {stats['mean_ms']:>9.3f} {stats['total_s']:>9.3f}  x{stats['count']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", default="pdf,docx,txt")
+    parser.add_argument("--docs", type=int, default=3, help="Documents per format")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per document")
+    parser.add_argument("--upload-concurrency", type=int, default=1)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent /qa/ requests")
+    parser.add_argument("--scope", choices=["doc", "collection"], default="doc")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--store", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the answer cache on")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Simulated seconds per embedding batch")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="Simulated seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Simulated seconds per answer token")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --output run")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    result = asyncio.run(run(args))
+    result["meta"] = {
+        "benchmark": "e2e",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+    }
+    print_summary(result)
+
+    if output:
+        with open(output, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"\nresults written to {output}")
+    if baseline_path:
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+        if _workload(baseline.get("meta", {}).get("config", {})) != _workload(result["meta"]["config"]):
+            print("note: baseline was run with different workload options")
+        if not compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Batched embedding throughput with a fake backend that injects latency and failures.
+
+    python -m benchmarks.embed_batching --texts 5000 --latency 0.05 --fail-rate 0.1
+"""
+import argparse
+import random
+import threading
+import time
+import numpy as np
+from app.config import settings
+from benchmarks.fakes import FakeEmbedder
+
+
+class FlakyEmbedder(FakeEmbedder):
+    """Fails a fraction of requests and rejects batches over the provider item limit."""
+
+    def __init__(self, fail_rate: float, provider_max_items: int, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_rate = fail_rate
+        self.provider_max_items = provider_max_items
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(7)
+
+    def _encode(self, texts):
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.fail_rate
+        if len(texts) > self.provider_max_items:
+            raise ValueError(f"batch of {len(texts)} exceeds provider limit")
+        if fail:
+            time.sleep(self.latency)
+            raise ConnectionError("injected failure")
+        return super()._encode(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    texts = [f"chunk {i} about enzymes, substrates and activation energy" for i in range(args.texts)]
+    settings.EMBED_RETRY_BACKOFF = 0.01
+    print(f"{'concurrency':>11} {'seconds':>8} {'texts/s':>8} {'calls':>6} {'retries':>8} {'mean batch ms':>14}")
+    for c in args.concurrency:
+        settings.EMBED_CONCURRENCY = c
+        from app.utils.concurrency import shutdown_pools
+        shutdown_pools()  # rebuild the embed pool at the new size
+        emb = FlakyEmbedder(args.fail_rate, settings.EMBED_MAX_BATCH_ITEMS, latency=args.latency)
+        t0 = time.perf_counter()
+        vectors = emb.embed(texts)
+        elapsed = time.perf_counter() - t0
+        assert np.allclose(vectors, FakeEmbedder()._encode(texts), atol=1e-6), "results out of input order"
+        stats = emb.stats.snapshot()
+        print(
+            f"{c:>11} {elapsed:>8.2f} {len(texts) / elapsed:>8.0f} {emb.calls:>6} "
+            f"{stats['retries']:>8} {stats['mean_batch_seconds'] * 1000:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
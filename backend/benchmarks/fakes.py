@@ -0,0 +1,174 @@
+"""Deterministic offline stand-ins for external backends used by the benchmarks."""
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from app.services import embedder as embedder_module
+from app.services.llm import Provider
+
+
+class FakeEmbedder(embedder_module.Embedder):
+    """Hashes words into a fixed-size unit vector; `latency` simulates a remote/model call per batch."""
+
+    def __init__(self, dim: int = 64, latency: float = 0.0, cache=None):
+        self.dim = dim
+        self.latency = latency
+        self.use_openai = False
+        self.client = None
+        self.local_model = None
+        self.model_name = f"fake/hash-{dim}"
+        self.cache = cache
+        self.stats = embedder_module.BatchStats()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        out = []
+        for text in texts:
+            vec = [0.0] * self.dim
+            for word in text.lower().split():
+                vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+            norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+            out.append([v / norm for v in vec])
+        return out
+
+
+class FakeChat:
+    """
+    Chat provider with the LocalAI interface: answers with the first context line after
+    `latency` seconds, streaming `tokens` words `token_latency` seconds apart.
+    """
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0, tokens: int = 60):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+
+    def _answer(self, user_prompt: str) -> List[str]:
+        context = re.search(r"Context:\s*(.+?)\s*Question:", user_prompt, re.DOTALL)
+        words = (context.group(1) if context else "No context.").split()
+        return [w + " " for w in words[: self.tokens]]
+
+    def generate_response(self, system_prompt: str, user_prompt: str) -> str:
+        time.sleep(self.latency + self.token_latency * self.tokens)
+        return "".join(self._answer(user_prompt))
+
+    def stream_response(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        time.sleep(self.latency)
+        for word in self._answer(user_prompt):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield word
+
+    def is_available(self) -> bool:
+        return True
+
+
+class FakePineconeIndex:
+    """
+    In-memory stand-in for a Pinecone index's `upsert`: each request sleeps `latency`
+    plus `per_vector` seconds per vector, fails transiently with probability
+    `failure_rate`, and rejects requests over `max_vectors` like the real service.
+    Vectors are stored by id, so repeated upserts overwrite instead of duplicating.
+    """
+
+    def __init__(self, latency: float = 0.03, per_vector: float = 0.00005, failure_rate: float = 0.0,
+                 max_vectors: int = 1000, seed: int = 0):
+        self.latency = latency
+        self.per_vector = per_vector
+        self.failure_rate = failure_rate
+        self.max_vectors = max_vectors
+        self.vectors: Dict[str, Dict] = {}
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Dict]) -> None:
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.failure_rate
+        if len(vectors) > self.max_vectors:
+            raise ValueError(f"Upsert of {len(vectors)} vectors exceeds the {self.max_vectors} request limit")
+        time.sleep(self.latency + self.per_vector * len(vectors))
+        if fail:
+            with self._lock:
+                self.failures += 1
+            raise ConnectionError("503 Service Unavailable")
+        with self._lock:
+            for v in vectors:
+                self.vectors[v["id"]] = v
+
+
+class FakeProvider(Provider):
+    """
+    Async LLM provider with injected faults:
+    each call takes `latency` seconds, or `slow_latency` with probability `slow_rate`,
+    and fails with probability `failure_rate`. `down=True` makes every call hang
+    (until cancelled by a deadline); `error=True` makes every call fail at once.
+    Streams yield `tokens` words `token_latency` apart after the first-token delay.
+    """
+
+    def __init__(self, name: str, latency: float = 0.05, slow_latency: float = 2.0, slow_rate: float = 0.0,
+                 failure_rate: float = 0.0, token_latency: float = 0.0, tokens: int = 20, seed: int = 0):
+        self.name = name
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_rate = slow_rate
+        self.failure_rate = failure_rate
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.down = False
+        self.error = False
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    async def _wait(self) -> None:
+        self.calls += 1
+        if self.down:
+            await asyncio.sleep(3600)
+        slow = self._rng.random() < self.slow_rate
+        fail = self.error or self._rng.random() < self.failure_rate
+        await asyncio.sleep(self.slow_latency if slow else self.latency)
+        if fail:
+            raise ConnectionError(f"{self.name}: 503 Service Unavailable")
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        await self._wait()
+        return f"answer from {self.name}"
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        await self._wait()
+        for i in range(self.tokens):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield f"{self.name}{i} "
+
+    async def aclose(self) -> None:
+        pass
+
+
+def pinecone_store(index: FakePineconeIndex):
+    """A VectorStore on its Pinecone code path, writing to `index` instead of the service."""
+    from app.services.retriever import VectorStore
+
+    store = VectorStore.__new__(VectorStore)
+    store.backend = "pinecone"
+    store.index = index
+    return store
+
+
+def install(latency: float = 0.0, chat: Optional[FakeChat] = None) -> None:
+    """
+    Register a FakeEmbedder in the service container and, if given, `chat` as the
+    only LLM provider (OpenAI and Gemini clients are disabled).
+    """
+    from app.services.container import container
+    from app.services.llm import LLMRouter, ThreadedProvider
+    container.override(embedder=FakeEmbedder(latency=latency))
+    if chat is not None:
+        container.override(llm=LLMRouter([], fallback=ThreadedProvider("local", chat)))
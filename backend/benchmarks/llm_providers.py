@@ -0,0 +1,128 @@
+"""
+LLM provider routing under injected faults, with fake async providers: latency
+percentiles and which provider answered, for a healthy primary, a primary that
+hangs (deadline only vs deadline + circuit breaker), a primary that errors, a
+slow tail (with and without hedging), and recovery after an outage.
+
+    python -m benchmarks.llm_providers --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import collections
+import statistics
+import time
+
+
+def percentiles(latencies):
+    lat = sorted(latencies)
+    pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000  # noqa: E731
+    return statistics.median(lat) * 1000, pick(0.95), pick(0.99), lat[-1] * 1000
+
+
+async def drive(router, requests: int, concurrency: int, stream: bool, on_progress=None):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, answered, failures = [], collections.Counter(), 0
+
+    async def one(i):
+        nonlocal failures
+        async with gate:
+            if on_progress:
+                on_progress(i)
+            t = time.perf_counter()
+            try:
+                if stream:
+                    first = None
+                    async for token in router.stream("system", "Context: fake\nQuestion: q\nAnswer:"):
+                        if first is None:
+                            first = token
+                            latencies.append(time.perf_counter() - t)  # time to first token
+                    text = first or ""
+                else:
+                    text = await router.generate("system", "Context: fake\nQuestion: q\nAnswer:")
+                    latencies.append(time.perf_counter() - t)
+            except Exception:
+                failures += 1
+                return
+            answered[text.split()[-1].rstrip("0123456789") if stream else text.split()[-1]] += 1
+
+    t = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, answered, failures, time.perf_counter() - t
+
+
+def report(label, result, router):
+    latencies, answered, failures, elapsed = result
+    p50, p95, p99, worst = percentiles(latencies) if latencies else (0, 0, 0, 0)
+    who = ", ".join(f"{name} {n}" for name, n in answered.most_common())
+    print(f"{label:<34} p50 {p50:>7.1f}  p95 {p95:>7.1f}  p99 {p99:>7.1f}  max {worst:>7.1f} ms  "
+          f"{len(latencies) / elapsed:>6.0f} req/s  failed {failures}  [{who}]")
+    for name, s in router.stats().items():
+        if s["calls"] or s["skipped"]:
+            print(f"{'':>36}{name:<8} {s['state']:<9} ok {s['ok']:>4}  errors {s['errors']:>3}  "
+                  f"timeouts {s['timeouts']:>3}  skipped {s['skipped']:>4}  hedged {s['hedged']:>3}  "
+                  f"cancelled {s['cancelled']:>3}  mean {s['mean_seconds'] * 1000:>7.1f} ms")
+
+
+async def run(args):
+    from app.services.llm import LLMRouter, ThreadedProvider
+    from benchmarks.fakes import FakeChat, FakeProvider
+
+    def setup(timeout=args.timeout, hedge_after=0.0, failures=3, reset=30.0, **primary):
+        first = FakeProvider("primary", latency=args.latency, seed=1, **primary)
+        second = FakeProvider("secondary", latency=args.latency * 1.5, seed=2)
+        router = LLMRouter([first, second], fallback=ThreadedProvider("local", FakeChat()), timeout=timeout,
+                           hedge_after=hedge_after, failure_threshold=failures, reset_seconds=reset)
+        return router, first
+
+    n, c, stream = args.requests, args.concurrency, args.stream
+    print(f"{n} requests, concurrency {c}, provider latency {args.latency * 1000:.0f} ms, "
+          f"deadline {args.timeout:.1f} s{', streaming (first-token latency)' if stream else ''}\n")
+
+    router, _ = setup()
+    report("healthy primary", await drive(router, n, c, stream), router)
+
+    # A hung primary: without a breaker every request pays the full deadline
+    router, primary = setup(failures=10**9)
+    primary.down = True
+    report("primary hangs, deadline only", await drive(router, n, c, stream), router)
+    router, primary = setup()
+    primary.down = True
+    report("primary hangs, deadline + breaker", await drive(router, n, c, stream), router)
+
+    router, primary = setup()
+    primary.error = True
+    report("primary errors at once", await drive(router, n, c, stream), router)
+
+    tail = dict(slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    router, _ = setup(**tail)
+    report(f"{args.slow_rate:.0%} slow ({args.slow_latency:.1f} s), no hedging", await drive(router, n, c, stream), router)
+    router, _ = setup(hedge_after=args.hedge_after, **tail)
+    report(f"same, hedged after {args.hedge_after * 1000:.0f} ms", await drive(router, n, c, stream), router)
+
+    # Outage for the first quarter of the run, then the primary comes back
+    router, primary = setup(reset=args.reset)
+    primary.down = True
+
+    def recover(i):
+        if i == n // 4 and primary.down:
+            primary.down = False
+
+    report(f"outage then recovery (reset {args.reset:.1f} s)", await drive(router, n, c, stream, recover), router)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="healthy provider seconds per call")
+    parser.add_argument("--timeout", type=float, default=1.0, help="per-call deadline (LLM_TIMEOUT)")
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=0.8)
+    parser.add_argument("--hedge-after", type=float, default=0.15)
+    parser.add_argument("--reset", type=float, default=0.5, help="breaker reset (LLM_BREAKER_RESET)")
+    parser.add_argument("--stream", action="store_true", help="measure streaming time to first token")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
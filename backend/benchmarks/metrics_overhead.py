@@ -0,0 +1,113 @@
+"""
+Cost of the stage instrumentation: nanoseconds per span, and QA / upload latency
+with metrics enabled vs disabled. Runs in-process with the fake embedder, Chroma
+in a temp dir and the LocalAI provider; prints one request's Server-Timing header.
+
+    python -m benchmarks.metrics_overhead --requests 300
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def span_cost(n: int):
+    """(enabled ns, disabled ns, timed_iter ns per item) for an empty span."""
+    from app.utils import metrics
+
+    def loop():
+        t = time.perf_counter()
+        for _ in range(n):
+            with metrics.span("bench.empty"):
+                pass
+        return (time.perf_counter() - t) / n * 1e9
+
+    metrics.configure(True)
+    metrics.begin_request()
+    enabled = loop()
+    t = time.perf_counter()
+    for _ in metrics.timed_iter("bench.iter", range(n)):
+        pass
+    per_item = (time.perf_counter() - t) / n * 1e9
+    metrics.configure(False)
+    disabled = loop()
+    metrics.configure(True)
+    return enabled, disabled, per_item
+
+
+async def run(args):
+    os.environ["DEBUG_TIMINGS"] = "true"
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"  # every question runs the full pipeline
+    os.chdir(tempfile.mkdtemp(prefix="studybuddy-metrics-"))
+    import httpx
+    from benchmarks import fakes
+    fakes.install()
+    from app.main import app
+    from app.utils import metrics
+
+    enabled_ns, disabled_ns, iter_ns = span_cost(args.spans)
+    print(f"span: {enabled_ns:.0f} ns enabled, {disabled_ns:.0f} ns disabled; timed_iter: {iter_ns:.0f} ns/item")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        text = "".join(f"Paragraph {i}. Osmosis moves water across a membrane toward higher solute concentration.\n\n"
+                       for i in range(400)).encode()
+        r = await client.post("/upload/", files={"file": ("seed.txt", text, "text/plain")})
+        r.raise_for_status()
+        doc_id = r.json()["doc_id"]
+
+        async def ask(i):
+            r = await client.post("/qa/", json={"question": f"what does osmosis move {i}", "doc_id": doc_id})
+            r.raise_for_status()
+            return r
+
+        async def upload(i):
+            data = f"upload {i} {time.time()}\n\n".encode() + text
+            r = await client.post("/upload/", files={"file": (f"doc{i}.txt", data, "text/plain")})
+            r.raise_for_status()
+            return r
+
+        for i in range(20):  # warm-up
+            await ask(i)
+        results = {False: {"qa": [], "upload": []}, True: {"qa": [], "upload": []}}
+        timings = {}
+        # Alternate per request so drift (store growth, GC) affects both modes alike
+        for case, call, n in (("qa", ask, args.requests), ("upload", upload, args.uploads)):
+            for i in range(2 * n):
+                enabled = bool(i % 2)
+                metrics.configure(enabled)
+                t = time.perf_counter()
+                r = await call(i)
+                results[enabled][case].append(time.perf_counter() - t)
+                if enabled:
+                    timings[case] = r.headers.get("server-timing")
+        metrics.configure(True)
+
+        print(f"{'case':>8} {'metrics':>8} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for case in ("qa", "upload"):
+            for enabled in (False, True):
+                lat = sorted(results[enabled][case])
+                print(f"{case:>8} {'on' if enabled else 'off':>8} {statistics.mean(lat) * 1000:>9.2f} "
+                      f"{lat[len(lat) // 2] * 1000:>8.2f} {lat[int(0.95 * (len(lat) - 1))] * 1000:>8.2f}")
+            off = statistics.median(results[False][case])
+            on = statistics.median(results[True][case])
+            print(f"{case:>8} overhead: {(on - off) * 1000:+.3f} ms ({(on / off - 1) * 100:+.1f}% of median)")
+
+        print(f"\nServer-Timing (qa):     {timings['qa']}")
+        print(f"Server-Timing (upload): {timings['upload']}")
+        body = (await client.get("/metrics")).text
+        print(f"/metrics: {len(body.splitlines())} lines")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--uploads", type=int, default=30)
+    parser.add_argument("--spans", type=int, default=200_000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Corpus-wide retrieval: one `query_many` pass versus fanning out one query per document.
+
+    python -m benchmarks.multi_doc_query --docs 1 5 10 30 --chunks 200 --backends numpy chroma
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from app.config import settings
+from benchmarks.vector_store import build_corpus
+
+
+def timed(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, nargs="+", default=[1, 5, 10, 30])
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="studybuddy-multi-"))
+    corpus = build_corpus(max(args.docs), args.chunks, args.dim)
+    doc_ids = list(corpus)
+    q = np.random.default_rng(3).standard_normal(args.dim).astype(np.float32).tolist()
+
+    from app.services.retriever import VectorStore
+    print(f"{'backend':>8} {'docs':>5} {'query_many ms':>14} {'fan-out ms':>11}")
+    for backend in args.backends:
+        settings.VECTOR_DB = backend
+        store = VectorStore()
+        for doc_id, (ids, vecs, metas) in corpus.items():
+            store.upsert(doc_id=doc_id, ids=ids, vectors=vecs.tolist(), metadatas=metas)
+        for n in args.docs:
+            scope = doc_ids[:n]
+            many = timed(lambda: store.query_many(scope, q, args.top_k), args.repeats)
+            fan = timed(lambda: [store.query(d, q, args.top_k) for d in scope], args.repeats)
+            print(f"{backend:>8} {n:>5} {many:>14.2f} {fan:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare serial and process-pool PDF extraction on synthetic multi-hundred-page PDFs.
+
+    python -m benchmarks.pdf_extraction --pages 300 600 --workers 2 4
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import time
+import fitz # PyMuPDF
+from app.services.pdf_parser import iter_pdf_pages, iter_pdf_pages_parallel
+
+
+LOREM = (
+    "The mitochondrion is the powerhouse of the cell. Cellular respiration converts "
+    "glucose and oxygen into ATP, carbon dioxide and water. "
+)
+
+
+def make_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        body = "\n".join(f"{p}.{i} {LOREM}" for i in range(lines_per_page))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), body, fontsize=7)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def time_first_and_total(pages_iter):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in pages_iter:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return first or 0.0, time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[300, 600])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'mode':>12} {'first page (ms)':>16} {'total (s)':>10} {'pages/s':>9}")
+    for n in args.pages:
+        pdf = make_pdf(n)
+        first, total, count = time_first_and_total(iter_pdf_pages(pdf))
+        print(f"{n:>6} {'serial':>12} {first * 1000:>16.1f} {total:>10.2f} {count / total:>9.0f}")
+        for w in args.workers:
+            with ProcessPoolExecutor(max_workers=w) as pool:
+                list(pool.map(abs, range(w)))  # warm the workers before timing
+                first, total, count = time_first_and_total(iter_pdf_pages_parallel(pdf, pool=pool))
+            print(f"{n:>6} {f'parallel x{w}':>12} {first * 1000:>16.1f} {total:>10.2f} {count / total:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Answering N questions about one document: N calls to `/qa/` (sequential, and
+concurrent) vs one `/qa/batch`. Uses the fake embedder and chat provider with
+simulated per-call latency, so the saved round trips and model calls show up.
+
+    python -m benchmarks.qa_batch --questions 40 --embed-latency 0.02 --chat-latency 0.1
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+async def run(args):
+    os.chdir(tempfile.mkdtemp(prefix="studybuddy-qabatch-"))
+    os.environ["VECTOR_DB"] = args.store
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    os.environ["QA_BATCH_LLM_CONCURRENCY"] = str(args.llm_concurrency)
+    import httpx
+    from benchmarks import corpus, fakes
+
+    fakes.install(latency=args.embed_latency, chat=fakes.FakeChat(latency=args.chat_latency))
+    from app.main import app
+    from app.services.container import container
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        data = corpus.make_document("txt", args.pages, seed=1)
+        r = await client.post("/upload/", files={"file": ("notes.txt", data)})
+        r.raise_for_status()
+        doc_id = r.json()["doc_id"]
+        questions = corpus.questions(args.questions, seed=2)
+
+        async def ask(q):
+            r = await client.post("/qa/", json={"question": q, "doc_id": doc_id})
+            r.raise_for_status()
+            return r.json()
+
+        async def one_by_one():
+            return [await ask(q) for q in questions]
+
+        async def concurrent():
+            gate = asyncio.Semaphore(args.llm_concurrency)
+
+            async def limited(q):
+                async with gate:
+                    return await ask(q)
+
+            return await asyncio.gather(*(limited(q) for q in questions))
+
+        async def batch():
+            r = await client.post("/qa/batch", json={"questions": questions, "doc_id": doc_id})
+            r.raise_for_status()
+            return r.json()["results"]
+
+        print(f"{args.questions} questions, {args.store}, embed {args.embed_latency * 1000:.0f} ms/call, "
+              f"chat {args.chat_latency * 1000:.0f} ms/call, {args.llm_concurrency} LLM calls in flight")
+        print(f"{'mode':>22} {'seconds':>8} {'embed calls':>12}")
+        answers = {}
+        for label, fn in [("/qa/ sequential", one_by_one), (f"/qa/ x{args.llm_concurrency} concurrent", concurrent),
+                          ("/qa/batch", batch)]:
+            before = container.embedder.stats.snapshot()["batches"]
+            t = time.perf_counter()
+            answers[label] = await fn()
+            seconds = time.perf_counter() - t
+            calls = container.embedder.stats.snapshot()["batches"] - before
+            print(f"{label:>22} {seconds:>8.2f} {calls:>12}")
+
+        # The batch must return the same answers and sources as asking one at a time
+        single, batched = answers["/qa/ sequential"], answers["/qa/batch"]
+        same = all(
+            s["answer"] == b["answer"] and [x["id"] for x in s["sources"]] == [x["id"] for x in b["sources"]]
+            for s, b in zip(single, batched)
+        )
+        print(f"batch answers/sources identical to /qa/: {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--store", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--chat-latency", type=float, default=0.1)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
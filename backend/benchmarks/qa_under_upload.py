@@ -0,0 +1,86 @@
+"""
+Load test: QA latency percentiles with and without concurrent uploads.
+
+Drives the app in-process with a fake embedder (simulated model latency),
+Chroma in a temp dir and the LocalAI provider, so no API keys are needed.
+
+    python -m benchmarks.qa_under_upload --questions 200 --uploads 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+async def run(args):
+    import httpx
+    from benchmarks import fakes
+    fakes.install(latency=args.embed_latency)
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        body = ("Osmosis moves water across a membrane. " * 40 + "\n\n") * args.upload_paragraphs
+        resp = await client.post("/upload/", files={"file": ("seed.txt", b"Seed doc about osmosis.\n\n" * 20, "text/plain")})
+        doc_id = resp.json()["doc_id"]
+
+        async def ask_many(n):
+            # Open-loop arrivals: latency is measured from the scheduled send time, so
+            # time spent waiting on a blocked event loop is counted.
+            loop = asyncio.get_running_loop()
+            t_start = loop.time()
+            latencies = []
+
+            async def one(i):
+                scheduled = t_start + i * args.interval
+                await asyncio.sleep(max(0.0, scheduled - loop.time()))
+                r = await client.post("/qa/", json={"question": f"what is osmosis {i}", "doc_id": doc_id})
+                r.raise_for_status()
+                latencies.append(loop.time() - scheduled)
+
+            await asyncio.gather(*(one(i) for i in range(n)))
+            return latencies
+
+        async def upload(i):
+            # Unique bytes per upload so dedup doesn't short-circuit the pipeline
+            data = f"upload {i} {time.time()}\n\n".encode() + body.encode()
+            r = await client.post("/upload/", files={"file": (f"big{i}.txt", data, "text/plain")})
+            r.raise_for_status()
+
+        idle = await ask_many(args.questions)
+        uploads = [asyncio.create_task(upload(i)) for i in range(args.uploads)]
+        busy = await ask_many(args.questions)
+        await asyncio.gather(*uploads)
+
+    print(f"{'scenario':>16} {'p50 (ms)':>9} {'p99 (ms)':>9} {'mean (ms)':>10}")
+    for name, lat in (("idle", idle), (f"{args.uploads} uploads", busy)):
+        print(
+            f"{name:>16} {percentile(lat, 50) * 1000:>9.1f} {percentile(lat, 99) * 1000:>9.1f} "
+            f"{statistics.mean(lat) * 1000:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--upload-paragraphs", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between question arrivals")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Seconds per embedding call")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="studybuddy-bench-")
+    os.chdir(workdir)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Quantized NumPy-backend storage: bytes per vector, query latency and recall@k of
+float16 / int8 (with and without float32 rescoring) against exact float32 search.
+
+    python -m benchmarks.quantization --docs 20 --chunks 2000 --dim 384 --queries 200
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from app.services.numpy_store import NumpyIndex
+
+
+def clustered_corpus(docs: int, chunks: int, dim: int, seed: int = 0):
+    """Unit vectors around a few topic centres per document, so near neighbours are close calls."""
+    rng = np.random.default_rng(seed)
+    corpus = {}
+    for d in range(docs):
+        centres = rng.standard_normal((8, dim)).astype(np.float32)
+        vecs = centres[rng.integers(8, size=chunks)] + 0.6 * rng.standard_normal((chunks, dim)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        ids = [f"doc{d}-{i}" for i in range(chunks)]
+        metas = [{"doc_id": f"doc{d}", "chunk": i} for i in range(chunks)]
+        corpus[f"doc{d}"] = (ids, vecs, metas)
+    return corpus
+
+
+def disk_bytes(root: str, names) -> int:
+    total = 0
+    for folder, _, files in os.walk(root):
+        total += sum(os.path.getsize(os.path.join(folder, name)) for name in files if name in names)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--scope", type=int, default=5, help="Documents searched per query")
+    args = parser.parse_args()
+
+    corpus = clustered_corpus(args.docs, args.chunks, args.dim)
+    doc_ids = list(corpus)
+    n_vectors = args.docs * args.chunks
+    rng = np.random.default_rng(1)
+    queries = []
+    for _ in range(args.queries):
+        scope = list(rng.choice(doc_ids, size=min(args.scope, len(doc_ids)), replace=False))
+        _, vecs, _ = corpus[scope[0]]
+        # Queries near a stored chunk, as real questions land near their answers
+        q = vecs[rng.integers(len(vecs))] + 0.3 * rng.standard_normal(args.dim).astype(np.float32)
+        queries.append((scope, q))
+
+    base = tempfile.mkdtemp(prefix="studybuddy-quant-")
+    configs = [("float32", False), ("float16", False), ("float16", True), ("int8", False), ("int8", True)]
+    truth = None
+    print(f"{n_vectors} vectors x {args.dim} dims, top_k={args.top_k}, {args.scope} docs per query")
+    print(f"{'dtype':>8} {'rescore':>7} {'scan B/vec':>10} {'disk B/vec':>10} {'mean ms':>8} {'recall@k':>9}")
+    for dtype, rescore in configs:
+        root = os.path.join(base, f"{dtype}-{rescore}")
+        index = NumpyIndex(root, dtype=dtype, rescore=rescore)
+        for doc_id, (ids, vecs, metas) in corpus.items():
+            index.upsert(doc_id, ids, vecs, metas)
+
+        # Warm the page cache so timings compare compute, not first-touch I/O
+        for scope, q in queries[:10]:
+            index.query_many(scope, q, args.top_k)
+        results = []
+        t = time.perf_counter()
+        for scope, q in queries:
+            results.append([m[0] for m in index.query_many(scope, q, args.top_k)])
+        mean_ms = (time.perf_counter() - t) / len(queries) * 1000
+
+        if truth is None:
+            truth = results
+        recall = np.mean([len(set(r) & set(g)) / len(g) for r, g in zip(results, truth)])
+        scan = disk_bytes(root, ["vectors.npy", "scales.npy"]) / n_vectors
+        disk = disk_bytes(root, ["vectors.npy", "scales.npy", "full.npy"]) / n_vectors
+        print(f"{dtype:>8} {str(rescore):>7} {scan:>10.0f} {disk:>10.0f} {mean_ms:>8.2f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Startup cost of the API process: import time, model/client load time and resident memory.
+
+Each run uses a fresh interpreter so nothing is cached between measurements.
+
+    python -m benchmarks.startup --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+PROBE = r"""
+import json, resource, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+out = {"rss_start_mb": rss_mb()}
+t0 = time.perf_counter()
+import app.main
+out["import_seconds"] = time.perf_counter() - t0
+out["rss_after_import_mb"] = rss_mb()
+
+from app.services.container import container
+t0 = time.perf_counter()
+try:
+    container.warm_up()
+    out["warmup_seconds"] = time.perf_counter() - t0
+except RuntimeError as e:
+    out["warmup_error"] = str(e)
+out["rss_after_warmup_mb"] = rss_mb()
+print(json.dumps(out))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=backend_dir + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    workdir = tempfile.mkdtemp(prefix="studybuddy-startup-")
+
+    runs = []
+    for _ in range(args.runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=workdir, env=env, capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    keys = ["import_seconds", "warmup_seconds", "rss_start_mb", "rss_after_import_mb", "rss_after_warmup_mb"]
+    for key in keys:
+        values = sorted(r[key] for r in runs if key in r)
+        if values:
+            print(f"{key:>22}: median {values[len(values) // 2]:8.3f}  (min {values[0]:.3f}, max {values[-1]:.3f})")
+    errors = {r["warmup_error"] for r in runs if "warmup_error" in r}
+    for err in errors:
+        print(f"warm-up skipped: {err}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Peak server RSS while several large uploads arrive at once, plus how fast an
+oversized upload is turned away. The server runs in a subprocess with the fake
+embedder; its RSS is sampled from /proc while the uploads are in flight.
+
+    python -m benchmarks.upload_memory --concurrency 4 --size-mb 38
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import fitz
+import requests
+
+
+PORT = 8791
+
+
+def make_pdf(path: str, size_mb: int) -> None:
+    """A few pages of text plus an incompressible attachment to reach the target size."""
+    doc = fitz.open()
+    for i in range(5):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i + 1}. Mitochondria produce ATP through oxidative phosphorylation.")
+    doc.embfile_add("blob.bin", os.urandom(size_mb * 1024 * 1024))
+    doc.save(path)
+    doc.close()
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def serve() -> None:
+    os.chdir(tempfile.mkdtemp(prefix="studybuddy-upload-"))
+    from benchmarks import fakes
+
+    fakes.install()
+    import uvicorn
+    from app.main import app
+
+    uvicorn.run(app, port=PORT, log_level="warning")
+
+
+def burst(path: str, concurrency: int, pid: int, endpoint: str):
+    """Post `path` from `concurrency` threads at once; return (statuses, seconds, peak RSS MB)."""
+    statuses, latencies = [], []
+    peak = rss_mb(pid)
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, rss_mb(pid))
+            time.sleep(0.005)
+
+    def post():
+        t = time.perf_counter()
+        try:
+            with open(path, "rb") as fh:
+                r = requests.post(
+                    f"http://127.0.0.1:{PORT}{endpoint}",
+                    files={"file": (os.path.basename(path), fh, "application/pdf")},
+                    timeout=300,
+                )
+            statuses.append(r.status_code)
+        except requests.exceptions.ConnectionError:
+            # The server may close the socket while an oversized body is still being sent
+            statuses.append("reset")
+        latencies.append(time.perf_counter() - t)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=post) for _ in range(concurrency)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    time.sleep(0.2)
+    done.set()
+    sampler.join()
+    return statuses, max(latencies), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=38)
+    parser.add_argument("--oversize-mb", type=int, default=120)
+    args = parser.parse_args()
+    if args.serve:
+        serve()
+        return
+
+    tmp = tempfile.mkdtemp(prefix="studybuddy-upload-files-")
+    ok_pdf = os.path.join(tmp, "large.pdf")
+    big_pdf = os.path.join(tmp, "oversized.pdf")
+    make_pdf(ok_pdf, args.size_mb)
+    make_pdf(big_pdf, args.oversize_mb)
+
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.upload_memory", "--serve"])
+    try:
+        for _ in range(300):
+            try:
+                if requests.get(f"http://127.0.0.1:{PORT}/health", timeout=1).status_code == 200:
+                    break
+            except requests.exceptions.ConnectionError:
+                time.sleep(0.1)
+        # One small upload first so store/model initialisation is not counted as upload memory
+        small_pdf = os.path.join(tmp, "small.pdf")
+        make_pdf(small_pdf, 1)
+        burst(small_pdf, 1, server.pid, "/upload/")
+        base = rss_mb(server.pid)
+        print(f"server RSS at rest: {base:.0f} MB")
+        print(f"{'case':>28} {'statuses':>22} {'slowest s':>10} {'peak RSS +MB':>13}")
+        for label, path, endpoint in [
+            (f"{args.concurrency} x {os.path.getsize(ok_pdf) >> 20} MB upload", ok_pdf, "/upload/"),
+            (f"{args.concurrency} x {os.path.getsize(ok_pdf) >> 20} MB upload job", ok_pdf, "/upload/jobs"),
+            (f"{args.concurrency} x {os.path.getsize(big_pdf) >> 20} MB oversized", big_pdf, "/upload/"),
+        ]:
+            statuses, slowest, peak = burst(path, args.concurrency, server.pid, endpoint)
+            print(f"{label:>28} {','.join(map(str, statuses)):>22} {slowest:>10.2f} {peak - base:>13.0f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Vector store write throughput: batched, concurrent, retried upserts against a
+local Chroma instance and a fake Pinecone index (request latency, per-vector
+cost, a request-size limit and injected transient failures), compared with the
+old single-request upsert. Also times per-document Chroma queries with and
+without the collection handle cache, and resumes a partially failed upsert.
+
+    python -m benchmarks.upserts --docs 10 --chunks 2000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import numpy as np
+from app.config import settings
+from app.utils.concurrency import shutdown_pools
+
+
+# (label, UPSERT_BATCH_SIZE, UPSERT_CONCURRENCY, UPSERT_RETRIES); the first is the old behaviour
+CONFIGS = [
+    ("single request", 10**9, 1, 0),
+    ("batch 200 x1", 200, 1, 3),
+    ("batch 200 x4", 200, 4, 3),
+    ("batch 500 x4", 500, 4, 3),
+    ("batch 1000 x8", 1000, 8, 3),
+]
+
+
+def corpus(docs: int, chunks: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for d in range(docs):
+        vecs = rng.standard_normal((chunks, dim)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        ids = [f"doc{d}-{i}" for i in range(chunks)]
+        metas = [{"doc_id": f"doc{d}", "chunk": i, "filename": f"doc{d}.pdf", "text": f"chunk {i} " * 60}
+                 for i in range(chunks)]
+        out.append((f"doc{d}", ids, vecs, metas))
+    return out
+
+
+def configure(batch: int, concurrency: int, retries: int, backoff: float = 0.05) -> None:
+    shutdown_pools()  # the upsert pool is rebuilt with the new size on first use
+    settings.UPSERT_BATCH_SIZE = batch
+    settings.UPSERT_CONCURRENCY = concurrency
+    settings.UPSERT_RETRIES = retries
+    settings.UPSERT_RETRY_BACKOFF = backoff
+
+
+def write_all(store, docs):
+    """(seconds, vectors written, documents that raised)"""
+    from app.services.retriever import UpsertError
+
+    failed = 0
+    t = time.perf_counter()
+    for doc_id, ids, vecs, metas in docs:
+        try:
+            store.upsert(doc_id=doc_id, ids=ids, vectors=vecs, metadatas=metas)
+        except (UpsertError, ValueError):
+            failed += 1
+    return time.perf_counter() - t, sum(len(d[1]) for d in docs), failed
+
+
+def bench_chroma(docs, layout: str):
+    from app.services.retriever import VectorStore
+
+    print(f"\nChroma ({layout} layout)")
+    print(f"{'config':>16} {'seconds':>8} {'vectors/s':>10}")
+    for label, batch, concurrency, retries in CONFIGS:
+        settings.CHROMA_DIR = tempfile.mkdtemp(prefix="studybuddy-upserts-")
+        settings.CHROMA_LAYOUT = layout
+        configure(batch, concurrency, retries)
+        store = VectorStore()
+        seconds, vectors, failed = write_all(store, docs)
+        note = f"  ({failed} documents failed)" if failed else ""
+        print(f"{label:>16} {seconds:>8.2f} {vectors / seconds:>10.0f}{note}")
+    return store
+
+
+def bench_handle_cache(store, docs, queries: int):
+    """Per-document query latency with the handle cache vs a lookup on every call."""
+    rng = np.random.default_rng(1)
+    dim = docs[0][2].shape[1]
+    doc_ids = [d[0] for d in docs]
+    cached = settings.CHROMA_MAX_CACHED_COLLECTIONS
+    print(f"\nper-document query (per_doc layout), {queries} queries")
+    for label, size in (("lookup each call", 0), ("cached handles", cached)):
+        settings.CHROMA_MAX_CACHED_COLLECTIONS = size
+        store._collections.clear()
+        lat = []
+        for _ in range(queries):
+            q = rng.standard_normal(dim).astype(np.float32).tolist()
+            t = time.perf_counter()
+            store.query(doc_ids[rng.integers(len(doc_ids))], q, 5)
+            lat.append(time.perf_counter() - t)
+        print(f"{label:>18}: mean {statistics.mean(lat) * 1000:.2f} ms, p50 {statistics.median(lat) * 1000:.2f} ms")
+    settings.CHROMA_MAX_CACHED_COLLECTIONS = cached
+
+
+def bench_pinecone(docs, args):
+    from benchmarks.fakes import FakePineconeIndex, pinecone_store
+
+    print(f"\nfake Pinecone: {args.latency * 1000:.0f} ms/request + {args.per_vector * 1e6:.0f} us/vector, "
+          f"{args.failure_rate:.0%} transient failures, max 1000 vectors/request")
+    print(f"{'config':>16} {'seconds':>8} {'vectors/s':>10} {'requests':>9} {'retried':>8} {'stored':>8} {'failed docs':>12}")
+    for label, batch, concurrency, retries in CONFIGS:
+        configure(batch, concurrency, retries)
+        index = FakePineconeIndex(args.latency, args.per_vector, args.failure_rate)
+        seconds, vectors, failed = write_all(pinecone_store(index), docs)
+        print(f"{label:>16} {seconds:>8.2f} {len(index.vectors) / seconds:>10.0f} {index.requests:>9} "
+              f"{index.failures:>8} {len(index.vectors):>8} {failed:>12}")
+
+
+def bench_resume(docs, args):
+    """Upsert without retries under heavy failures, then resume only the failed ranges."""
+    from app.services.retriever import UpsertError
+    from benchmarks.fakes import FakePineconeIndex, pinecone_store
+
+    configure(200, 4, 0)
+    index = FakePineconeIndex(args.latency / 10, 0.0, failure_rate=0.3, seed=3)
+    store = pinecone_store(index)
+    doc_id, ids, vecs, metas = docs[0]
+    rounds = 0
+    pending = [(0, len(ids))]
+    while pending:
+        rounds += 1
+        retry = []
+        for start, end in pending:
+            try:
+                store.upsert(doc_id, ids[start:end], vecs[start:end], metas[start:end])
+            except UpsertError as e:
+                retry.extend((start + a, start + b) for a, b in e.failed)
+        pending = retry
+    print(f"\nresume: {len(ids)} vectors written in {rounds} rounds at 30% failures; "
+          f"{index.requests} requests, {len(index.vectors)} stored (no duplicates)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.03, help="fake Pinecone seconds per request")
+    parser.add_argument("--per-vector", type=float, default=0.00005, help="fake Pinecone seconds per vector")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="studybuddy-upserts-"))
+    docs = corpus(args.docs, args.chunks, args.dim)
+    print(f"{args.docs} documents x {args.chunks} chunks, dim {args.dim}")
+    if not args.skip_chroma:
+        bench_chroma(docs, "shared")
+        store = bench_chroma(docs, "per_doc")
+        bench_handle_cache(store, docs, args.queries)
+    bench_pinecone(docs, args)
+    bench_resume(docs, args)
+
+
+if __name__ == "__main__":
+    main()
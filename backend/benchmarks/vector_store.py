@@ -0,0 +1,97 @@
+"""
+Per-document query latency and memory of the NumPy backend versus Chroma.
+
+    python -m benchmarks.vector_store --docs 20 --chunks 300 --dim 384 --queries 500
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from app.config import settings
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def build_corpus(docs: int, chunks: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    corpus = {}
+    for d in range(docs):
+        vecs = rng.standard_normal((chunks, dim)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        ids = [f"doc{d}-{i}" for i in range(chunks)]
+        metas = [{"doc_id": f"doc{d}", "chunk": i, "filename": f"doc{d}.pdf", "text": f"chunk {i} " * 120} for i in range(chunks)]
+        corpus[f"doc{d}"] = (ids, vecs, metas)
+    return corpus
+
+
+def run_backend(name: str, corpus, queries: int, top_k: int):
+    from app.services.retriever import VectorStore
+
+    settings.VECTOR_DB = name
+    rss_before = rss_mb()
+    tracemalloc.start()
+    store = VectorStore()
+    t0 = time.perf_counter()
+    for doc_id, (ids, vecs, metas) in corpus.items():
+        store.upsert(doc_id=doc_id, ids=ids, vectors=vecs.tolist(), metadatas=metas)
+    upsert_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(1)
+    doc_ids = list(corpus)
+    dim = next(iter(corpus.values()))[1].shape[1]
+    latencies = []
+    for _ in range(queries):
+        doc_id = doc_ids[rng.integers(len(doc_ids))]
+        q = rng.standard_normal(dim).astype(np.float32).tolist()
+        t = time.perf_counter()
+        store.query(doc_id=doc_id, vector=q, top_k=top_k)
+        latencies.append(time.perf_counter() - t)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        "backend": name,
+        "upsert_s": upsert_s,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "py_peak_mb": peak / 2 ** 20,
+        "rss_delta_mb": rss_mb() - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="studybuddy-vs-"))
+    corpus = build_corpus(args.docs, args.chunks, args.dim)
+    print(f"{'backend':>8} {'upsert s':>9} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'py peak MB':>11} {'RSS +MB':>8}")
+    for name in args.backends:
+        r = run_backend(name, corpus, args.queries, args.top_k)
+        print(
+            f"{r['backend']:>8} {r['upsert_s']:>9.2f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} "
+            f"{r['mean_ms']:>8.3f} {r['py_peak_mb']:>11.1f} {r['rss_delta_mb']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+import pytest
+
+# Run from anywhere: `app` and `benchmarks` are imported from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+SERVICES = ("embedder", "store", "doc_index", "answer_cache", "lexical_index", "llm")
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """
+    `api(method, url, **kwargs)` against the app, on fresh services in `tmp_path`:
+    a NumPy store, the fake embedder and the fake chat provider.
+    """
+    import httpx
+    from app.config import settings
+    from app.main import app
+    from app.services.container import container
+    from app.services.llm import LLMRouter, ThreadedProvider
+    from benchmarks.fakes import FakeChat, FakeEmbedder
+
+    monkeypatch.setattr(settings, "VECTOR_DB", "numpy")
+    monkeypatch.setattr(settings, "NUMPY_STORE_DIR", str(tmp_path / "vectors"))
+    monkeypatch.setattr(settings, "DOC_INDEX_PATH", str(tmp_path / "doc_index.sqlite3"))
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_PATH", str(tmp_path / "lexical.sqlite3"))
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    saved = {name: container.peek(name) for name in SERVICES}
+    container.override(**{name: None for name in SERVICES})
+    container.override(embedder=FakeEmbedder(), llm=LLMRouter([], fallback=ThreadedProvider("local", FakeChat())))
+
+    def call(method: str, url: str, **kwargs) -> httpx.Response:
+        async def send():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+                return await client.request(method, url, **kwargs)
+
+        return asyncio.run(send())
+
+    yield call
+    container.override(**saved)
@@ -0,0 +1,74 @@
+import json
+import os
+import numpy as np
+from app.services.ann_index import AnnIndex
+from app.services.numpy_store import NumpyIndex
+
+DIM = 16
+
+
+def _vectors(rng, n, center=None):
+    center = rng.normal(size=DIM) if center is None else center
+    return center + 0.1 * rng.normal(size=(n, DIM))
+
+
+def _upsert(store, doc_id, vectors):
+    ids = [f"{doc_id}-{i}" for i in range(len(vectors))]
+    store.upsert(doc_id, ids, vectors, [{"text": doc_id} for _ in ids])
+
+
+def _open(root, **kwargs):
+    return AnnIndex(str(root), kind="ivf", min_rows=0, checkpoint_seconds=float("inf"), **kwargs)
+
+
+def _log(root):
+    with open(os.path.join(root, "_ann", "labels.jsonl")) as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_restart_loads_the_checkpoint_and_replays_later_upserts(tmp_path):
+    rng = np.random.default_rng(0)
+    store = _open(tmp_path)
+    for doc_id in ("a", "b", "c"):
+        _upsert(store, doc_id, _vectors(rng, 30))
+    _upsert(store, "a", _vectors(rng, 30))  # replaced before the checkpoint
+    store.flush()
+    # The checkpoint holds every live range, so the log is rewritten down to them
+    assert [entry["doc_id"] for entry in _log(tmp_path)] == ["b", "c", "a"]
+
+    _upsert(store, "b", _vectors(rng, 30))  # replaced after the checkpoint
+    _upsert(store, "d", _vectors(rng, 30))
+    assert len(_log(tmp_path)) == 5
+    ranges = dict(store._ranges)
+
+    restarted = _open(tmp_path)
+    assert restarted._ranges == ranges
+    assert restarted._next_label == store._next_label
+    assert len(restarted._ann) == 4 * 30  # b's checkpointed range was deleted, d re-added
+    queries = _vectors(rng, 5)
+    doc_ids = ["a", "b", "c", "d"]
+    found = [[m[0] for m in matches] for matches in restarted.query_batch(doc_ids, queries, top_k=5)]
+    exact = [[m[0] for m in matches] for matches in NumpyIndex(str(tmp_path)).query_batch(doc_ids, queries, 5)]
+    assert found == exact
+
+    restarted.flush()
+    assert [entry["doc_id"] for entry in _log(tmp_path)] == ["c", "a", "b", "d"]
+    assert _open(tmp_path)._ranges == ranges
+
+
+def test_falls_back_to_an_exact_scan_when_too_few_candidates_are_in_scope(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    query = rng.normal(size=DIM)
+    store = _open(tmp_path, overfetch=1)
+    for i in range(20):
+        _upsert(store, f"near{i}", _vectors(rng, 50, center=query))
+    _upsert(store, "far", _vectors(rng, 10, center=-query))
+
+    ranked = []
+    rank_candidates = store._rank_candidates
+    monkeypatch.setattr(store, "_rank_candidates", lambda *args: ranked.append(rank_candidates(*args)) or ranked[-1])
+    matches = store.query_batch(["far"], [query], top_k=5)[0]
+    assert len(ranked) == 1 and len(ranked[0]) < 5  # the ANN candidates were all in other documents
+    exact = NumpyIndex(str(tmp_path)).query_batch(["far"], [query], 5)[0]
+    assert [m[0] for m in matches] == [m[0] for m in exact]
+    assert len(matches) == 5 and all(m[0].startswith("far-") for m in matches)
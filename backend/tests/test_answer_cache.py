@@ -0,0 +1,58 @@
+import numpy as np
+from app.services.answer_cache import AnswerCache
+from benchmarks import corpus
+
+
+def test_similar_questions_hit_and_others_miss():
+    cache = AnswerCache(threshold=0.95)
+    cache.store(["d"], [1.0, 0.0], 5, "answer", [], 2)
+    assert cache.lookup(["d"], [0.99, 0.05], 5)["answer"] == "answer"
+    assert cache.lookup(["d"], [0.0, 1.0], 5) is None
+    assert cache.lookup(["d"], [1.0, 0.0], 3) is None  # another top_k
+    assert cache.lookup(["d", "e"], [1.0, 0.0], 5) is None  # another scope
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+
+def test_entries_expire_and_are_evicted_least_recently_used(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.answer_cache.time.time", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=60, max_entries=2)
+    for i, doc in enumerate("abc"):
+        cache.store([doc], np.eye(3)[i], 5, doc, [], 1)
+    assert cache.lookup(["a"], np.eye(3)[0], 5) is None
+    assert cache.stats()["evictions"] == 1
+    now[0] += 61
+    assert cache.lookup(["b"], np.eye(3)[1], 5) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_drops_every_scope_with_the_document():
+    cache = AnswerCache()
+    cache.store(["a"], [1.0, 0.0], 5, "a", [], 1)
+    cache.store(["a", "b"], [1.0, 0.0], 5, "ab", [], 1)
+    cache.store(["b"], [1.0, 0.0], 5, "b", [], 1)
+    cache.invalidate("a")
+    assert cache.lookup(["a"], [1.0, 0.0], 5) is None
+    assert cache.lookup(["a", "b"], [1.0, 0.0], 5) is None
+    assert cache.lookup(["b"], [1.0, 0.0], 5)["answer"] == "b"
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_update_upload_invalidates_the_replaced_document(api):
+    data = corpus.make_document("txt", pages=3)
+    first = api("POST", "/upload/", files={"file": ("notes.txt", data)}).json()
+    question = {"question": "What is the first topic about?", "doc_id": first["doc_id"]}
+    assert api("POST", "/qa/", json=question).json()["cached"] is False
+    assert api("POST", "/qa/", json=question).json()["cached"] is True
+
+    # A plain re-upload is deduplicated and leaves the cache alone
+    again = api("POST", "/upload/", files={"file": ("notes.txt", data)}).json()
+    assert again["deduplicated"] and again["doc_id"] == first["doc_id"]
+    assert api("POST", "/qa/", json=question).json()["cached"] is True
+
+    updated = api("POST", "/upload/", files={"file": ("notes.txt", data)}, data={"update": "true"}).json()
+    assert not updated["deduplicated"]
+    assert updated["replaced_doc_id"] == first["doc_id"] != updated["doc_id"]
+    assert api("POST", "/qa/", json=question).json()["cached"] is False
+    # The catalog now dedups the file to the new document
+    assert api("POST", "/upload/", files={"file": ("notes.txt", data)}).json()["doc_id"] == updated["doc_id"]
@@ -0,0 +1,68 @@
+import asyncio
+import io
+import os
+import zipfile
+from app.config import settings
+from app.routes.upload import _unpack_zip
+from benchmarks import corpus
+
+MB = 1024 * 1024
+
+
+def _zip(members) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_archive_members_are_ingested_in_place_of_their_archive(api, tmp_path):
+    archive = _zip({
+        "course/week1.txt": corpus.make_document("txt", pages=2),
+        "course/week2.docx": corpus.make_document("docx", pages=2),
+        "course/diagram.png": b"\x89PNG",
+        "course/": b"",
+        "__MACOSX/course/._week1.txt": b"resource fork",
+        "course/.DS_Store": b"finder",
+    })
+    files = [
+        ("files", ("intro.pdf", corpus.make_document("pdf", pages=2))),
+        ("files", ("course.zip", archive)),
+        ("files", ("broken.zip", b"not a zip")),
+    ]
+    response = api("POST", "/upload/bulk", files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["filename"] for r in body["results"]] == [
+        "intro.pdf", "course.zip/course/week1.txt", "course.zip/course/week2.docx",
+        "course.zip/course/diagram.png", "broken.zip",
+    ]
+    ok, png, broken = body["results"][:3], body["results"][3], body["results"][4]
+    assert all(r["doc_id"] and r["chunk_count"] > 0 and r["error"] is None for r in ok)
+    assert png["error"] == "Unsupported file type: png"
+    assert broken["error"].startswith("Not a valid ZIP archive")
+    assert body["stats"]["files"] == 5 and body["stats"]["succeeded"] == 3 and body["stats"]["failed"] == 2
+    assert not [f for f in os.listdir(tmp_path) if f.endswith((".zip", ".txt", ".docx", ".pdf"))]  # no spool left
+
+
+def test_oversized_members_are_rejected_from_the_archive_directory(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 1)
+    archive = _zip({"small.txt": b"fits", "large.txt": b"x" * (2 * MB)})
+    entries = asyncio.run(_unpack_zip(archive, "a.zip"))
+    assert entries == [("a.zip/small.txt", "txt", b"fits"), ("a.zip/large.txt", "File too large (> 1 MB)")]
+
+
+def test_archives_that_unpack_past_the_total_limit_are_rejected_whole(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_TOTAL_MB", 1)
+    archive = _zip({f"{i}.txt": b"x" * (MB // 2) for i in range(3)})
+    assert len(archive) < MB // 10  # the compressed size is not what counts
+    assert asyncio.run(_unpack_zip(archive, "a.zip")) == [("a.zip", "Archive unpacks to more than 1 MB")]
+
+
+def test_archives_with_too_many_members_fail_the_request(api, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_MAX_FILES", 3)
+    archive = _zip({f"{i}.txt": b"text" for i in range(4)})
+    response = api("POST", "/upload/bulk", files=[("files", ("many.zip", archive))])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Too many files (> 3)"
@@ -0,0 +1,34 @@
+import random
+import pytest
+from app.services.chunker import iter_structured_chunks
+from app.utils.helpers import estimate_tokens
+from benchmarks.chunking import WORD, make_pages
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_structured_chunks_cover_the_source(seed):
+    """Randomized invariants of the structured chunker, one random document per seed."""
+    rng = random.Random(seed)
+    pages = make_pages(rng.randint(1, 6), seed=rng.randrange(1 << 30))
+    chunk_tokens = rng.randint(20, 400)
+    overlap = rng.randint(0, chunk_tokens // 2)
+    chunks = list(iter_structured_chunks(pages, chunk_tokens, overlap))
+    source = "\n".join(text for _, text in pages)
+
+    assert chunks
+    assert not source[:chunks[0]["char_start"]].strip()
+    assert not source[chunks[-1]["char_end"]:].strip()
+    for chunk in chunks:
+        # Text is exactly the normalized source span it claims to cover
+        assert chunk["text"] == " ".join(source[chunk["char_start"]:chunk["char_end"]].split())
+        assert estimate_tokens(chunk["text"]) <= chunk_tokens
+        assert chunk["page_start"] <= chunk["page_end"]
+    for prev, chunk in zip(chunks, chunks[1:]):
+        assert prev["char_start"] < chunk["char_start"] and prev["char_end"] < chunk["char_end"]
+        # Nothing but whitespace is skipped between chunks ...
+        assert not source[prev["char_end"]:chunk["char_start"]].strip()
+        # ... and what they share stays within the overlap, ending on a sentence
+        shared = source[chunk["char_start"]:prev["char_end"]]
+        assert estimate_tokens(" ".join(shared.split())) <= overlap + 1
+        if shared.strip():
+            assert WORD.match(shared.split()[-1]) and shared.rstrip().endswith(".")
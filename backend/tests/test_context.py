@@ -0,0 +1,59 @@
+from app.services.context import assemble_context, merge_spans
+from app.utils.helpers import estimate_tokens
+
+SENTENCES = [
+    "Mitochondria produce most of the cell's ATP through oxidative phosphorylation.",
+    "The electron transport chain pumps protons across the inner membrane.",
+    "ATP synthase uses the resulting gradient to phosphorylate ADP.",
+    "Glycolysis takes place in the cytoplasm and yields two ATP per glucose.",
+]
+
+
+def _match(doc_id, chunk, text, score=0.5):
+    return (f"{doc_id}-{chunk}", score, {"doc_id": doc_id, "chunk": chunk, "text": text})
+
+
+def test_consecutive_chunks_are_joined_without_their_overlap():
+    first = SENTENCES[0] + " " + SENTENCES[1]
+    second = SENTENCES[1] + " " + SENTENCES[2]
+    spans = merge_spans([_match("d", 1, second, 0.9), _match("d", 0, first, 0.4), _match("d", 3, SENTENCES[3])], 200)
+    assert [span["text"] for span in spans] == [" ".join(SENTENCES[:3]), SENTENCES[3]]
+    assert spans[0]["score"] == 0.9
+    assert [m[0] for m in spans[0]["matches"]] == ["d-0", "d-1"]
+
+
+def test_chunks_without_position_stay_separate_spans():
+    loose = ("x", 0.3, {"text": SENTENCES[0]})
+    spans = merge_spans([loose, _match("d", 0, SENTENCES[1]), _match("e", 1, SENTENCES[2])], 200)
+    assert sorted(span["text"] for span in spans) == sorted(SENTENCES[:3])
+
+
+def test_near_duplicates_are_dropped_in_favour_of_the_better_ranked_span():
+    text = " ".join(SENTENCES)
+    matches = [_match("a", 0, text), _match("b", 5, SENTENCES[3]), _match("c", 9, text.upper())]
+    spans, stats = assemble_context(matches, dedup_threshold=0.9)
+    # b's chunk is contained in a's and c is a's text in another case
+    assert [span["matches"][0][0] for span in spans] == ["a-0"]
+    assert stats["dropped_duplicates"] == 2
+    assert stats["tokens_saved"] == stats["naive_tokens"] - stats["context_tokens"] > 0
+
+
+def test_spans_keep_retrieval_order_and_fit_the_budget():
+    matches = [_match(f"d{i}", 0, sentence, score=i / 10) for i, sentence in enumerate(SENTENCES)]
+    budget = sum(estimate_tokens(f"- {s}\n") for s in SENTENCES[:2])
+    spans, stats = assemble_context(matches, token_budget=budget)
+    assert [span["text"] for span in spans] == SENTENCES[:2]  # the first matches, not the highest scores
+    assert stats["context_tokens"] <= budget
+
+
+def test_the_best_span_is_truncated_rather_than_sending_no_context():
+    spans, stats = assemble_context([_match("d", 0, " ".join(SENTENCES))], token_budget=10)
+    assert len(spans) == 1
+    assert " ".join(SENTENCES).startswith(spans[0]["text"])
+    assert stats["context_tokens"] <= 10
+
+
+def test_no_matches_give_an_empty_context():
+    assert assemble_context([], token_budget=100) == ([], {
+        "naive_tokens": 0, "context_tokens": 0, "tokens_saved": 0, "dropped_duplicates": 0,
+    })
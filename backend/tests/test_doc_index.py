@@ -0,0 +1,51 @@
+import sqlite3
+from app.services.doc_index import DocumentIndex
+
+KEY = ("hash", 800, 100, "model", "chroma")
+
+
+def _legacy_catalog(path: str, with_chunker: bool) -> None:
+    """A catalog as written before the chunker joined the primary key."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE documents (file_hash TEXT NOT NULL, chunk_size INTEGER NOT NULL, "
+        "chunk_overlap INTEGER NOT NULL, embedding_model TEXT NOT NULL, vector_db TEXT NOT NULL, "
+        "doc_id TEXT NOT NULL, chunk_count INTEGER NOT NULL, filename TEXT, created_at REAL NOT NULL, "
+        "PRIMARY KEY (file_hash, chunk_size, chunk_overlap, embedding_model, vector_db))"
+    )
+    if with_chunker:
+        conn.execute("ALTER TABLE documents ADD COLUMN chunker TEXT NOT NULL DEFAULT 'character'")
+        conn.execute("INSERT INTO documents VALUES (?, ?, ?, ?, ?, 'old', 7, 'a.pdf', 0, 'structured')", KEY)
+    else:
+        conn.execute("INSERT INTO documents VALUES (?, ?, ?, ?, ?, 'old', 7, 'a.pdf', 0)", KEY)
+    conn.commit()
+    conn.close()
+
+
+def test_each_chunker_keeps_its_own_record(tmp_path):
+    index = DocumentIndex(str(tmp_path / "catalog.db"))
+    index.record(*KEY, "character", doc_id="chars", chunk_count=3, filename="a.pdf")
+    index.record(*KEY, "structured", doc_id="tokens", chunk_count=5, filename="a.pdf")
+    assert index.lookup(*KEY, "character")["doc_id"] == "chars"
+    assert index.lookup(*KEY, "structured")["doc_id"] == "tokens"
+
+
+def test_migrates_a_catalog_without_the_chunker_column(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    _legacy_catalog(path, with_chunker=False)
+    index = DocumentIndex(path)
+    assert index.lookup(*KEY, "character") == {"doc_id": "old", "chunk_count": 7, "filename": "a.pdf"}
+    index.record(*KEY, "structured", doc_id="new", chunk_count=5, filename="a.pdf")
+    assert index.lookup(*KEY, "character")["doc_id"] == "old"
+    assert index.lookup(*KEY, "structured")["doc_id"] == "new"
+
+
+def test_migrates_a_catalog_with_the_chunker_outside_the_key(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    _legacy_catalog(path, with_chunker=True)
+    index = DocumentIndex(path)
+    index.record(*KEY, "character", doc_id="new", chunk_count=3, filename="a.pdf")
+    assert index.lookup(*KEY, "structured")["doc_id"] == "old"
+    assert index.lookup(*KEY, "character")["doc_id"] == "new"
+    # Opening the migrated catalog again leaves it as it is
+    assert DocumentIndex(path).lookup(*KEY, "structured")["doc_id"] == "old"
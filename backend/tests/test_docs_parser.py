@@ -0,0 +1,78 @@
+import io
+import zipfile
+import pytest
+from app.services.docs_parser import iter_docx_blocks
+
+docx = pytest.importorskip("docx")
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+MC = 'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+RELS = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="{target}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    "</Relationships>"
+)
+
+
+def _package(body: str, part: str = "word/document.xml") -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        archive.writestr("_rels/.rels", RELS.format(target=f"/{part}"))
+        archive.writestr(part, f"<w:document {W} {MC}><w:body>{body}</w:body></w:document>")
+    return buf.getvalue()
+
+
+def test_paragraphs_match_python_docx_and_tables_become_rows(tmp_path):
+    document = docx.Document()
+    document.add_paragraph("First paragraph.")
+    run = document.add_paragraph("Tab\there, ").add_run("then a break")
+    run.add_break()
+    run.add_text("and more.")
+    document.add_paragraph("   ")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text, table.cell(0, 1).text = "Term", "Definition"
+    table.cell(1, 0).text = "ATP"
+    table.cell(1, 1).add_paragraph("Energy currency")
+    table.cell(1, 1).add_table(rows=1, cols=2).rows[0].cells[0].text = "nested"
+    document.add_paragraph("After the table.")
+    path = str(tmp_path / "notes.docx")
+    document.save(path)
+
+    paragraphs = [p.text.strip() for p in docx.Document(path).paragraphs if p.text.strip()]
+    blocks = list(iter_docx_blocks(path))
+    assert blocks == [
+        paragraphs[0], paragraphs[1],
+        "Term | Definition",
+        "ATP | Energy currency\nnested",
+        paragraphs[2],
+    ]
+    assert paragraphs[1] == "Tab\there, then a break\nand more."
+    with open(path, "rb") as fh:
+        assert list(iter_docx_blocks(fh.read())) == blocks
+
+
+def test_fallback_content_and_tab_stops_are_not_repeated():
+    body = (
+        '<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>'
+        "<w:r><w:t>Shape:</w:t></w:r>"
+        "<mc:AlternateContent><mc:Choice><w:r><w:t> preferred</w:t></w:r></mc:Choice>"
+        "<mc:Fallback><w:r><w:t> fallback</w:t></w:r></mc:Fallback></mc:AlternateContent>"
+        '<w:r><w:br w:type="page"/><w:t> next page</w:t></w:r></w:p>'
+    )
+    assert list(iter_docx_blocks(_package(body))) == ["Shape: preferred next page"]
+
+
+def test_the_main_part_is_found_from_the_package_relationships():
+    body = "<w:p><w:r><w:t>Moved</w:t></w:r></w:p>"
+    assert list(iter_docx_blocks(_package(body, part="word/document2.xml"))) == ["Moved"]
+
+
+def test_files_that_are_not_docx_packages_are_rejected():
+    with pytest.raises(ValueError, match="Not a valid DOCX file"):
+        list(iter_docx_blocks(b"plain text"))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        archive.writestr("readme.txt", "no document here")
+    with pytest.raises(ValueError, match="no main document part"):
+        list(iter_docx_blocks(buf.getvalue()))
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+import numpy as np
+import pytest
+from app.config import settings
+from app.services import ingestion
+from app.services.embedder import plan_batches
+from app.services.embedding_cache import EmbeddingCache
+from app.utils.helpers import estimate_tokens
+from benchmarks import corpus
+from benchmarks.fakes import FakeEmbedder
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_MAX_BATCH_ITEMS", 8)
+    monkeypatch.setattr(settings, "EMBED_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "EMBED_RETRY_BACKOFF", 0.0)
+
+
+class ScriptedEmbedder(FakeEmbedder):
+    """FakeEmbedder whose batches finish in random order and fail `failures[first text]` times."""
+
+    def __init__(self, failures=None, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _encode(self, texts):
+        with self._lock:
+            self.calls.append(texts[0])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(random.uniform(0.002, 0.01))
+            if self.failures.get(texts[0], 0) > 0:
+                self.failures[texts[0]] -= 1
+                raise ConnectionError(f"batch starting at {texts[0]} failed")
+            return super()._encode(texts)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+TEXTS = [f"text {i} about topic {i % 7}" for i in range(100)]
+
+
+def test_plan_batches_bounds_items_and_tokens():
+    assert plan_batches(["a"] * 10, max_items=4, max_tokens=100) == [(0, 4), (4, 8), (8, 10)]
+    text = "word " * 40
+    assert plan_batches([text] * 4, max_items=10, max_tokens=2 * estimate_tokens(text)) == [(0, 2), (2, 4)]
+    # A text above the token limit gets a batch of its own
+    assert plan_batches(["a", "word " * 500, "a"], max_items=10, max_tokens=100) == [(0, 1), (1, 2), (2, 3)]
+    assert plan_batches([], max_items=4, max_tokens=100) == []
+
+
+def test_concurrent_batches_come_back_in_input_order():
+    embedder = ScriptedEmbedder()
+    vectors = embedder.embed_array(TEXTS)
+    assert vectors.shape == (100, embedder.dim)
+    assert np.allclose(vectors, np.asarray(FakeEmbedder()._encode(TEXTS)))
+    assert len(embedder.calls) == 13
+    assert embedder.max_in_flight > 1
+
+
+def test_failed_batches_are_retried_on_their_own():
+    embedder = ScriptedEmbedder(failures={TEXTS[16]: 2})
+    vectors = embedder.embed_array(TEXTS)
+    assert np.allclose(vectors, np.asarray(FakeEmbedder()._encode(TEXTS)))
+    assert embedder.calls.count(TEXTS[16]) == 3
+    assert embedder.calls.count(TEXTS[0]) == 1
+    assert embedder.stats.snapshot()["retries"] == 2
+
+
+def test_a_batch_out_of_retries_fails_the_call(monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_MAX_RETRIES", 1)
+    embedder = ScriptedEmbedder(failures={TEXTS[16]: 5})
+    with pytest.raises(ConnectionError, match="batch starting at text 16"):
+        embedder.embed_array(TEXTS)
+    stats = embedder.stats.snapshot()
+    assert stats["failures"] == 1
+    assert stats["batches"] == 12  # every other batch still finished
+
+
+def test_batches_that_finished_before_a_failure_are_not_embedded_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_MAX_RETRIES", 0)
+    embedder = ScriptedEmbedder(failures={TEXTS[16]: 1}, cache=EmbeddingCache(str(tmp_path / "cache.db")))
+    with pytest.raises(ConnectionError):
+        embedder.embed_array(TEXTS)
+    embedder.calls.clear()
+    vectors = embedder.embed_array(TEXTS)
+    assert embedder.calls == [TEXTS[16]]
+    assert np.allclose(vectors, np.asarray(FakeEmbedder()._encode(TEXTS)))
+
+
+def test_ingestion_sends_a_document_as_concurrent_batches(monkeypatch):
+    class Store:
+        def upsert(self, doc_id, ids, vectors, metadatas):
+            self.vectors = vectors
+
+    embedder = ScriptedEmbedder()
+    calls = []
+    embed_array = embedder.embed_array
+    monkeypatch.setattr(embedder, "embed_array", lambda texts: calls.append(len(texts)) or embed_array(texts))
+    store = Store()
+    result = ingestion.ingest_document(corpus.make_document("txt", 20), "txt", "notes.txt", embedder, store)
+    assert calls == [result["chunk_count"]]
+    assert store.vectors.shape == (result["chunk_count"], embedder.dim)
+    assert len(embedder.calls) > 1 and embedder.max_in_flight > 1
+
+
+def test_cache_tracks_its_size_without_counting_rows_on_each_put(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(path, max_entries=4)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    cache.put_many({"b": [3.0], "c": [4.0]})  # "b" is overwritten, not counted twice
+    assert not any("COUNT" in s for s in statements)
+    assert cache.stats()["entries"] == 3
+    assert cache.get_many(["b"])["b"].tolist() == [3.0]
+
+    cache.put_many({"d": [5.0], "e": [6.0]})
+    assert cache.stats()["entries"] == 4
+    assert sorted(cache.get_many(["a", "b", "c", "d", "e"])) == ["b", "c", "d", "e"]
+    # A reopened cache starts from the stored row count
+    assert EmbeddingCache(path, max_entries=4).stats()["entries"] == 4
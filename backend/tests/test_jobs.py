@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+import pytest
+from app.services.jobs import SHUTDOWN_ERROR, JobQueue, JobQueueFull
+from app.utils.concurrency import run_blocking
+
+
+def _spooled(tmp_path, name: str) -> str:
+    path = os.path.join(tmp_path, name)
+    with open(path, "wb") as fh:
+        fh.write(b"text")
+    return path
+
+
+def test_finished_jobs_release_their_upload(tmp_path):
+    async def runner(job):
+        return {"doc_id": "d", "chunk_count": 3, "filename": job.filename, "deduplicated": False}
+
+    async def main():
+        queue = JobQueue(runner, concurrency=1, max_pending=4, retention=10)
+        job = queue.submit("a.txt", _spooled(tmp_path, "a.txt"), "txt")
+        await queue._queue.join()
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "completed"
+    assert job.snapshot()["chunks_processed"] == 3
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_jobs_release_their_upload(tmp_path):
+    async def runner(job):
+        raise ValueError("Could not extract any text from the file")
+
+    async def main():
+        queue = JobQueue(runner, concurrency=1, max_pending=4, retention=10)
+        job = queue.submit("a.txt", _spooled(tmp_path, "a.txt"), "txt")
+        await queue._queue.join()
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "failed"
+    assert job.error == "Could not extract any text from the file"
+    assert os.listdir(tmp_path) == []
+
+
+def test_stop_fails_running_and_queued_jobs_and_deletes_their_files(tmp_path):
+    started, proceed = threading.Event(), threading.Event()
+    read = []
+
+    def ingest(path):
+        # Like a parser that opens the spooled file only after some work
+        started.set()
+        proceed.wait(5)
+        with open(path, "rb") as fh:
+            read.append(fh.read())
+
+    async def main():
+        async def runner(job):
+            return await run_blocking("ingest", ingest, job.source)
+
+        queue = JobQueue(runner, concurrency=1, max_pending=4, retention=10)
+        jobs = [queue.submit(f"{i}.txt", _spooled(tmp_path, f"{i}.txt"), "txt") for i in range(3)]
+        jobs.append(queue.submit("bytes.txt", b"in memory", "txt"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        assert queue.pending == 3
+
+        stopping = asyncio.ensure_future(queue.stop())
+        await asyncio.sleep(0.05)
+        # Queued uploads are gone; the one still being read is kept until its thread returns
+        assert sorted(os.listdir(tmp_path)) == ["0.txt"]
+        assert not stopping.done()
+        proceed.set()
+        await stopping
+        assert queue.pending == 0
+        return jobs
+
+    jobs = asyncio.run(main())
+    assert read == [b"text"]
+    assert [job.status for job in jobs] == ["failed"] * 4
+    assert all(job.error == SHUTDOWN_ERROR for job in jobs)
+    assert all(job.source is None and job.finished_at for job in jobs)
+    assert os.listdir(tmp_path) == []
+
+
+def test_submit_raises_when_the_queue_is_full(tmp_path):
+    async def main():
+        async def runner(job):
+            await asyncio.sleep(60)
+
+        queue = JobQueue(runner, concurrency=1, max_pending=1, retention=10)
+        queue.submit("a.txt", b"a", "txt")
+        with pytest.raises(JobQueueFull):
+            queue.submit("b.txt", b"b", "txt")
+        await queue.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import sqlite3
+import numpy as np
+import pytest
+from app.services.lexical_index import LexicalIndex, fuse_hybrid, reciprocal_rank_fusion, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    index.add_document("bio", ["bio-0", "bio-1"], [
+        {"text": "Mitochondria produce ATP by oxidative phosphorylation."},
+        {"text": "Ribosomes translate messenger RNA into protein."},
+    ])
+    index.add_document("chem", ["chem-0"], [{"text": "ATP hydrolysis releases energy; see section 3.2.1."}])
+    return index
+
+
+def test_tokenize_keeps_section_numbers_and_drops_stopwords():
+    assert tokenize("What is the H2O content in section 3.2.1?") == ["h2o", "content", "section", "3.2.1"]
+
+
+def test_search_is_limited_to_the_documents_in_scope(index):
+    assert {m[0] for m in index.search(["bio", "chem"], "ATP")} == {"bio-0", "chem-0"}
+    assert [m[0] for m in index.search(["chem"], "ATP")] == ["chem-0"]
+    assert index.search(["chem"], "ribosomes") == []
+    assert index.search(["missing"], "ATP") == []
+    assert index.search(["bio"], "the of and") == []
+    hit = index.search(["bio"], "messenger RNA")[0]
+    assert hit[0] == "bio-1" and hit[1] > 0 and hit[2] == {"doc_id": "bio"}
+
+
+def test_re_adding_a_document_replaces_its_chunks(index):
+    index.add_document("bio", ["bio-0"], [{"text": "Chloroplasts capture light."}])
+    assert index.search(["bio"], "ribosomes") == []
+    assert [m[0] for m in index.search(["bio"], "chloroplasts")] == ["bio-0"]
+
+
+def test_rarer_terms_weigh_more(index):
+    # "atp" is in two chunks, "phosphorylation" in one
+    assert [m[0] for m in index.search(["bio", "chem"], "ATP phosphorylation")][0] == "bio-0"
+
+
+def test_indexes_with_a_meta_column_are_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE terms (term_id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE);"
+        "CREATE TABLE chunks (chunk INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, doc_id TEXT NOT NULL,"
+        " length INTEGER NOT NULL, meta TEXT NOT NULL);"
+        "CREATE TABLE postings (term_id INTEGER NOT NULL, chunk INTEGER NOT NULL, tf INTEGER NOT NULL,"
+        " PRIMARY KEY (term_id, chunk)) WITHOUT ROWID;"
+        "INSERT INTO terms VALUES (1, 'atp');"
+        "INSERT INTO chunks VALUES (1, 'd-0', 'd', 3, '{\"text\": \"ATP is energy\"}');"
+        "INSERT INTO postings VALUES (1, 1, 1);"
+    )
+    conn.commit()
+    conn.close()
+
+    index = LexicalIndex(path)
+    columns = {row[1] for row in index._conn.execute("PRAGMA table_info(chunks)")}
+    assert columns == {"chunk", "chunk_id", "doc_id", "length"}
+    assert [m[0] for m in index.search(["d"], "ATP")] == ["d-0"]
+
+
+def test_rrf_orders_by_summed_reciprocal_rank_and_keeps_the_first_score():
+    dense = [("a", 0.9, {"src": "dense"}), ("b", 0.8, {}), ("c", 0.7, {})]
+    lexical = [("b", 12.0, {"src": "bm25"}), ("d", 9.0, {}), ("c", 3.0, {})]
+    fused = reciprocal_rank_fusion([dense, lexical], top_k=3, k=60)
+    assert [m[0] for m in fused] == ["b", "c", "a"]
+    assert fused[0][2]["fused_score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0][1] == 0.8 and "src" not in fused[0][2]
+    assert dense[0][2] == {"src": "dense"}  # metadata is copied, not updated in place
+
+
+def test_fuse_hybrid_rescores_lexical_only_hits_by_cosine():
+    q = np.array([1.0, 0.0])
+    dense = [[("a", 0.9, {"doc_id": "d", "text": "a"})]]
+    lexical = [[("b", 7.0, {"doc_id": "d"}), ("gone", 5.0, {"doc_id": "d"}), ("a", 2.0, {"doc_id": "d"})]]
+    requested = []
+
+    def fetch(keys):
+        requested.append(keys)
+        return {"b": (np.array([3.0, 4.0]), {"doc_id": "d", "text": "b"})}
+
+    fused = fuse_hybrid(dense, lexical, [q], fetch, top_k=5)[0]
+    assert requested == [[("d", "b"), ("d", "gone")]]
+    assert [m[0] for m in fused] == ["a", "b"]  # "gone" is not in the vector store
+    assert fused[1][1] == pytest.approx(0.6)
+    assert fused[1][2]["text"] == "b"
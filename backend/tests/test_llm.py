@@ -0,0 +1,254 @@
+import asyncio
+import time
+from typing import AsyncIterator
+import pytest
+from app.config import settings
+from app.services.llm import CircuitBreaker, LLMRouter, OpenAIProvider, Provider, ProviderError
+from benchmarks.fakes import FakeProvider
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TrackedProvider(Provider):
+    """Answers after `latency`, recording calls that were cancelled and streams that were closed."""
+
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self.latency = latency
+        self.cancelled = 0
+        self.closed = 0
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"answer from {self.name}"
+
+    async def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        try:
+            await asyncio.sleep(self.latency)
+            for i in range(3):
+                yield f"{self.name}{i} "
+        finally:
+            self.closed += 1
+
+
+def router(*providers, fallback=None, **kwargs) -> LLMRouter:
+    return LLMRouter(list(providers), fallback=fallback, **{"timeout": 0.2, **kwargs})
+
+
+async def collect(stream) -> str:
+    return "".join([token async for token in stream])
+
+
+def test_breaker_opens_after_threshold_and_recovers_through_half_open():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow()  # one trial call
+    assert not breaker.allow()  # nothing else while it is in flight
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_half_open_trial_reopens_and_released_trial_can_retry():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 10
+    assert breaker.allow()
+    breaker.release()  # e.g. a cancelled hedge: no verdict, so another trial may run
+    assert breaker.allow()
+
+
+def test_deadline_falls_through_to_next_provider():
+    primary, secondary = FakeProvider("primary", latency=0.01), FakeProvider("secondary", latency=0.01)
+    primary.down = True
+    llm = router(primary, secondary, timeout=0.05)
+    assert asyncio.run(llm.generate("s", "u")) == "answer from secondary"
+    stats = llm.stats()
+    assert stats["primary"]["timeouts"] == 1
+    assert stats["secondary"]["ok"] == 1
+
+
+def test_deadline_then_fallback_when_every_provider_fails():
+    primary, local = FakeProvider("primary", latency=0.01), FakeProvider("local", latency=0.01)
+    primary.down = True
+    llm = router(primary, fallback=local, timeout=0.05)
+    assert asyncio.run(llm.generate("s", "u")) == "answer from local"
+    assert llm.stats()["primary"]["timeouts"] == 1
+    assert llm.stats()["local"]["ok"] == 1
+
+
+def test_no_provider_and_no_fallback_raises():
+    primary = FakeProvider("primary", latency=0.0)
+    primary.error = True
+    with pytest.raises(ProviderError, match="primary"):
+        asyncio.run(router(primary).generate("s", "u"))
+
+
+def test_open_breaker_skips_provider_without_waiting():
+    primary, secondary = FakeProvider("primary", latency=0.0), FakeProvider("secondary", latency=0.0)
+    primary.error = True
+    llm = router(primary, secondary, failure_threshold=2, reset_seconds=60)
+
+    async def run():
+        return [await llm.generate("s", "u") for _ in range(5)]
+
+    assert asyncio.run(run()) == ["answer from secondary"] * 5
+    assert primary.calls == 2
+    stats = llm.stats()["primary"]
+    assert stats["state"] == "open" and stats["errors"] == 2 and stats["skipped"] == 3
+
+
+def test_breaker_closes_after_successful_trial():
+    primary, secondary = FakeProvider("primary", latency=0.0), FakeProvider("secondary", latency=0.0)
+    primary.error = True
+    llm = router(primary, secondary, failure_threshold=1, reset_seconds=0.05)
+
+    async def run():
+        first = await llm.generate("s", "u")
+        primary.error = False
+        await asyncio.sleep(0.06)
+        return first, await llm.generate("s", "u")
+
+    assert asyncio.run(run()) == ("answer from secondary", "answer from primary")
+    assert llm.stats()["primary"]["state"] == "closed"
+
+
+def test_hedge_winner_cancels_the_slow_call():
+    slow, fast = TrackedProvider("slow", latency=1.0), TrackedProvider("fast", latency=0.01)
+    llm = router(slow, fast, timeout=5.0, hedge_after=0.05)
+    started = time.perf_counter()
+    assert asyncio.run(llm.generate("s", "u")) == "answer from fast"
+    assert time.perf_counter() - started < 0.5
+    assert slow.cancelled == 1
+    stats = llm.stats()
+    assert stats["fast"]["hedged"] == 1 and stats["slow"]["cancelled"] == 1
+    # A cancelled call is no verdict on the provider
+    assert stats["slow"]["state"] == "closed"
+
+
+def test_hedged_stream_closes_the_losing_stream():
+    slow, fast = TrackedProvider("slow", latency=1.0), TrackedProvider("fast", latency=0.01)
+    llm = router(slow, fast, timeout=5.0, hedge_after=0.05)
+    assert asyncio.run(collect(llm.stream("s", "u"))) == "fast0 fast1 fast2 "
+    assert slow.closed == 1 and fast.closed == 1
+
+
+class GatedProvider(TrackedProvider):
+    """
+    Streams once `gate` is set, so several providers can open their streams in the same
+    round. Keeps its streams referenced, as a pooled HTTP connection would, so garbage
+    collection cannot close a stream the router forgot.
+    """
+
+    def __init__(self, name: str, gate: asyncio.Event):
+        super().__init__(name, latency=0.0)
+        self.gate = gate
+        self.opened = 0
+        self.streams = []
+
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        await self.gate.wait()
+        return f"answer from {self.name}"
+
+    def stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        self.streams.append(self._stream())
+        return self.streams[-1]
+
+    async def _stream(self) -> AsyncIterator[str]:
+        try:
+            await self.gate.wait()
+            self.opened += 1
+            for i in range(3):
+                yield f"{self.name}{i} "
+        finally:
+            self.closed += 1
+
+
+def test_streams_opened_in_the_same_round_as_the_winner_are_closed():
+    async def main():
+        gate = asyncio.Event()
+        first, second = GatedProvider("first", gate), GatedProvider("second", gate)
+        llm = router(first, second, timeout=5.0, hedge_after=0.01)
+        answer = asyncio.ensure_future(collect(llm.stream("s", "u")))
+        await asyncio.sleep(0.05)  # the hedge has started the second provider
+        gate.set()
+        text = await answer
+        # Counted before asyncio.run finalizes any generator left open
+        return text, (first.opened, second.opened), (first.closed, second.closed)
+
+    text, opened, closed = asyncio.run(main())
+    assert opened == (1, 1)
+    assert text == "first0 first1 first2 "  # the preferred provider wins a tie
+    assert closed == (1, 1)
+
+
+class FakeAsyncStream:
+    """Stands in for openai.AsyncStream: async iteration plus an awaitable close()."""
+
+    class _Chunk:
+        def __init__(self, text):
+            delta = type("Delta", (), {"content": text})()
+            self.choices = [type("Choice", (), {"delta": delta})()]
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for text in self.texts:
+            yield self._Chunk(text)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_openai_stream_is_closed_when_consumer_stops_early():
+    response = FakeAsyncStream(["a", "b", "c"])
+    provider = OpenAIProvider.__new__(OpenAIProvider)
+
+    async def create(system_prompt, user_prompt, stream):
+        return response
+
+    provider._create = create
+
+    async def run():
+        stream = provider.stream("s", "u")
+        first = await stream.__anext__()
+        await stream.aclose()  # what the router does when the stream is cancelled or loses a race
+        return first
+
+    assert asyncio.run(run()) == "a"
+    assert response.closed
+
+
+def test_openai_client_uses_the_configured_key(monkeypatch):
+    pytest.importorskip("openai")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk-from-settings")
+    assert OpenAIProvider("gpt-4o-mini", 5.0, 4).client.api_key == "sk-from-settings"
@@ -0,0 +1,90 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.utils import metrics
+from app.utils.concurrency import run_blocking
+from app.utils.metrics import Histogram, MetricsMiddleware, server_timing, span, timed, timed_iter
+
+
+def _stage(name):
+    return metrics.STAGE_SECONDS.totals().get((("stage", name),), (0, 0.0))
+
+
+def test_nested_spans_report_their_own_time():
+    with span("test.outer"):
+        time.sleep(0.01)
+        with span("test.inner"):
+            time.sleep(0.06)
+    outer, inner = _stage("test.outer"), _stage("test.inner")
+    assert outer[0] == inner[0] == 1
+    assert 0.01 <= outer[1] < 0.06 <= inner[1]
+
+
+def test_timed_helpers_and_errors():
+    def produce():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+
+    assert list(timed_iter("test.iter", produce())) == [0, 1, 2]
+    assert _stage("test.iter")[0] == 4  # one span per item, plus the one that hit the end
+    assert _stage("test.iter")[1] >= 0.03
+
+    def fail():
+        raise KeyError("x")
+
+    with pytest.raises(KeyError):
+        timed("test.fail", fail)()
+    assert 'studybuddy_stage_errors_total{stage="test.fail"} 1' in metrics.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("h", "help", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        hist.observe(value, stage="a")
+    lines = hist.render()
+    assert 'h_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'h_bucket{stage="a",le="1.0"} 3' in lines
+    assert 'h_bucket{stage="a",le="+Inf"} 4' in lines
+    assert 'h_count{stage="a"} 4' in lines
+
+
+def test_server_timing_header_value():
+    assert server_timing({"qa.embed_query": 0.0125, "qa.llm": 1.5}, total=2.0) == (
+        "qa-embed_query;dur=12.50, qa-llm;dur=1500.00, total;dur=2000.00"
+    )
+
+
+async def _app(scope, receive, send):
+    """ASGI app with one stage on the event loop and one on a worker pool."""
+    with span("test.loop"):
+        time.sleep(0.01)
+    await run_blocking("qa", timed("test.worker", time.sleep), 0.02)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _get(app) -> httpx.Response:
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/")
+
+    return asyncio.run(get())
+
+
+def test_server_timing_covers_stages_run_on_worker_threads():
+    response = _get(MetricsMiddleware(_app, timing_headers=True))
+    parts = dict(part.split(";dur=") for part in response.headers["server-timing"].split(", "))
+    assert list(parts) == ["test-loop", "test-worker", "total"]
+    assert float(parts["test-worker"]) >= 20 and float(parts["total"]) >= 30
+    assert "server-timing" not in _get(MetricsMiddleware(_app)).headers
+
+
+def test_nothing_is_recorded_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", False)
+    before = _stage("test.loop")
+    response = _get(MetricsMiddleware(_app, timing_headers=True))
+    assert response.status_code == 200 and "server-timing" not in response.headers
+    assert _stage("test.loop") == before
@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import pytest
+from app.services.numpy_store import NumpyIndex, dequantize, quantize
+
+DIM = 8
+
+
+def _rows(rng, n):
+    return rng.normal(size=(n, DIM)).astype(np.float32)
+
+
+def _upsert(store, doc_id, vectors, start=0):
+    ids = [f"{doc_id}-{i}" for i in range(start, start + len(vectors))]
+    store.upsert(doc_id, ids, vectors, [{"doc_id": doc_id, "text": f"text of {i}"} for i in ids])
+    return ids
+
+
+def _version(doc_dir):
+    """Directory of the document's current version."""
+    return NumpyIndex._data_dir(str(doc_dir))
+
+
+def _brute_force(docs, q, top_k):
+    q = q / np.linalg.norm(q)
+    scored = [
+        (mid, float(v @ q / np.linalg.norm(v)))
+        for ids, vectors in docs for mid, v in zip(ids, vectors)
+    ]
+    return sorted(scored, key=lambda s: -s[1])[:top_k]
+
+
+def test_queries_merge_the_top_k_across_documents(tmp_path):
+    rng = np.random.default_rng(0)
+    store = NumpyIndex(str(tmp_path))
+    docs = [(_upsert(store, d, vectors), vectors) for d, vectors in (("a", _rows(rng, 30)), ("b", _rows(rng, 20)))]
+    queries = _rows(rng, 3)
+    results = store.query_batch(["a", "b", "missing"], queries, top_k=5)
+    for q, matches in zip(queries, results):
+        expected = _brute_force(docs, q, 5)
+        assert [m[0] for m in matches] == [mid for mid, _ in expected]
+        assert [m[1] for m in matches] == pytest.approx([score for _, score in expected], abs=1e-5)
+        assert all(m[2] == {"doc_id": m[0].split("-")[0], "text": f"text of {m[0]}"} for m in matches)
+    assert [m[0] for m in store.query_many(["a", "b"], queries[0], 5)] == [m[0] for m in results[0]]
+    assert store.query_batch(["missing"], queries, 5) == [[], [], []]
+    assert store.query_batch(["a"], [], 5) == []
+
+
+def test_re_upserting_replaces_rows_with_the_same_id_and_keeps_the_rest(tmp_path):
+    rng = np.random.default_rng(1)
+    store = NumpyIndex(str(tmp_path))
+    _upsert(store, "a", _rows(rng, 4))
+    store.query("a", _rows(rng, 1)[0])  # cache a handle that the upsert must drop
+    replacement = _rows(rng, 2)
+    _upsert(store, "a", replacement, start=3)  # replaces a-3, adds a-4
+    matches = store.query("a", replacement[1], top_k=10)
+    assert sorted(m[0] for m in matches) == ["a-0", "a-1", "a-2", "a-3", "a-4"]
+    assert matches[0][0] == "a-4" and matches[0][1] == pytest.approx(1.0)
+    fetched = store.fetch("a", ["a-3"])
+    assert np.allclose(fetched["a-3"][0], replacement[0] / np.linalg.norm(replacement[0]))
+
+
+def test_fetch_finds_ids_that_do_not_match_their_row(tmp_path):
+    rng = np.random.default_rng(2)
+    store = NumpyIndex(str(tmp_path))
+    vectors = _rows(rng, 3)
+    store.upsert("a", ["x-2", "chunk", "x-0"], vectors, [{"text": "p"}, {"text": "q"}, {"text": "r"}])
+    found = store.fetch("a", ["x-0", "chunk", "absent", "x-9"])
+    assert sorted(found) == ["chunk", "x-0"]
+    assert found["x-0"][1] == {"text": "r"}
+    assert np.allclose(found["chunk"][0], vectors[1] / np.linalg.norm(vectors[1]))
+    assert store.fetch("missing", ["x-0"]) == {}
+
+
+def test_doc_ids_cannot_escape_the_store_root(tmp_path):
+    store = NumpyIndex(str(tmp_path / "store"))
+    store.upsert("../outside", ["c-0"], np.ones((1, DIM)), [{"text": "t"}])
+    assert os.listdir(tmp_path) == ["store"]
+    assert [m[0] for m in store.query("../outside", np.ones(DIM))] == ["c-0"]
+
+
+def test_open_handles_are_bounded(tmp_path):
+    rng = np.random.default_rng(3)
+    store = NumpyIndex(str(tmp_path), max_open_docs=2)
+    for doc_id in "abc":
+        _upsert(store, doc_id, _rows(rng, 3))
+    store.query_many(list("abc"), _rows(rng, 1)[0])
+    assert list(store._open) == ["b", "c"]
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+def test_quantize_round_trips_within_the_dtype_precision(dtype, tolerance):
+    mat = np.random.default_rng(4).normal(size=(50, DIM)).astype(np.float32)
+    mat[0] = 0.0
+    data, scales = quantize(mat, dtype)
+    assert data.dtype == np.dtype(dtype)
+    assert (scales is not None) == (dtype == "int8")
+    restored = dequantize(data, scales)
+    assert np.abs(restored - mat).max() <= tolerance * np.abs(mat).max()
+    assert not restored[0].any()
+
+
+def test_quantized_documents_are_rescored_exactly(tmp_path):
+    rng = np.random.default_rng(5)
+    vectors, queries = _rows(rng, 200), _rows(rng, 4)
+    exact = NumpyIndex(str(tmp_path / "exact"))
+    _upsert(exact, "a", vectors)
+    for dtype in ("float16", "int8"):
+        store = NumpyIndex(str(tmp_path / dtype), dtype=dtype, rescore_factor=8)
+        _upsert(store, "a", vectors)
+        assert np.load(os.path.join(_version(tmp_path / dtype / "a"), "vectors.npy")).dtype == np.dtype(dtype)
+        for got, want in zip(store.query_batch(["a"], queries, 5), exact.query_batch(["a"], queries, 5)):
+            assert [m[0] for m in got] == [m[0] for m in want]
+            assert [m[1] for m in got] == pytest.approx([m[1] for m in want], abs=1e-6)
+
+
+def test_without_rescoring_no_float32_copy_is_kept(tmp_path):
+    rng = np.random.default_rng(6)
+    vectors = _rows(rng, 20)
+    store = NumpyIndex(str(tmp_path), dtype="int8", rescore=False)
+    _upsert(store, "a", vectors)
+    assert sorted(os.listdir(_version(tmp_path / "a"))) == ["meta.jsonl", "offsets.npy", "scales.npy", "vectors.npy"]
+    match = store.query("a", vectors[3], top_k=1)[0]
+    assert match[0] == "a-3" and match[1] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_documents_keep_the_dtype_they_were_written_with(tmp_path):
+    rng = np.random.default_rng(7)
+    vectors = _rows(rng, 10)
+    _upsert(NumpyIndex(str(tmp_path), dtype="int8"), "a", vectors)
+    store = NumpyIndex(str(tmp_path))  # float32 now
+    assert store.query("a", vectors[2], top_k=1)[0][0] == "a-2"
+    # Rewriting the document stores it as float32 and drops the int8 side files
+    _upsert(store, "a", vectors[:1])
+    assert sorted(os.listdir(_version(tmp_path / "a"))) == ["meta.jsonl", "offsets.npy", "vectors.npy"]
+    assert np.load(os.path.join(_version(tmp_path / "a"), "vectors.npy")).dtype == np.float32
+
+
+def test_unknown_dtypes_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported vector dtype"):
+        NumpyIndex(str(tmp_path), dtype="int4")
+
+
+def test_open_handles_keep_reading_the_version_they_opened(tmp_path):
+    rng = np.random.default_rng(8)
+    vectors = _rows(rng, 6)
+    writer, reader = NumpyIndex(str(tmp_path)), NumpyIndex(str(tmp_path))  # e.g. two worker processes
+    _upsert(writer, "a", vectors)
+    before = reader.query("a", vectors[4], top_k=1)[0]
+    # Add rows, then replace a's own rows: their records now sit at other offsets
+    ids = [f"b-{i}" for i in range(6)]
+    writer.upsert("a", ids, vectors[::-1], [{"doc_id": "a", "text": "x" * 100} for _ in ids])
+    writer.upsert("a", [f"a-{i}" for i in range(6)], vectors, [{"doc_id": "a", "text": "y"} for _ in range(6)])
+    # The reader's cached handle still pairs the old offsets with the old records
+    assert reader.query("a", vectors[4], top_k=1)[0] == before
+    assert reader.fetch("a", ["a-4"])["a-4"][1] == before[2]
+    assert sorted(os.listdir(tmp_path / "a")) == ["current", os.path.basename(_version(tmp_path / "a"))]
+
+
+def test_documents_written_before_versioning_are_read_and_migrated(tmp_path):
+    rng = np.random.default_rng(9)
+    vectors = _rows(rng, 3)
+    store = NumpyIndex(str(tmp_path))
+    _upsert(store, "a", vectors)
+    # Lay the version out the way older stores did, directly in the document directory
+    version = _version(tmp_path / "a")
+    for name in os.listdir(version):
+        os.replace(os.path.join(version, name), tmp_path / "a" / name)
+    os.rmdir(version)
+    os.unlink(tmp_path / "a" / "current")
+
+    store = NumpyIndex(str(tmp_path))
+    assert store.query("a", vectors[1], top_k=1)[0][0] == "a-1"
+    _upsert(store, "a", _rows(rng, 1), start=3)
+    assert sorted(os.listdir(tmp_path / "a")) == ["current", os.path.basename(_version(tmp_path / "a"))]
+    assert sorted(m[0] for m in store.query("a", vectors[0], top_k=10)) == ["a-0", "a-1", "a-2", "a-3"]
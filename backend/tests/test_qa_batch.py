@@ -0,0 +1,58 @@
+from app.config import settings
+from app.services.container import container
+from benchmarks import corpus
+
+
+def _upload(api) -> str:
+    data = corpus.make_document("txt", pages=3)
+    return api("POST", "/upload/", files={"file": ("notes.txt", data)}).json()["doc_id"]
+
+
+def test_batch_answers_in_question_order_with_one_embedding_call_and_one_search(api, monkeypatch):
+    doc_id = _upload(api)
+    embedded, searched = [], []
+    embed_array, query_batch = container.embedder.embed_array, container.store.query_batch
+    monkeypatch.setattr(container.embedder, "embed_array", lambda texts: embedded.append(texts) or embed_array(texts))
+    monkeypatch.setattr(container.store, "query_batch", lambda *a, **k: searched.append(a) or query_batch(*a, **k))
+
+    questions = ["What is the first topic about?", "  ", "Which topic comes last?"]
+    results = api("POST", "/qa/batch", json={"questions": questions, "doc_id": doc_id, "top_k": 3}).json()["results"]
+    assert [r["question"] for r in results] == questions
+    assert results[1]["error"] == "Question is empty" and results[1]["answer"] is None
+    for r in (results[0], results[2]):
+        assert r["answer"] and r["error"] is None and not r["cached"]
+        assert 0 < r["used_chunks"] <= 3 and len(r["sources"]) == r["used_chunks"]
+    assert embedded == [[questions[0], questions[2]]]
+    assert len(searched) == 1
+
+    # Asked again, both come from the answer cache without another search
+    again = api("POST", "/qa/batch", json={"questions": questions, "doc_id": doc_id, "top_k": 3}).json()["results"]
+    assert [r["cached"] for r in again] == [True, False, True]
+    assert [r["answer"] for r in again] == [r["answer"] for r in results]
+    assert len(searched) == 1
+
+
+def test_a_failing_question_does_not_fail_the_batch(api, monkeypatch):
+    doc_id = _upload(api)
+    generate = container.llm.generate
+
+    async def flaky(system_prompt, user_prompt):
+        if "explode" in user_prompt:
+            raise RuntimeError("provider timed out")
+        return await generate(system_prompt, user_prompt)
+
+    monkeypatch.setattr(container.llm, "generate", flaky)
+    questions = ["What is the first topic about?", "Please explode now"]
+    results = api("POST", "/qa/batch", json={"questions": questions, "doc_id": doc_id}).json()["results"]
+    assert results[0]["answer"] and results[0]["error"] is None
+    assert results[1]["error"] == "provider timed out" and results[1]["answer"] is None
+
+
+def test_batch_limits(api, monkeypatch):
+    doc_id = _upload(api)
+    monkeypatch.setattr(settings, "QA_BATCH_MAX_QUESTIONS", 2)
+    response = api("POST", "/qa/batch", json={"questions": ["a", "b", "c"], "doc_id": doc_id})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "At most 2 questions per batch"
+    assert api("POST", "/qa/batch", json={"questions": [], "doc_id": doc_id}).status_code == 400
+    assert api("POST", "/qa/batch", json={"questions": ["a"], "doc_id": doc_id, "top_k": 0}).status_code == 422
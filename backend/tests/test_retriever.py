@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+from app.config import settings
+from app.services.retriever import UpsertError, VectorStore, _similarity
+
+chromadb = pytest.importorskip("chromadb")
+
+DIM = 8
+
+
+@pytest.fixture
+def chroma(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_DB", "chroma")
+    monkeypatch.setattr(settings, "CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(settings, "CHROMA_COLLECTION", "chunks")
+
+    def open_store(layout):
+        monkeypatch.setattr(settings, "CHROMA_LAYOUT", layout)
+        return VectorStore()
+
+    return open_store
+
+
+def _doc(doc_id, vectors):
+    ids = [f"{doc_id}-{i}" for i in range(len(vectors))]
+    return ids, [{"doc_id": doc_id, "text": f"text of {i}"} for i in ids]
+
+
+def test_distances_map_to_cosine_similarity():
+    assert _similarity("cosine")(0.25) == pytest.approx(0.75)
+    # Squared L2 between unit vectors at cosine 0.75 is 2 - 2 * 0.75
+    assert _similarity("l2")(0.5) == pytest.approx(0.75)
+
+
+def test_shared_layout_also_searches_collections_written_before_the_switch(chroma, monkeypatch):
+    rng = np.random.default_rng(0)
+    old_vectors, new_vectors = rng.normal(size=(3, DIM)), rng.normal(size=(3, DIM))
+    old_vectors /= np.linalg.norm(old_vectors, axis=1, keepdims=True)
+    store = chroma("shared")
+    # A per-document collection from before the switch, created without a space (so l2)
+    old_ids, old_metas = _doc("old", old_vectors)
+    store.client.create_collection("doc_old").add(ids=old_ids, embeddings=old_vectors, metadatas=old_metas)
+    new_ids, new_metas = _doc("new", new_vectors)
+    store.upsert("new", new_ids, new_vectors, new_metas)
+    listed = []
+    list_collections = store.client.list_collections
+    monkeypatch.setattr(store.client, "list_collections", lambda: listed.append(1) or list_collections())
+
+    q = old_vectors[0]
+    matches = store.query_many(["old", "new"], q.tolist(), top_k=6)
+    assert sorted(m[0] for m in matches) == sorted(old_ids + new_ids)
+    # Both collections report cosine similarity, so the merge order is by true similarity
+    cosines = {
+        mid: float(v @ q / np.linalg.norm(v))
+        for ids, vectors in ((old_ids, old_vectors), (new_ids, new_vectors))
+        for mid, v in zip(ids, vectors)
+    }
+    assert matches[0][0] == "old-0"
+    assert [m[1] for m in matches] == pytest.approx(sorted(cosines.values(), reverse=True), abs=1e-4)
+    assert [m[1] for m in matches] == pytest.approx([cosines[m[0]] for m in matches], abs=1e-4)
+
+    batch = store.query_batch(["old", "new"], np.stack([q, new_vectors[1]]), top_k=2)
+    assert [m[0] for m in batch[0]] == [m[0] for m in matches[:2]]
+    assert batch[1][0][0] == "new-1"
+    assert sorted(store.fetch([("old", "old-2"), ("new", "new-0")])) == ["new-0", "old-2"]
+    assert store._legacy_docs(["old", "new", "other"]) == ["old"]
+    assert len(listed) == 1
+
+
+def test_per_doc_layout_treats_every_document_as_its_own_collection(chroma):
+    store = chroma("per_doc")
+    assert store._legacy_docs(["a", "b"]) == ["a", "b"]
+    assert store._collection("a") is None
+    assert store.query_many(["a"], [1.0] * DIM) == []
+
+
+class FlakyWrite:
+    """Records each batch written; batches starting at a row in `failures` fail that many times."""
+
+    def __init__(self, failures=None, error=ConnectionError):
+        self.failures = dict(failures or {})
+        self.error = error
+        self.calls = []
+
+    def __call__(self, ids, embeddings, metadatas):
+        start = int(ids[0].rsplit("-", 1)[1])
+        self.calls.append((start, len(ids)))
+        if self.failures.get(start, 0) > 0:
+            self.failures[start] -= 1
+            raise self.error(f"batch at {start} failed")
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "UPSERT_RETRIES", 2)
+    monkeypatch.setattr(settings, "UPSERT_RETRY_BACKOFF", 0.0)
+
+
+def _rows(n):
+    return [f"d-{i}" for i in range(n)], np.zeros((n, DIM), np.float32), [{} for _ in range(n)]
+
+
+def test_upserts_are_split_into_batches_and_retried(chroma, fast_retries):
+    store = chroma("shared")
+    write = FlakyWrite(failures={4: 2})
+    store._write_batches("doc", write, 4, *_rows(10))
+    assert sorted(set(write.calls)) == [(0, 4), (4, 4), (8, 2)]
+    assert write.calls.count((4, 4)) == 3
+
+
+def test_batches_out_of_retries_are_reported_by_row_range(chroma, fast_retries):
+    store = chroma("shared")
+    write = FlakyWrite(failures={4: 5})
+    with pytest.raises(UpsertError, match="Upsert of 4 vectors for doc failed: batch at 4 failed") as raised:
+        store._write_batches("doc", write, 4, *_rows(10))
+    assert raised.value.failed == [(4, 8)]
+    # Malformed batches are not retried
+    write = FlakyWrite(failures={0: 1}, error=ValueError)
+    with pytest.raises(UpsertError):
+        store._write_batches("doc", write, 4, *_rows(4))
+    assert write.calls == [(0, 4)]
+
+
+def test_upsert_many_writes_shared_batches_and_maps_failures_to_documents(chroma, fast_retries, monkeypatch):
+    store = chroma("shared")
+    write = FlakyWrite(failures={4: 5})
+    monkeypatch.setattr(store, "_writer", lambda doc_id: (write, 4))
+    docs = []
+    for doc_id, start, n in (("a", 0, 3), ("b", 3, 3), ("c", 6, 4)):
+        ids = [f"x-{i}" for i in range(start, start + n)]
+        docs.append((doc_id, ids, np.zeros((n, DIM), np.float32), [{} for _ in ids]))
+    errors = store.upsert_many(docs)
+    assert sorted(set(write.calls)) == [(0, 4), (4, 4), (8, 2)]  # three documents, three requests
+    assert sorted(errors) == ["b", "c"]  # rows 4-7 belong to b and c
+    assert isinstance(errors["b"], UpsertError)
+
+
+def test_collection_handles_are_cached_and_bounded(chroma, monkeypatch):
+    monkeypatch.setattr(settings, "CHROMA_MAX_CACHED_COLLECTIONS", 2)
+    store = chroma("per_doc")
+    for doc_id in "abc":
+        store.upsert(doc_id, [f"{doc_id}-0"], np.ones((1, DIM)), [{"doc_id": doc_id}])
+    assert list(store._collections) == ["doc_b", "doc_c"]
+    lookups = []
+    get_collection = store.client.get_collection
+    monkeypatch.setattr(store.client, "get_collection", lambda name: lookups.append(name) or get_collection(name))
+    for doc_id in "cbca":
+        assert store.query(doc_id, [1.0] * DIM)[0][0] == f"{doc_id}-0"
+    assert lookups == ["doc_a"]
+    assert list(store._collections) == ["doc_c", "doc_a"]
@@ -0,0 +1,18 @@
+import pytest
+from pydantic import ValidationError
+from app.models.schemas import MAX_TOP_K, QABatchRequest, QARequest
+
+
+@pytest.mark.parametrize("top_k", [0, -1, MAX_TOP_K + 1])
+def test_out_of_range_top_k_is_rejected(top_k):
+    with pytest.raises(ValidationError):
+        QARequest(question="q", doc_id="d", top_k=top_k)
+    with pytest.raises(ValidationError):
+        QABatchRequest(questions=["q"], doc_id="d", top_k=top_k)
+
+
+def test_top_k_defaults_and_bounds():
+    assert QARequest(question="q").top_k == 5
+    assert QABatchRequest(questions=["q"]).top_k == 5
+    assert QARequest(question="q", top_k=1).top_k == 1
+    assert QABatchRequest(questions=["q"], top_k=MAX_TOP_K).top_k == MAX_TOP_K
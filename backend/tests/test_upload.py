@@ -0,0 +1,185 @@
+import asyncio
+import os
+import tracemalloc
+import httpx
+import pytest
+from app.config import settings
+from app.routes.upload import _TooLarge, _spool
+from app.services.ingestion import iter_chunks
+from app.services.txtparser import iter_txt_paragraphs
+from app.utils.limits import BodySizeLimitMiddleware
+from benchmarks import corpus
+
+MB = 1024 * 1024
+
+
+def _on_disk(tmp_path, ext: str, data: bytes) -> str:
+    path = os.path.join(tmp_path, f"upload.{ext}")
+    with open(path, "wb") as fh:
+        fh.write(data)
+    return path
+
+
+def test_txt_paragraphs_match_for_bytes_and_path(tmp_path):
+    text = (
+        "First paragraph,\nsecond line.\n\n"
+        "Separated by a blank line.\n   \n"
+        "Separated by a whitespace-only line.\r\n\r\n"
+        "Windows line endings.\n\t\n\n\n"
+        "Last one, no trailing newline"
+    ).encode()
+    expected = [
+        "First paragraph,\nsecond line.",
+        "Separated by a blank line.",
+        "Separated by a whitespace-only line.",
+        "Windows line endings.",
+        "Last one, no trailing newline",
+    ]
+    assert list(iter_txt_paragraphs(text)) == expected
+    assert list(iter_txt_paragraphs(_on_disk(tmp_path, "txt", text))) == expected
+
+
+@pytest.mark.parametrize("ext", ["pdf", "docx", "txt"])
+def test_chunks_match_for_bytes_and_path(tmp_path, ext):
+    data = corpus.make_document(ext, pages=3)
+    in_memory = list(iter_chunks(ext, data, parallel=False))
+    spooled = list(iter_chunks(ext, _on_disk(tmp_path, ext, data), parallel=False))
+    assert in_memory
+    assert in_memory == spooled
+
+
+class Reader:
+    """`await read(n)` over `size` bytes, counting the bytes handed out."""
+
+    def __init__(self, size: int):
+        self.remaining = size
+        self.read_bytes = 0
+
+    async def read(self, n: int) -> bytes:
+        n = min(n, self.remaining)
+        self.remaining -= n
+        self.read_bytes += n
+        return b"x" * n
+
+
+def test_spool_keeps_small_uploads_in_memory(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_THRESHOLD_MB", 2)
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    source = asyncio.run(_spool(Reader(MB // 2).read, 64 * 1024, 4 * MB, "txt"))
+    assert source == b"x" * (MB // 2)
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_writes_large_uploads_to_a_temp_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_THRESHOLD_MB", 2)
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    source = asyncio.run(_spool(Reader(3 * MB).read, 64 * 1024, 4 * MB, "txt"))
+    assert os.path.dirname(source) == str(tmp_path)
+    assert source.endswith(".txt")
+    assert os.path.getsize(source) == 3 * MB
+
+
+def test_spool_stops_reading_at_the_limit_and_discards_the_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_THRESHOLD_MB", 2)
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    step = 64 * 1024
+    reader = Reader(100 * MB)
+    with pytest.raises(_TooLarge):
+        asyncio.run(_spool(reader.read, step, 2 * MB, "txt"))
+    assert reader.read_bytes == 2 * MB + step  # the step that crossed the limit, nothing after it
+    assert os.listdir(tmp_path) == []
+
+
+async def _echo_length(scope, receive, send):
+    """ASGI app that reads the whole body and answers with its length."""
+    size = 0
+    while True:
+        message = await receive()
+        size += len(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(size).encode()})
+
+
+def _post(app, content, headers=None) -> httpx.Response:
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/upload/", content=content, headers=headers)
+
+    return asyncio.run(post())
+
+
+def test_body_limit_rejects_on_content_length_without_reading():
+    sent = []
+
+    async def body():
+        for _ in range(10):
+            sent.append(1)
+            yield b"x" * MB
+
+    app = BodySizeLimitMiddleware(_echo_length, max_bytes=2 * MB, prefixes=("/upload",))
+    response = _post(app, body(), headers={"Content-Length": str(10 * MB)})
+    assert response.status_code == 413
+    assert sent == []
+
+
+def test_body_limit_rejects_a_streamed_body_once_it_crosses_the_limit():
+    sent = []
+
+    async def body():
+        for _ in range(10):
+            sent.append(1)
+            yield b"x" * MB
+
+    app = BodySizeLimitMiddleware(_echo_length, max_bytes=2 * MB, prefixes=("/upload",))
+    response = _post(app, body())
+    assert response.status_code == 413
+    assert len(sent) == 3
+
+
+def test_body_limit_passes_bodies_under_the_limit():
+    app = BodySizeLimitMiddleware(_echo_length, max_bytes=2 * MB, prefixes=("/upload",))
+    response = _post(app, b"x" * MB)
+    assert response.status_code == 200
+    assert response.text == str(MB)
+
+
+def test_concurrent_large_uploads_are_spooled_not_held(api, tmp_path, monkeypatch):
+    """
+    Four 38 MB uploads at once: the traced Python memory peak stays near one spool
+    threshold per upload, far below a single whole file.
+    """
+    import fitz
+    from app.main import app
+
+    path = tmp_path / "large.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Mitochondria produce ATP through oxidative phosphorylation.")
+    doc.embfile_add("blob.bin", os.urandom(38 * MB))  # incompressible, so the file is as large
+    doc.save(str(path))
+    doc.close()
+    size = os.path.getsize(path)
+
+    async def upload(client):
+        with open(path, "rb") as fh:
+            response = await client.post("/upload/", files={"file": ("large.pdf", fh)})
+        return response.status_code
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            return await asyncio.gather(*(upload(client) for _ in range(4)))
+
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_THRESHOLD_MB", 2)
+    tracemalloc.start()
+    try:
+        statuses = asyncio.run(burst())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert statuses == [200] * 4
+    # Per upload: the 2 MB spool buffer, one read step, Starlette's 1 MB in-memory part, 1 MB slack
+    per_upload = (2 + settings.UPLOAD_READ_CHUNK_KB / 1024 + 1 + 1) * MB
+    assert peak < 4 * per_upload < size, f"peak {peak / MB:.1f} MB for four {size / MB:.1f} MB uploads"
@@ -1,6 +1,6 @@
 import streamlit as st
 from datetime import datetime
-from utils import upload_document, ask_question, check_api_connection, format_sources
+from utils import upload_document, ask_question_stream, check_api_connection, format_sources
 from config import PAGE_TITLE, PAGE_ICON, LAYOUT, ALLOWED_FILE_TYPES, DEFAULT_TOP_K, MAX_TOP_K
 
 # Page configuration
@@ -184,7 +184,7 @@ def main():
                     with st.expander("📚 Sources"):
                         for source in message["sources"]:
                             st.write(f"**Chunk {source.get('chunk', 'N/A')}** (Score: {source.get('score', 0):.3f})")
-                            st.write(f"*{source.get('filename', 'Unknown file')}*")
+                            st.write(f"*{source.get('filename', 'Unknown file')}*" + (f", page {source['page']}" if source.get('page') else ""))
     
     # Chat input
     if prompt := st.chat_input("Ask a question about your document..."):
@@ -195,32 +195,29 @@ def main():
         with st.chat_message("user"):
             st.write(prompt)
         
-        # Get AI response
+        # Get AI response, rendering tokens as they arrive
         with st.chat_message("assistant"):
-            with st.spinner("🤔 Thinking..."):
-                response = ask_question(prompt, st.session_state.current_doc_id)
+            meta = {}
+            answer = st.write_stream(ask_question_stream(prompt, st.session_state.current_doc_id, meta=meta))
+            
+            if answer and "error" not in meta:
+                sources = meta.get("sources", [])
+                used_chunks = meta.get("used_chunks", len(sources))
                 
-                if response:
-                    answer = response["answer"]
-                    sources = response["sources"]
-                    used_chunks = response["used_chunks"]
-                    
-                    st.write(answer)
-                    
-                    # Show sources
-                    with st.expander(f"📚 Sources ({used_chunks} chunks used)"):
-                        for source in sources:
-                            st.write(f"**Chunk {source.get('chunk', 'N/A')}** (Score: {source.get('score', 0):.3f})")
-                            st.write(f"*{source.get('filename', 'Unknown file')}*")
-                    
-                    # Add assistant message to chat
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": answer,
-                        "sources": sources
-                    })
-                else:
-                    st.error("Failed to get response from AI. Please try again.")
+                # Show sources
+                with st.expander(f"📚 Sources ({used_chunks} chunks used)"):
+                    for source in sources:
+                        st.write(f"**Chunk {source.get('chunk', 'N/A')}** (Score: {source.get('score', 0):.3f})")
+                        st.write(f"*{source.get('filename', 'Unknown file')}*" + (f", page {source['page']}" if source.get('page') else ""))
+                
+                # Add assistant message to chat
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": answer,
+                    "sources": sources
+                })
+            else:
+                st.error(meta.get("error", "Failed to get response from AI. Please try again."))
 
 if __name__ == "__main__":
     main()
@@ -3,6 +3,14 @@ import os
 # API Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 
+# HTTP client (one pooled keep-alive session shared across reruns); timeouts in seconds
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("CONNECT_TIMEOUT", "3.05"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "300"))
+QA_TIMEOUT = float(os.getenv("QA_TIMEOUT", "120"))
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "2"))
+HEALTH_CHECK_TTL = int(os.getenv("HEALTH_CHECK_TTL", "10"))
+
 # Streamlit Configuration
 PAGE_TITLE = "StudyBuddy.ai"
 PAGE_ICON = "📚"
@@ -1,21 +1,82 @@
+import json
+import uuid
 import requests
 import streamlit as st
-from typing import Optional, Dict, List
-from config import API_BASE_URL
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Iterator, List
+from config import (
+    API_BASE_URL, HTTP_POOL_SIZE, CONNECT_TIMEOUT, UPLOAD_TIMEOUT, QA_TIMEOUT,
+    HEALTH_TIMEOUT, HEALTH_CHECK_TTL,
+)
 
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One keep-alive connection pool to the backend, shared by every rerun and user session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=HEALTH_CHECK_TTL, show_spinner=False)
 def check_api_connection() -> bool:
     """Check if the backend API is accessible"""
     try:
-        response = requests.get(f"{API_BASE_URL}/docs", timeout=5)
+        response = get_session().get(f"{API_BASE_URL}/health", timeout=(CONNECT_TIMEOUT, HEALTH_TIMEOUT))
         return response.status_code == 200
-    except:
+    except requests.exceptions.RequestException:
         return False
 
+class _MultipartFile:
+    """
+    multipart/form-data body carrying one file, read in chunks as it is sent so the
+    upload is never copied into a single bytes object. Having a length lets requests
+    send a Content-Length instead of falling back to chunked encoding.
+    """
+
+    def __init__(self, field: str, file):
+        self.boundary = uuid.uuid4().hex
+        filename = (file.name or "upload").replace('"', "")
+        self.head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {file.type or 'application/octet-stream'}\r\n\r\n"
+        ).encode("utf-8")
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self.file = file
+        file.seek(0, 2)
+        self.size = file.tell()
+        file.seek(0)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self.head
+        self.file.seek(0)
+        while True:
+            chunk = self.file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+        yield self.tail
+
 def upload_document(file) -> Optional[Dict]:
     """Upload document to backend API"""
     try:
-        files = {"file": (file.name, file.getvalue(), file.type)}
-        response = requests.post(f"{API_BASE_URL}/upload/", files=files)
+        body = _MultipartFile("file", file)
+        response = get_session().post(
+            f"{API_BASE_URL}/upload/",
+            data=body,
+            headers={"Content-Type": body.content_type},
+            timeout=(CONNECT_TIMEOUT, UPLOAD_TIMEOUT),
+        )
         
         if response.status_code == 200:
             return response.json()
@@ -25,6 +86,9 @@ def upload_document(file) -> Optional[Dict]:
     except requests.exceptions.ConnectionError:
         st.error("Could not connect to backend API. Make sure the backend server is running on http://localhost:8000")
         return None
+    except requests.exceptions.Timeout:
+        st.error("Upload timed out while the backend was processing the document")
+        return None
     except Exception as e:
         st.error(f"Upload error: {str(e)}")
         return None
@@ -37,7 +101,7 @@ def ask_question(question: str, doc_id: str, top_k: int = 5) -> Optional[Dict]:
             "doc_id": doc_id,
             "top_k": top_k
         }
-        response = requests.post(f"{API_BASE_URL}/qa/", json=payload)
+        response = get_session().post(f"{API_BASE_URL}/qa/", json=payload, timeout=(CONNECT_TIMEOUT, QA_TIMEOUT))
         
         if response.status_code == 200:
             return response.json()
@@ -47,10 +111,56 @@ def ask_question(question: str, doc_id: str, top_k: int = 5) -> Optional[Dict]:
     except requests.exceptions.ConnectionError:
         st.error("Could not connect to backend API. Make sure the backend server is running on http://localhost:8000")
         return None
+    except requests.exceptions.Timeout:
+        st.error("Question timed out waiting for the backend")
+        return None
     except Exception as e:
         st.error(f"Question error: {str(e)}")
         return None
 
+def ask_question_stream(question: str, doc_id: str, top_k: int = 5, meta: Optional[Dict] = None) -> Iterator[str]:
+    """Stream answer tokens from the backend's SSE endpoint.
+
+    Sources, chunk count and any error are written into `meta` as the events arrive.
+    """
+    meta = meta if meta is not None else {}
+    payload = {
+        "question": question,
+        "doc_id": doc_id,
+        "top_k": top_k
+    }
+    try:
+        # The read timeout bounds the wait between events, not the whole answer
+        with get_session().post(
+            f"{API_BASE_URL}/qa/stream", json=payload, stream=True, timeout=(CONNECT_TIMEOUT, QA_TIMEOUT)
+        ) as response:
+            if response.status_code != 200:
+                meta["error"] = f"Question failed: {response.text}"
+                return
+
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):].strip())
+                    if event == "sources":
+                        meta.update(data)
+                    elif event == "token":
+                        yield data["text"]
+                    elif event == "error":
+                        meta["error"] = f"Question error: {data.get('detail')}"
+                    elif event == "done":
+                        meta["ttft_ms"] = data.get("ttft_ms")
+    except requests.exceptions.ConnectionError:
+        meta["error"] = "Could not connect to backend API. Make sure the backend server is running on http://localhost:8000"
+    except requests.exceptions.Timeout:
+        meta["error"] = "Question timed out waiting for the backend"
+    except Exception as e:
+        meta["error"] = f"Question error: {str(e)}"
+
 def format_sources(sources: List[Dict]) -> str:
     """Format sources for display"""
     if not sources: